@@ -1,6 +1,6 @@
 """Main Flask application"""
 from flask import Flask
-from models.order import load_orders
+from models.order import load_orders, start_order_saver
 from routes import register_routes
 from utils.scheduler import start_scheduler
 
@@ -9,6 +9,9 @@ app = Flask(__name__)
 # Load orders from file on startup (before registering routes)
 load_orders()
 
+# Persist order changes in the background, coalescing bursts of writes
+start_order_saver()
+
 # Register all routes
 register_routes(app)
 
@@ -1,10 +1,20 @@
 """Configuration settings for the application"""
+import atexit
 import os
 import json
+import threading
+import time
 from datetime import datetime
 
-# File path for persistent storage
-ORDERS_FILE = 'orders.json'
+# File paths for persistent storage; can be moved (e.g. into a mounted data directory)
+# with environment variables
+ORDERS_FILE = os.environ.get('ORDERS_FILE', 'orders.json')
+ORDERS_JOURNAL_FILE = os.environ.get('ORDERS_JOURNAL_FILE', 'orders.journal')
+# Legacy JSON orders file imported into the SQLite database on first start
+ORDERS_IMPORT_FILE = os.environ.get('ORDERS_IMPORT_FILE', ORDERS_FILE)
+ORDERS_DB_FILE = os.environ.get('ORDERS_DB_FILE', 'orders.db')
+TRACKING_EVENTS_DB_FILE = os.environ.get('TRACKING_EVENTS_DB_FILE', 'tracking_events.db')
+PRODUCT_CACHE_DB_FILE = os.environ.get('PRODUCT_CACHE_DB_FILE', 'product_cache.db')
 CONFIG_FILE = 'config.json'
 LAST_UPDATES_FILE = 'app_data.json'
 VERSION_FILE = 'VERSION'
@@ -12,36 +22,162 @@ VERSION_FILE = 'VERSION'
 # Directory for storing product images
 IMAGES_DIR = os.path.join('static', 'images', 'products')
 os.makedirs(IMAGES_DIR, exist_ok=True)
+for _data_file in (ORDERS_FILE, ORDERS_JOURNAL_FILE, ORDERS_DB_FILE, TRACKING_EVENTS_DB_FILE, PRODUCT_CACHE_DB_FILE):
+    if os.path.dirname(_data_file):
+        os.makedirs(os.path.dirname(_data_file), exist_ok=True)
 
-def load_config():
-    """Load configuration from JSON file"""
-    if os.path.exists(CONFIG_FILE):
+class CachedJsonFile:
+    """In-memory copy of a small JSON settings file, shared by all threads.
+
+    Reads are served from memory; the file is only re-read when its mtime/size
+    changes, and that is checked at most once per REVALIDATE_SECONDS. Writes update
+    memory immediately and are written to disk (atomically) after WRITE_DELAY_SECONDS,
+    so several changes in a row cost a single write. If the file was edited on disk in
+    the meantime, the pending changes are applied on top of the edited file instead of
+    overwriting it.
+    """
+
+    REVALIDATE_SECONDS = 1.0
+    WRITE_DELAY_SECONDS = 0.5
+
+    def __init__(self, path, label):
+        self.path = path
+        self.label = label
+        self._lock = threading.RLock()
+        self._data = None
+        self._signature = None
+        self._checked_at = 0.0
+        self._dirty = False
+        # Changes not written yet, so they can be re-applied to a file edited meanwhile
+        self._pending_changes = {}
+        self._pending_removals = set()
+        self._pending_replace = False
+        self._write_timer = None
+
+    def _signature_on_disk(self):
+        try:
+            stat = os.stat(self.path)
+            return (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
+
+    def _revalidate(self):
+        now = time.monotonic()
+        if self._data is not None and (self._dirty or now - self._checked_at < self.REVALIDATE_SECONDS):
+            return
+        self._checked_at = now
+        signature = self._signature_on_disk()
+        if self._data is not None and signature == self._signature:
+            return
+        self._signature = signature
+        self._data = {}
+        if signature is None:
+            return
         try:
-            with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._data = json.load(f)
         except (json.JSONDecodeError, IOError) as e:
-            print(f"Error loading config: {e}")
-            return {}
-    return {}
+            print(f"Error loading {self.label}: {e}")
+
+    def exists(self):
+        """Whether the file exists on disk (or is about to be written)"""
+        with self._lock:
+            self._revalidate()
+            return self._signature is not None or self._dirty
+
+    def get(self, key, default=None):
+        with self._lock:
+            self._revalidate()
+            return self._data.get(key, default)
+
+    def snapshot(self):
+        """Return a copy of the whole file's contents"""
+        with self._lock:
+            self._revalidate()
+            return dict(self._data)
+
+    def update(self, changes, remove=()):
+        """Set and remove keys, then schedule a write"""
+        with self._lock:
+            self._revalidate()
+            self._data.update(changes)
+            self._pending_changes.update(changes)
+            self._pending_removals.difference_update(changes)
+            for key in remove:
+                self._data.pop(key, None)
+                self._pending_changes.pop(key, None)
+                self._pending_removals.add(key)
+            self._schedule_write()
+
+    def replace(self, data):
+        """Replace the whole contents, then schedule a write"""
+        with self._lock:
+            self._data = dict(data)
+            self._pending_replace = True
+            self._schedule_write()
+
+    def _schedule_write(self):
+        self._dirty = True
+        if self._write_timer is None:
+            self._write_timer = threading.Timer(self.WRITE_DELAY_SECONDS, self.flush)
+            self._write_timer.daemon = True
+            self._write_timer.start()
+
+    def flush(self):
+        """Write pending changes to disk now"""
+        with self._lock:
+            if self._write_timer is not None:
+                self._write_timer.cancel()
+                self._write_timer = None
+            if not self._dirty:
+                return
+            if not self._pending_replace and self._signature_on_disk() != self._signature:
+                self._merge_into_disk_copy()
+            tmp_path = self.path + '.tmp'
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(self._data, f, indent=2, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+            except IOError as e:
+                print(f"Error saving {self.label}: {e}")
+                return
+            self._dirty = False
+            self._pending_changes = {}
+            self._pending_removals = set()
+            self._pending_replace = False
+            self._signature = self._signature_on_disk()
+            self._checked_at = time.monotonic()
+
+    def _merge_into_disk_copy(self):
+        """Reload the file, which changed on disk since it was read, and re-apply the pending changes"""
+        print(f"{self.label} changed on disk, merging pending changes into it")
+        self._checked_at = 0.0
+        self._data = None
+        self._revalidate()
+        self._data.update(self._pending_changes)
+        for key in self._pending_removals:
+            self._data.pop(key, None)
+
+_config = CachedJsonFile(CONFIG_FILE, 'config')
+_last_updates = CachedJsonFile(LAST_UPDATES_FILE, 'last updates')
+atexit.register(_config.flush)
+atexit.register(_last_updates.flush)
+
+def load_config():
+    """Load configuration from JSON file"""
+    return _config.snapshot()
 
 def save_config(config):
     """Save configuration to JSON file"""
-    try:
-        with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-            json.dump(config, f, indent=2, ensure_ascii=False)
-    except IOError as e:
-        print(f"Error saving config: {e}")
+    _config.replace(config)
 
 def get_doar_api_key():
     """Get Doar Israel API key from config"""
-    config = load_config()
-    return config.get('doar_israel_api_key', '')
+    return _config.get('doar_israel_api_key', '')
 
 def set_doar_api_key(api_key):
     """Set Doar Israel API key in config"""
-    config = load_config()
-    config['doar_israel_api_key'] = api_key
-    save_config(config)
+    _config.update({'doar_israel_api_key': api_key})
 
 def get_app_version():
     """Read application version from VERSION file"""
@@ -55,65 +191,125 @@ def get_app_version():
 
 def get_auto_update_interval_hours():
     """Get the auto-update interval in hours from config (default: 6)"""
-    config = load_config()
-    if 'auto_update_interval_hours' not in config:
+    hours = _config.get('auto_update_interval_hours')
+    if hours is None:
         # Initialize with default value if not present
-        config['auto_update_interval_hours'] = 6
-        save_config(config)
-    return config.get('auto_update_interval_hours', 6)
+        hours = 6
+        _config.update({'auto_update_interval_hours': hours})
+    return hours
 
 def set_auto_update_interval_hours(hours):
     """Set the auto-update interval in hours in config"""
-    config = load_config()
-    config['auto_update_interval_hours'] = hours
-    save_config(config)
+    _config.update({'auto_update_interval_hours': hours})
+
+def get_poll_min_interval_minutes():
+    """Get the shortest time in minutes between two polls of the same parcel (default: 30)"""
+    return _config.get('poll_min_interval_minutes', 30)
+
+def get_poll_max_interval_hours():
+    """Get the longest time in hours between two polls of the same parcel (default: 48)"""
+    return _config.get('poll_max_interval_hours', 48)
+
+def get_order_storage_backend():
+    """Get the order storage backend from config ('sqlite', 'json' or 'json_journal', default: 'sqlite')"""
+    return _config.get('order_storage_backend', 'sqlite')
+
+def get_journal_compact_max_bytes():
+    """Get the journal size in bytes that triggers compaction into orders.json (default: 1 MB)"""
+    return _config.get('journal_compact_max_bytes', 1024 * 1024)
+
+def get_journal_compact_max_age_seconds():
+    """Get the age in seconds of the oldest journal entry that triggers compaction (default: 300)"""
+    return _config.get('journal_compact_max_age_seconds', 300)
+
+def get_save_coalesce_window_seconds():
+    """Get the minimum time in seconds between background order writes (default: 2)"""
+    return _config.get('save_coalesce_window_seconds', 2)
+
+def get_tracking_cache_ttl_seconds():
+    """Get how long in seconds a tracking lookup result is reused (default: 60, 0 disables)"""
+    return _config.get('tracking_cache_ttl_seconds', 60)
+
+def get_product_page_hedge_delay_seconds():
+    """Get how long to wait for a product page before also trying its next URL variation (default: 2)"""
+    return _config.get('product_page_hedge_delay_seconds', 2)
+
+def get_batch_add_max_concurrency():
+    """Get how many products a batch add extracts at the same time (default: 4)"""
+    return _config.get('batch_add_max_concurrency', 4)
+
+def get_product_cache_ttl_days():
+    """Get how many days scraped product metadata is reused (default: 30, 0 disables)"""
+    return _config.get('product_cache_ttl_days', 30)
+
+def get_product_cache_max_entries():
+    """Get how many products the product cache keeps (default: 5000)"""
+    return _config.get('product_cache_max_entries', 5000)
+
+def get_cainiao_bulk_chunk_size():
+    """Get how many tracking numbers are sent per Cainiao bulk request (default: 40)"""
+    return _config.get('cainiao_bulk_chunk_size', 40)
+
+def get_cainiao_bulk_max_workers():
+    """Get how many Cainiao bulk requests may run at the same time (default: 4)"""
+    return _config.get('cainiao_bulk_max_workers', 4)
+
+def get_cainiao_stream_responses():
+    """Get whether refresh-all decodes Cainiao bulk responses module by module as they download (default: True)"""
+    return _config.get('cainiao_stream_responses', True)
+
+def get_doar_max_concurrency():
+    """Get how many Doar Israel lookups may run at the same time (default: 4)"""
+    return _config.get('doar_max_concurrency', 4)
+
+def get_aliexpress_api_max_concurrency():
+    """Get how many AliExpress order API lookups may run at the same time (default: 4)"""
+    return _config.get('aliexpress_api_max_concurrency', 4)
+
+def get_refresh_engine_io_threads():
+    """Get how many threads the refresh engine uses for blocking HTTP calls (default: 16)"""
+    return _config.get('refresh_engine_io_threads', 16)
+
+def get_provider_resilience_overrides():
+    """Get per-provider rate limit/retry/circuit breaker overrides from config (default: none)"""
+    return _config.get('provider_resilience', {})
+
+def get_http_pool_connections():
+    """Get how many connection pools each outbound HTTP session keeps (default: 4)"""
+    return _config.get('http_pool_connections', 4)
+
+def get_http_pool_maxsize():
+    """Get the maximum number of kept-alive connections per host (default: 10)"""
+    return _config.get('http_pool_maxsize', 10)
 
 def load_last_updates():
     """Load last update times from app_data.json"""
-    if os.path.exists(LAST_UPDATES_FILE):
-        try:
-            with open(LAST_UPDATES_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, IOError) as e:
-            print(f"Error loading last updates: {e}")
-            return {}
+    if _last_updates.exists():
+        return _last_updates.snapshot()
     
     # Migration: Check if old data exists in config.json and migrate it
-    config = load_config()
     last_updates = {}
-    migrated = False
-    
-    if 'cainiao_last_update' in config:
-        last_updates['cainiao_last_update'] = config['cainiao_last_update']
-        migrated = True
-    if 'doar_last_update' in config:
-        last_updates['doar_last_update'] = config['doar_last_update']
-        migrated = True
+    for key in ('cainiao_last_update', 'doar_last_update'):
+        value = _config.get(key)
+        if value is not None:
+            last_updates[key] = value
     
-    if migrated:
+    if last_updates:
         save_last_updates(last_updates)
         # Remove from config.json
-        if 'cainiao_last_update' in config:
-            del config['cainiao_last_update']
-        if 'doar_last_update' in config:
-            del config['doar_last_update']
-        save_config(config)
+        _config.update({}, remove=('cainiao_last_update', 'doar_last_update'))
         print("Migrated last update times from config.json to app_data.json")
     
     return last_updates
 
 def save_last_updates(last_updates):
     """Save last update times to separate file"""
-    try:
-        with open(LAST_UPDATES_FILE, 'w', encoding='utf-8') as f:
-            json.dump(last_updates, f, indent=2, ensure_ascii=False)
-    except IOError as e:
-        print(f"Error saving last updates: {e}")
+    _last_updates.replace(last_updates)
 
-def get_cainiao_last_update():
-    """Get the last Cainiao update time from app_data.json"""
-    last_updates = load_last_updates()
-    last_update_str = last_updates.get('cainiao_last_update', '')
+def _get_last_update(key):
+    if not _last_updates.exists():
+        load_last_updates()
+    last_update_str = _last_updates.get(key, '')
     if last_update_str:
         try:
             return datetime.fromisoformat(last_update_str)
@@ -121,30 +317,25 @@ def get_cainiao_last_update():
             return None
     return None
 
-def set_cainiao_last_update(dt=None):
-    """Set the last Cainiao update time in app_data.json"""
-    last_updates = load_last_updates()
+def _set_last_update(key, dt):
+    if not _last_updates.exists():
+        load_last_updates()
     if dt is None:
         dt = datetime.now()
-    last_updates['cainiao_last_update'] = dt.isoformat()
-    save_last_updates(last_updates)
+    _last_updates.update({key: dt.isoformat()})
+
+def get_cainiao_last_update():
+    """Get the last Cainiao update time from app_data.json"""
+    return _get_last_update('cainiao_last_update')
+
+def set_cainiao_last_update(dt=None):
+    """Set the last Cainiao update time in app_data.json"""
+    _set_last_update('cainiao_last_update', dt)
 
 def get_doar_last_update():
     """Get the last Doar Israel update time from app_data.json"""
-    last_updates = load_last_updates()
-    last_update_str = last_updates.get('doar_last_update', '')
-    if last_update_str:
-        try:
-            return datetime.fromisoformat(last_update_str)
-        except (ValueError, TypeError):
-            return None
-    return None
+    return _get_last_update('doar_last_update')
 
 def set_doar_last_update(dt=None):
     """Set the last Doar Israel update time in app_data.json"""
-    last_updates = load_last_updates()
-    if dt is None:
-        dt = datetime.now()
-    last_updates['doar_last_update'] = dt.isoformat()
-    save_last_updates(last_updates)
-
+    _set_last_update('doar_last_update', dt)
@@ -1,5 +1,20 @@
 """Models package"""
-from .order import orders, load_orders, save_orders, get_next_order_id
-
-__all__ = ['orders', 'load_orders', 'save_orders', 'get_next_order_id']
+from .order import (
+    orders,
+    OrderRegistry,
+    normalize_tracking_number,
+    load_orders,
+    save_orders,
+    delete_orders,
+    get_next_order_id
+)
 
+__all__ = [
+    'orders',
+    'OrderRegistry',
+    'normalize_tracking_number',
+    'load_orders',
+    'save_orders',
+    'delete_orders',
+    'get_next_order_id'
+]
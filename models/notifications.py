@@ -0,0 +1,79 @@
+"""In-process publish/subscribe of change notifications for the browser.
+
+The order store, tracking updates, background jobs and the scheduler publish small
+notifications here, and each `GET /api/events` connection subscribes and forwards
+them as Server-Sent Events. Notifications only say what changed (ids, versions,
+progress); clients fetch the data itself with the delta endpoints.
+"""
+import itertools
+import json
+import threading
+from collections import deque
+
+# A subscriber this far behind is reset: its queue is dropped and it is told to resync
+MAX_PENDING_EVENTS = 1000
+
+class Subscription:
+    """The queue of notifications for one connected client"""
+
+    def __init__(self):
+        self._events = deque()
+        self._condition = threading.Condition()
+
+    def push(self, event):
+        with self._condition:
+            if len(self._events) >= MAX_PENDING_EVENTS:
+                self._events.clear()
+                event = (event[0], 'resync', {})
+            self._events.append(event)
+            self._condition.notify()
+
+    def get(self, timeout=None):
+        """Get the next (id, type, data) notification, or None if none arrived within `timeout`"""
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._events, timeout):
+                return None
+            return self._events.popleft()
+
+class NotificationBroker:
+    """Fans notifications out to every current subscription"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = set()
+        self._ids = itertools.count(1)
+
+    def subscribe(self):
+        subscription = Subscription()
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, event_type, data):
+        """Send a notification of `event_type` with JSON-serializable `data` to all subscribers"""
+        with self._lock:
+            if not self._subscriptions:
+                return
+            event = (next(self._ids), event_type, data)
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            subscription.push(event)
+
+def format_sse(event):
+    """Encode an (id, type, data) notification as a Server-Sent Events message"""
+    event_id, event_type, data = event
+    return f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+_broker = NotificationBroker()
+
+def get_notification_broker():
+    """Get the process-wide notification broker"""
+    return _broker
+
+def publish(event_type, data):
+    """Publish a notification through the process-wide broker"""
+    _broker.publish(event_type, data)
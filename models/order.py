@@ -1,44 +1,897 @@
 """Order data model and storage functions"""
+import atexit
+import errno
 import json
 import os
-from config import ORDERS_FILE
+import signal
+import sqlite3
+import sys
+import threading
+import time
+from config import (
+    ORDERS_FILE,
+    ORDERS_IMPORT_FILE,
+    ORDERS_DB_FILE,
+    ORDERS_JOURNAL_FILE,
+    get_order_storage_backend,
+    get_journal_compact_max_bytes,
+    get_journal_compact_max_age_seconds,
+    get_save_coalesce_window_seconds
+)
+from .notifications import publish
+
+def normalize_tracking_number(tracking_number):
+    """Normalize a tracking number for lookups (strip whitespace, upper-case)"""
+    return ''.join((tracking_number or '').split()).upper()
+
+def _order_product_ids(order):
+    """The product ids of an order and its sub-items, as strings"""
+    product_ids = {str(order.get('product_id') or '')}
+    for item in order.get('sub_items') or []:
+        product_ids.add(str(item.get('product_id') or ''))
+    product_ids.discard('')
+    return tuple(product_ids)
+
+class OrderRegistry(list):
+    """The in-memory list of orders, with hash indexes kept in sync on every mutation.
+
+    Maintains indexes on `id`, AliExpress `order_id`, normalized `tracking_number` and
+    `product_id` (both one-to-many, the latter including sub-items), plus a monotonic
+    id counter, so lookups and duplicate checks do not need to scan the list. It is
+    still a list, so iteration and JSON serialization work as before. Fields that are
+    indexed (including `sub_items`) must not be changed in place without calling
+    `reindex(order)` afterwards.
+
+    Every change bumps `revision`, and each order remembers the revision it was last
+    changed at (deleted orders leave a tombstone), so `changes_since()` can tell a
+    client exactly which orders changed since it last looked.
+    """
+
+    MAX_TOMBSTONES = 1000
+
+    def __init__(self, iterable=()):
+        super().__init__()
+        self._lock = threading.RLock()
+        self._by_id = {}
+        self._by_order_id = {}
+        self._by_tracking = {}
+        self._by_product = {}
+        # Remember the indexed values of each order so reindex() can find stale entries
+        self._indexed_keys = {}
+        # Per-order values derived from the order (e.g. sort keys), dropped when it changes
+        self._derived = {}
+        self._last_id = 0
+        # Bumped on every change, so callers can cache results computed over all orders.
+        # Starts from the wall clock so versions handed out by a previous run of the app
+        # are always older than anything this run reports.
+        self.revision = int(time.time() * 1000)
+        # id -> revision the order was last changed at
+        self._versions = {}
+        # id -> revision the order was deleted at, oldest first
+        self._tombstones = {}
+        # changes_since() can only answer for versions at or after this one
+        self.oldest_version = self.revision
+        self.extend(iterable)
+
+    def _index(self, order):
+        order_id = order.get('id')
+        if order_id is None:
+            return
+        aliexpress_order_id = order.get('order_id') or ''
+        tracking = normalize_tracking_number(order.get('tracking_number'))
+        self._by_id[order_id] = order
+        if aliexpress_order_id:
+            self._by_order_id[aliexpress_order_id] = order
+        if tracking:
+            self._by_tracking.setdefault(tracking, {})[order_id] = order
+        product_ids = _order_product_ids(order)
+        for product_id in product_ids:
+            self._by_product.setdefault(product_id, {})[order_id] = order
+        self._indexed_keys[order_id] = (aliexpress_order_id, tracking, product_ids)
+        self._derived.pop(order_id, None)
+        self.revision += 1
+        self._versions[order_id] = self.revision
+        self._tombstones.pop(order_id, None)
+        if isinstance(order_id, int) and order_id > self._last_id:
+            self._last_id = order_id
+
+    def _unindex(self, order):
+        order_id = order.get('id')
+        if order_id is None or self._by_id.get(order_id) is not order:
+            return
+        aliexpress_order_id, tracking, product_ids = self._indexed_keys.pop(order_id, ('', '', ()))
+        del self._by_id[order_id]
+        self._derived.pop(order_id, None)
+        self.revision += 1
+        self._versions.pop(order_id, None)
+        self._add_tombstone(order_id)
+        if aliexpress_order_id and self._by_order_id.get(aliexpress_order_id) is order:
+            del self._by_order_id[aliexpress_order_id]
+        if tracking in self._by_tracking:
+            self._by_tracking[tracking].pop(order_id, None)
+            if not self._by_tracking[tracking]:
+                del self._by_tracking[tracking]
+        for product_id in product_ids:
+            if product_id in self._by_product:
+                self._by_product[product_id].pop(order_id, None)
+                if not self._by_product[product_id]:
+                    del self._by_product[product_id]
+
+    def _add_tombstone(self, order_id):
+        self._tombstones.pop(order_id, None)
+        self._tombstones[order_id] = self.revision
+        if len(self._tombstones) > self.MAX_TOMBSTONES:
+            # Forget the oldest deletion; clients older than it must reload everything
+            oldest_id = next(iter(self._tombstones))
+            self.oldest_version = self._tombstones.pop(oldest_id)
+
+    def _rebuild(self):
+        previous = dict(self._by_id)
+        previous_versions = dict(self._versions)
+        self._by_id.clear()
+        self._by_order_id.clear()
+        self._by_tracking.clear()
+        self._by_product.clear()
+        self._indexed_keys.clear()
+        self._derived.clear()
+        self._versions.clear()
+        self.revision += 1
+        for order in self:
+            self._index(order)
+        # Orders that were only moved around keep their version
+        for order_id, order in self._by_id.items():
+            if previous.get(order_id) is order and order_id in previous_versions:
+                self._versions[order_id] = previous_versions[order_id]
+        for order_id in previous:
+            if order_id not in self._by_id:
+                self._add_tombstone(order_id)
+
+    # Lookups
+
+    def get_by_id(self, order_id):
+        """Get an order by its internal id, or None"""
+        return self._by_id.get(order_id)
+
+    def get_by_order_id(self, aliexpress_order_id):
+        """Get an order by its AliExpress order id, or None"""
+        if not aliexpress_order_id:
+            return None
+        return self._by_order_id.get(aliexpress_order_id)
+
+    def get_by_tracking_number(self, tracking_number):
+        """Get all orders sharing a tracking number"""
+        tracking = normalize_tracking_number(tracking_number)
+        if not tracking:
+            return []
+        with self._lock:
+            return list(self._by_tracking.get(tracking, {}).values())
+
+    def get_by_product_id(self, product_id):
+        """Get all orders containing a product, as the order or as one of its sub-items"""
+        if not product_id:
+            return []
+        with self._lock:
+            return list(self._by_product.get(str(product_id), {}).values())
+
+    def tracking_numbers(self):
+        """Get the set of normalized tracking numbers currently in use"""
+        with self._lock:
+            return set(self._by_tracking)
+
+    def next_id(self):
+        """Reserve and return the next order id (ids are never reused)"""
+        with self._lock:
+            self._last_id += 1
+            return self._last_id
+
+    def derived(self, order, compute):
+        """Get `compute(order)`, cached until the order is next touched"""
+        order_id = order.get('id')
+        value = self._derived.get(order_id)
+        if value is None:
+            value = compute(order)
+            self._derived[order_id] = value
+        return value
+
+    def touch(self, changed_orders=None):
+        """Record that orders were modified in place (all orders if None)"""
+        with self._lock:
+            self.revision += 1
+            if changed_orders is None:
+                self._derived.clear()
+                changed_orders = list(self)
+            for order in changed_orders:
+                order_id = order.get('id')
+                self._derived.pop(order_id, None)
+                if order_id in self._by_id:
+                    self._versions[order_id] = self.revision
+
+    def snapshot(self, selected=None):
+        """Get detached copies of orders (all if None) for writing to disk.
+
+        Request threads change order dicts in place, so serializing the live dicts can
+        fail halfway ("dictionary changed size during iteration"). The copy is made
+        with the C JSON encoder, which does not release the GIL, so each order is
+        copied in one consistent state.
+        """
+        with self._lock:
+            source = list(self) if selected is None else list(selected)
+            return json.loads(json.dumps(source, ensure_ascii=False))
+
+    def version_of(self, order):
+        """Get the revision an order was last changed at"""
+        return self._versions.get(order.get('id'), self.oldest_version)
+
+    def changes_since(self, version):
+        """Get (changed orders, deleted ids) since `version`.
+
+        Returns None if the changes can no longer be reconstructed (the version is
+        older than the remembered history or comes from elsewhere), in which case the
+        caller has to start over from the full list.
+        """
+        with self._lock:
+            if version < self.oldest_version or version > self.revision:
+                return None
+            changed = [o for o in self if self._versions.get(o.get('id'), 0) > version]
+            deleted = [order_id for order_id, deleted_at in self._tombstones.items() if deleted_at > version]
+            return changed, deleted
+
+    def reindex(self, order):
+        """Refresh the indexes after an order's `order_id`, `tracking_number` or products changed"""
+        with self._lock:
+            self._unindex(order)
+            self._index(order)
+
+    # Mutations
+
+    def append(self, order):
+        with self._lock:
+            super().append(order)
+            self._index(order)
+
+    def extend(self, iterable):
+        with self._lock:
+            for order in iterable:
+                self.append(order)
+
+    def insert(self, index, order):
+        with self._lock:
+            super().insert(index, order)
+            self._index(order)
+
+    def remove(self, order):
+        with self._lock:
+            super().remove(order)
+            self._unindex(order)
+
+    def pop(self, index=-1):
+        with self._lock:
+            order = super().pop(index)
+            self._unindex(order)
+            return order
+
+    def clear(self):
+        with self._lock:
+            super().clear()
+            self._rebuild()
+
+    def remove_ids(self, order_ids):
+        """Remove all orders whose id is in `order_ids`"""
+        with self._lock:
+            order_ids = set(order_ids)
+            super().__setitem__(slice(None), [o for o in self if o.get('id') not in order_ids])
+            self._rebuild()
+
+    def __setitem__(self, index, value):
+        with self._lock:
+            super().__setitem__(index, value)
+            self._rebuild()
+
+    def __delitem__(self, index):
+        with self._lock:
+            super().__delitem__(index)
+            self._rebuild()
+
+    def __iadd__(self, iterable):
+        self.extend(iterable)
+        return self
 
 # In-memory storage for orders
-orders = []
+orders = OrderRegistry()
+
+def write_json_atomic(path, data):
+    """Write JSON to a temp file, fsync it and rename it over `path`.
+
+    A file that can't be replaced (a single-file bind mount in Docker fails with
+    EBUSY) is overwritten in place instead, which is not atomic but still saves.
+    """
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    try:
+        os.replace(tmp_path, path)
+    except OSError as e:
+        if e.errno != errno.EBUSY:
+            raise
+        with open(tmp_path, 'rb') as src, open(path, 'wb') as dst:
+            dst.write(src.read())
+            dst.flush()
+            os.fsync(dst.fileno())
+        os.remove(tmp_path)
+
+class JsonOrderStore:
+    """Stores all orders in a single JSON file. Every write rewrites the whole file."""
+
+    # Every write needs a snapshot of all orders, not just the changed ones
+    writes_whole_file = True
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        """Return the list of stored orders (empty list if the file is missing)"""
+        if not os.path.exists(self.path):
+            print(f"Orders file {self.path} not found, starting with empty list")
+            return []
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def replace_all(self, all_orders):
+        """Persist the full list of orders (atomically: temp file + fsync + rename)"""
+        write_json_atomic(self.path, all_orders)
+
+    def upsert(self, changed_orders, all_orders):
+        """Persist changed orders (the JSON file can only be written as a whole)"""
+        self.replace_all(all_orders)
+
+    def delete(self, order_ids, all_orders):
+        """Persist the removal of orders (the JSON file can only be written as a whole)"""
+        self.replace_all(all_orders)
+
+    def write_batch(self, changed_orders, deleted_ids, all_orders):
+        """Persist a batch of changes with a single rewrite"""
+        self.replace_all(all_orders)
+
+class JournaledJsonOrderStore:
+    """Keeps `orders.json` as a snapshot and appends every change to a journal file.
+
+    Each upsert/delete appends one JSON line to the journal, so writes cost
+    O(changed orders). A background thread folds the journal into a fresh snapshot
+    once it grows past a size threshold or its oldest entry gets too old. The snapshot
+    is only ever replaced atomically, and a torn final journal line is ignored on
+    replay, so a crash mid-write cannot corrupt the stored orders.
+    """
+
+    COMPACT_CHECK_SECONDS = 10
+    writes_whole_file = False
+
+    def __init__(self, snapshot_path, journal_path, max_bytes, max_age_seconds):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self.compacting_path = journal_path + '.compacting'
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        # Guards journal appends and journal rotation
+        self._lock = threading.Lock()
+        # Ensures only one compaction (or full rewrite) runs at a time
+        self._compact_lock = threading.Lock()
+        self._first_entry_time = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._compactor_loop, name='order-journal-compactor', daemon=True)
+        self._thread.start()
+
+    def _read_snapshot(self):
+        if not os.path.exists(self.snapshot_path):
+            return []
+        with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _replay(self, path, orders_by_id):
+        """Apply journal entries from `path` to `orders_by_id`"""
+        if not os.path.exists(path):
+            return
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Torn line from a crash mid-append; the other entries are intact
+                    print(f"Ignoring incomplete entry in {path}")
+                    continue
+                if entry.get('op') == 'upsert':
+                    order = entry['order']
+                    order['id'] = int(order['id'])
+                    orders_by_id[order['id']] = order
+                elif entry.get('op') == 'delete':
+                    orders_by_id.pop(int(entry['id']), None)
+
+    def _truncate_torn_tail(self):
+        """Drop a partially written last line so later appends start on a fresh line"""
+        if not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path, 'rb+') as f:
+            data = f.read()
+            if data and not data.endswith(b'\n'):
+                f.truncate(data.rfind(b'\n') + 1)
+
+    def _fold(self, journal_paths):
+        """Return the snapshot with the given journals replayed on top of it"""
+        orders_by_id = {}
+        for order in self._read_snapshot():
+            if 'id' in order:
+                order['id'] = int(order['id'])
+                orders_by_id[order['id']] = order
+        for path in journal_paths:
+            self._replay(path, orders_by_id)
+        return list(orders_by_id.values())
+
+    def _write_snapshot(self, all_orders):
+        """Atomically replace the snapshot file"""
+        write_json_atomic(self.snapshot_path, all_orders)
+
+    def _append(self, entries):
+        with self._lock:
+            with open(self.journal_path, 'a', encoding='utf-8') as f:
+                for entry in entries:
+                    f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            if self._first_entry_time is None:
+                self._first_entry_time = time.monotonic()
+
+    def _finish_compaction(self):
+        """Fold the rotated journal into the snapshot and remove it"""
+        self._write_snapshot(self._fold([self.compacting_path]))
+        os.remove(self.compacting_path)
+
+    def load(self):
+        """Return the snapshot with the journal replayed on top of it"""
+        with self._compact_lock:
+            if os.path.exists(self.compacting_path):
+                # A previous compaction was interrupted before it replaced the snapshot
+                self._finish_compaction()
+            if not os.path.exists(self.snapshot_path) and not os.path.exists(self.journal_path):
+                print(f"Orders file {self.snapshot_path} not found, starting with empty list")
+            loaded_orders = self._fold([self.journal_path])
+            with self._lock:
+                self._truncate_torn_tail()
+                has_entries = os.path.exists(self.journal_path) and os.path.getsize(self.journal_path) > 0
+                self._first_entry_time = time.monotonic() if has_entries else None
+            return loaded_orders
+
+    def replace_all(self, all_orders):
+        """Write a fresh snapshot of the full list and discard the journal"""
+        with self._compact_lock, self._lock:
+            self._write_snapshot(all_orders)
+            if os.path.exists(self.journal_path):
+                os.remove(self.journal_path)
+            self._first_entry_time = None
+
+    def upsert(self, changed_orders, all_orders):
+        """Append one journal entry per changed order"""
+        self._append([{'op': 'upsert', 'order': order} for order in changed_orders])
+
+    def delete(self, order_ids, all_orders):
+        """Append one journal entry per deleted order"""
+        self._append([{'op': 'delete', 'id': int(order_id)} for order_id in order_ids])
+
+    def write_batch(self, changed_orders, deleted_ids, all_orders):
+        """Append a batch of upserts and deletes with a single fsync"""
+        entries = [{'op': 'upsert', 'order': order} for order in changed_orders]
+        entries.extend({'op': 'delete', 'id': int(order_id)} for order_id in deleted_ids)
+        if entries:
+            self._append(entries)
+
+    def needs_compaction(self):
+        """Whether the journal has crossed the size or age threshold"""
+        with self._lock:
+            if self._first_entry_time is None or not os.path.exists(self.journal_path):
+                return False
+            size = os.path.getsize(self.journal_path)
+            age = time.monotonic() - self._first_entry_time
+        return size >= self.max_bytes or age >= self.max_age_seconds
+
+    def compact(self):
+        """Fold the journal into a fresh snapshot. New appends go to a fresh journal meanwhile."""
+        with self._compact_lock:
+            with self._lock:
+                if not os.path.exists(self.journal_path):
+                    self._first_entry_time = None
+                    return False
+                os.replace(self.journal_path, self.compacting_path)
+                self._first_entry_time = None
+            self._finish_compaction()
+            return True
+
+    def _compactor_loop(self):
+        while not self._stop.wait(self.COMPACT_CHECK_SECONDS):
+            try:
+                if self.needs_compaction():
+                    self.compact()
+            except (IOError, json.JSONDecodeError) as e:
+                print(f"Error compacting order journal: {e}")
+
+class SqliteOrderStore:
+    """Stores one row per order in SQLite so single-order writes only touch one row.
+
+    On first use, an existing JSON orders file is imported automatically and renamed
+    with a `.migrated` suffix. The import is recorded in `PRAGMA user_version`, so it
+    never runs again, even if the file could not be renamed (e.g. a bind mount).
+    """
+
+    # user_version once the legacy JSON file has been imported (or found absent)
+    MIGRATED_VERSION = 1
+
+    writes_whole_file = False
+
+    def __init__(self, path, legacy_json_path=None):
+        self.path = path
+        self.legacy_json_path = legacy_json_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS orders ('
+            'id INTEGER PRIMARY KEY, '
+            'order_id TEXT, '
+            'tracking_number TEXT, '
+            'data TEXT NOT NULL)'
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def _row(order):
+        return (
+            int(order['id']),
+            order.get('order_id') or '',
+            (order.get('tracking_number') or '').strip(),
+            json.dumps(order, ensure_ascii=False)
+        )
+
+    def _migrate_from_json(self):
+        """Import orders from the legacy JSON file into an empty database"""
+        # isfile: Docker creates a directory for a bind-mounted file that doesn't exist
+        if not self.legacy_json_path or not os.path.isfile(self.legacy_json_path):
+            return []
+        legacy_orders = JsonOrderStore(self.legacy_json_path).load()
+        for order in legacy_orders:
+            if 'id' in order:
+                order['id'] = int(order['id'])
+        legacy_orders = [o for o in legacy_orders if 'id' in o]
+        with self._conn:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO orders (id, order_id, tracking_number, data) VALUES (?, ?, ?, ?)',
+                [self._row(o) for o in legacy_orders]
+            )
+        try:
+            os.replace(self.legacy_json_path, self.legacy_json_path + '.migrated')
+        except OSError as e:
+            # e.g. a bind-mounted file in Docker; user_version marks it as imported
+            print(f"Could not rename {self.legacy_json_path} after migration: {e}")
+        print(f"Migrated {len(legacy_orders)} orders from {self.legacy_json_path} to {self.path}")
+        return legacy_orders
+
+    def load(self):
+        """Return the list of stored orders, importing the legacy JSON file on first use"""
+        with self._lock:
+            rows = self._conn.execute('SELECT data FROM orders ORDER BY id').fetchall()
+            user_version = self._conn.execute('PRAGMA user_version').fetchone()[0]
+            if user_version < self.MIGRATED_VERSION:
+                # Databases created before the marker existed already hold the imported orders
+                migrated = [] if rows else self._migrate_from_json()
+                self._conn.execute(f'PRAGMA user_version = {self.MIGRATED_VERSION}')
+                self._conn.commit()
+                if migrated:
+                    return migrated
+            return [json.loads(row[0]) for row in rows]
+
+    def replace_all(self, all_orders):
+        """Persist the full list of orders, removing rows for orders that no longer exist"""
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM orders')
+            self._conn.executemany(
+                'INSERT INTO orders (id, order_id, tracking_number, data) VALUES (?, ?, ?, ?)',
+                [self._row(o) for o in all_orders]
+            )
+
+    def upsert(self, changed_orders, all_orders):
+        """Insert or update only the given orders in a single transaction"""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO orders (id, order_id, tracking_number, data) VALUES (?, ?, ?, ?)',
+                [self._row(o) for o in changed_orders]
+            )
+
+    def delete(self, order_ids, all_orders):
+        """Delete the rows for the given order IDs in a single transaction"""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'DELETE FROM orders WHERE id = ?',
+                [(int(order_id),) for order_id in order_ids]
+            )
+
+    def write_batch(self, changed_orders, deleted_ids, all_orders):
+        """Apply a batch of upserts and deletes in a single transaction"""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO orders (id, order_id, tracking_number, data) VALUES (?, ?, ?, ?)',
+                [self._row(o) for o in changed_orders]
+            )
+            self._conn.executemany(
+                'DELETE FROM orders WHERE id = ?',
+                [(int(order_id),) for order_id in deleted_ids]
+            )
+
+def create_order_store(backend=None):
+    """Create the order store for the configured backend ('sqlite', 'json' or 'json_journal')"""
+    backend = backend or get_order_storage_backend()
+    if backend == 'json':
+        return JsonOrderStore(ORDERS_FILE)
+    if backend == 'json_journal':
+        return JournaledJsonOrderStore(
+            ORDERS_FILE,
+            ORDERS_JOURNAL_FILE,
+            get_journal_compact_max_bytes(),
+            get_journal_compact_max_age_seconds()
+        )
+    if backend != 'sqlite':
+        print(f"Unknown order storage backend '{backend}', falling back to sqlite")
+    return SqliteOrderStore(ORDERS_DB_FILE, legacy_json_path=ORDERS_IMPORT_FILE)
+
+_store = None
+
+def get_order_store():
+    """Get the active order store, creating it on first use"""
+    global _store
+    if _store is None:
+        _store = create_order_store()
+    return _store
+
+def _detach_inline_events(loaded_orders):
+    """Move event lists stored inside orders (older data) to the tracking event store.
+    Returns the orders that were changed."""
+    from .tracking_events import detach_events
+    changed = []
+    for order in loaded_orders:
+        tracking_number = order.get('tracking_number', '')
+        moved = False
+        for provider, key in (('cainiao', 'tracking_info'), ('doar', 'doar_tracking_info')):
+            tracking_info = order.get(key)
+            if isinstance(tracking_info, dict) and 'events' in tracking_info:
+                order[key] = detach_events(provider, tracking_number, tracking_info)
+                moved = True
+        if moved:
+            changed.append(order)
+    return changed
 
 def load_orders():
-    """Load orders from JSON file"""
+    """Load orders from the configured store"""
     global orders
-    if os.path.exists(ORDERS_FILE):
-        try:
-            with open(ORDERS_FILE, 'r', encoding='utf-8') as f:
-                loaded_orders = json.load(f)
-                # Ensure all orders have integer IDs
-                for order in loaded_orders:
-                    if 'id' in order:
-                        order['id'] = int(order['id'])
-                # Clear and extend the existing list to preserve references
-                orders.clear()
-                orders.extend(loaded_orders)
-                print(f"Loaded {len(orders)} orders from {ORDERS_FILE}")
-        except (json.JSONDecodeError, IOError) as e:
-            print(f"Error loading orders: {e}")
-            orders.clear()
-    else:
+    try:
+        store = get_order_store()
+        loaded_orders = store.load()
+        # Ensure all orders have integer IDs
+        for order in loaded_orders:
+            if 'id' in order:
+                order['id'] = int(order['id'])
+        migrated_orders = _detach_inline_events(loaded_orders)
+        # Clear and extend the existing list to preserve references
+        orders.clear()
+        orders.extend(loaded_orders)
+        print(f"Loaded {len(orders)} orders using {type(store).__name__}")
+        if migrated_orders:
+            print(f"Moved tracking events of {len(migrated_orders)} orders to the tracking event store")
+            save_orders(migrated_orders)
+    except (json.JSONDecodeError, IOError, sqlite3.Error) as e:
+        print(f"Error loading orders: {e}")
         orders.clear()
-        print(f"Orders file {ORDERS_FILE} not found, starting with empty list")
 
-def save_orders():
-    """Save orders to JSON file"""
+class WriteBehindSaver:
+    """Coalesces order writes and flushes them from a background thread.
+
+    `save_orders()`/`delete_orders()` only mark orders dirty; the thread writes all
+    pending changes at most once per `window_seconds`, so a burst of N mutations costs
+    one write and request handlers never wait on disk. Pending changes are flushed
+    on shutdown (atexit and SIGTERM).
+    """
+
+    def __init__(self, window_seconds):
+        self.window_seconds = window_seconds
+        self._cond = threading.Condition()
+        self._changed = {}
+        self._deleted = set()
+        self._full = False
+        self._stopping = False
+        self._dirty_since = 0.0
+        # Serializes flushes from the thread and from shutdown hooks
+        self._flush_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='order-write-behind', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    @property
+    def dirty(self):
+        with self._cond:
+            return bool(self._full or self._changed or self._deleted)
+
+    def _mark_dirty_since(self):
+        if not (self._full or self._changed or self._deleted):
+            self._dirty_since = time.monotonic()
+
+    def mark_dirty(self, changed_orders=None):
+        """Queue orders for writing (all orders if `changed_orders` is None)"""
+        with self._cond:
+            self._mark_dirty_since()
+            if changed_orders is None:
+                self._full = True
+            else:
+                for order in changed_orders:
+                    self._changed[order['id']] = order
+                    self._deleted.discard(order['id'])
+            self._cond.notify()
+
+    def mark_deleted(self, order_ids):
+        """Queue order deletions"""
+        with self._cond:
+            self._mark_dirty_since()
+            for order_id in order_ids:
+                self._changed.pop(order_id, None)
+                self._deleted.add(order_id)
+            self._cond.notify()
+
+    def flush(self):
+        """Write all pending changes now"""
+        with self._flush_lock:
+            with self._cond:
+                changed = list(self._changed.values())
+                deleted = set(self._deleted)
+                full = self._full
+                self._changed.clear()
+                self._deleted.clear()
+                self._full = False
+            if not (full or changed or deleted):
+                return
+            try:
+                _write_orders(changed, deleted, full)
+            except Exception as e:
+                print(f"Error saving orders: {e!r}")
+                # Put the batch back so the next flush retries it
+                with self._cond:
+                    self._mark_dirty_since()
+                    self._full = self._full or full
+                    for order in changed:
+                        if order['id'] not in self._deleted:
+                            self._changed.setdefault(order['id'], order)
+                    self._deleted.update(deleted - set(self._changed))
+
+    def stop(self):
+        """Stop the thread and flush anything still pending"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        self.flush()
+
+    def _run(self):
+        while True:
+            try:
+                if not self._wait_for_window():
+                    return
+                self.flush()
+            except Exception as e:
+                # This is the only thread that persists orders, so it must not die;
+                # flush() keeps the failed batch pending for the next round
+                print(f"Error in order write-behind thread: {e!r}")
+
+    def _wait_for_window(self):
+        """Block until there is something to write and its window has passed.
+        Returns False once the saver is stopping."""
+        with self._cond:
+            while not (self._stopping or self._full or self._changed or self._deleted):
+                self._cond.wait()
+            # Wait out the window so later mutations join this flush
+            deadline = self._dirty_since + self.window_seconds
+            while not self._stopping:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return not self._stopping
+
+_saver = None
+
+def start_order_saver(window_seconds=None):
+    """Switch order persistence to write-behind mode and register shutdown flushing"""
+    global _saver
+    if _saver is not None:
+        return _saver
+    if window_seconds is None:
+        window_seconds = get_save_coalesce_window_seconds()
+    _saver = WriteBehindSaver(window_seconds)
+    _saver.start()
+    atexit.register(_saver.stop)
+    if threading.current_thread() is threading.main_thread():
+        previous_handler = signal.getsignal(signal.SIGTERM)
+
+        def _flush_on_sigterm(signum, frame):
+            _saver.stop()
+            if callable(previous_handler):
+                previous_handler(signum, frame)
+            else:
+                sys.exit(0)
+
+        signal.signal(signal.SIGTERM, _flush_on_sigterm)
+    print(f"Order write-behind saver started (window: {window_seconds}s)")
+    return _saver
+
+def flush_orders():
+    """Write any pending order changes immediately"""
+    if _saver is not None:
+        _saver.flush()
+
+def _write_orders(changed_orders, deleted_ids, full):
+    store = get_order_store()
+    if full:
+        store.replace_all(orders.snapshot())
+    elif changed_orders or deleted_ids:
+        all_orders = orders.snapshot() if store.writes_whole_file else None
+        store.write_batch(orders.snapshot(changed_orders), deleted_ids, all_orders)
+
+def save_orders(changed_orders=None):
+    """Save orders to the configured store.
+
+    If `changed_orders` is given, only those orders are written (when the backend
+    supports it); otherwise the full list is persisted. Once the write-behind saver
+    is running this only marks the orders dirty.
+    """
+    if changed_orders is not None:
+        changed_orders = list(changed_orders)
+        if not changed_orders:
+            return
+    orders.touch(changed_orders)
+    if changed_orders is None:
+        publish('orders', {'version': orders.revision, 'reset': True})
+    else:
+        publish('orders', {'version': orders.revision, 'changed': [order['id'] for order in changed_orders]})
+    if _saver is not None:
+        _saver.mark_dirty(changed_orders)
+        return
     try:
-        with open(ORDERS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(orders, f, indent=2, ensure_ascii=False)
-    except IOError as e:
+        _write_orders(changed_orders or [], set(), changed_orders is None)
+    except (IOError, sqlite3.Error) as e:
         print(f"Error saving orders: {e}")
 
+def delete_orders(order_ids):
+    """Remove orders from memory and from the configured store"""
+    from .tracking_events import get_event_store
+    from .tracking_updates import get_change_log
+    order_ids = {int(order_id) for order_id in order_ids}
+    tracking_numbers = {
+        orders.get_by_id(order_id).get('tracking_number', '')
+        for order_id in order_ids
+        if orders.get_by_id(order_id)
+    }
+    orders.remove_ids(order_ids)
+    publish('orders', {'version': orders.revision, 'deleted': sorted(order_ids)})
+    # Drop event histories no remaining order refers to
+    for tracking_number in tracking_numbers:
+        if tracking_number and not orders.get_by_tracking_number(tracking_number):
+            get_event_store().delete(tracking_number)
+    get_change_log().delete(order_ids)
+    if _saver is not None:
+        _saver.mark_deleted(order_ids)
+        return
+    try:
+        _write_orders([], order_ids, False)
+    except (IOError, sqlite3.Error) as e:
+        print(f"Error deleting orders: {e}")
+
 def get_next_order_id():
     """Get the next available order ID"""
-    if not orders:
-        return 1
-    return max(order['id'] for order in orders) + 1
-
+    return orders.next_id()
@@ -0,0 +1,111 @@
+"""Streaming export of orders to CSV and NDJSON"""
+import csv
+import io
+import json
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+
+CSV_HEADERS = [
+    'ID',
+    'Order ID',
+    'Product Title',
+    'Product URL',
+    'Product ID',
+    'Price',
+    'Tracking Number',
+    'Status',
+    'Latest Update',
+    'Order Date',
+    'Last Update Date',
+    'Added Date',
+    'Carrier',
+    'Doar Israel Status',
+    'Doar Israel Status Field',
+    'Doar Israel Delivery Type',
+    'Doar Israel Last Event',
+    'Sub Items Count',
+    'Sub Items'
+]
+
+# Rows are written to the response in batches of this size
+ROWS_PER_CHUNK = 200
+
+def _format_event(event):
+    if not event:
+        return ''
+    return f"{event.get('date') or ''} - {event.get('description') or ''}".strip()
+
+def _format_sub_item(item):
+    text = f"{item.get('product_id') or ''}: {item.get('product_title') or ''}"
+    if item.get('price'):
+        text += f" ({item['price']})"
+    return text
+
+def export_record(order):
+    """Flatten an order into the fields shared by all export formats"""
+    tracking_info = order.get('tracking_info') or {}
+    doar_info = order.get('doar_tracking_info') or {}
+    return {
+        'id': order.get('id'),
+        'order_id': order.get('order_id') or '',
+        'product_title': order.get('product_title') or '',
+        'product_url': order.get('product_url') or '',
+        'product_id': order.get('product_id') or '',
+        'price': order.get('price') or '',
+        'tracking_number': order.get('tracking_number') or '',
+        'status': tracking_info.get('status') or order.get('status') or 'Pending',
+        'latest_update': tracking_info.get('latest_standerd_desc') or '',
+        'order_date': order.get('order_date') or order.get('added_date') or '',
+        'last_update_date': tracking_info.get('last_update_date') or '',
+        'added_date': order.get('added_date') or '',
+        'carrier': tracking_info.get('carrier') or '',
+        'doar_status': doar_info.get('status') or '',
+        'doar_status_field': doar_info.get('status_field') or '',
+        'doar_delivery_type': doar_info.get('delivery_type') or '',
+        'doar_last_event': doar_info.get('last_event'),
+        'sub_items': order.get('sub_items') or []
+    }
+
+def _csv_row(record):
+    row = [record[key] for key in (
+        'id', 'order_id', 'product_title', 'product_url', 'product_id', 'price',
+        'tracking_number', 'status', 'latest_update', 'order_date', 'last_update_date',
+        'added_date', 'carrier', 'doar_status', 'doar_status_field', 'doar_delivery_type'
+    )]
+    row.append(_format_event(record['doar_last_event']))
+    row.append(len(record['sub_items']))
+    row.append(' | '.join(_format_sub_item(item) for item in record['sub_items']))
+    return row
+
+def iter_csv(orders_iter):
+    """Yield CSV text for the orders, a chunk of rows at a time"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADERS)
+    for count, order in enumerate(orders_iter, start=1):
+        writer.writerow(_csv_row(export_record(order)))
+        if count % ROWS_PER_CHUNK == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def iter_ndjson(orders_iter):
+    """Yield one JSON object per line for the orders, a chunk of lines at a time"""
+    lines = []
+    for order in orders_iter:
+        lines.append(json.dumps(export_record(order), ensure_ascii=False))
+        if len(lines) >= ROWS_PER_CHUNK:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+def iter_export(orders_iter, export_format):
+    """Stream orders in `export_format` ('csv' or 'ndjson')"""
+    if export_format == 'ndjson':
+        return iter_ndjson(orders_iter)
+    return iter_csv(orders_iter)
@@ -0,0 +1,247 @@
+"""Server-side filtering, sorting and pagination of orders"""
+import base64
+import bisect
+import functools
+import json
+import re
+import threading
+from datetime import datetime
+from .order import orders
+
+DOAR_DELIVERED_STATUS = 'נמסר'
+
+# Sort name -> (sort key field, descending)
+SORTS = {
+    'added_date_desc': ('added_date', True),
+    'added_date_asc': ('added_date', False),
+    'order_date_desc': ('order_date', True),
+    'order_date_asc': ('order_date', False),
+    'last_update_desc': ('last_update', True),
+    'last_update_asc': ('last_update', False),
+    'product_title_asc': ('product_title', False),
+    'product_title_desc': ('product_title', True),
+    'tracking_number_asc': ('tracking_number', False),
+    'tracking_number_desc': ('tracking_number', True),
+    'price_asc': ('price', False),
+    'price_desc': ('price', True),
+    'status_asc': ('status', False),
+    'doar_status_asc': ('doar_status', False),
+    'doar_status_desc': ('doar_status', True),
+}
+DEFAULT_SORT = 'added_date_desc'
+
+_DATE_FORMATS = ['%b %d, %Y', '%B %d, %Y', '%Y-%m-%d %H:%M:%S', '%Y/%m/%d %H:%M:%S', '%Y/%m/%d']
+
+def parse_date(value):
+    """Parse the date formats found in orders into a timestamp (None if unparseable)"""
+    if not value or not isinstance(value, str):
+        return None
+    value = value.strip()
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        pass
+    for date_format in _DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).timestamp()
+        except ValueError:
+            continue
+    return None
+
+def parse_price(price):
+    """Extract the numeric value from a price string like 'US $42.57' (None if missing)"""
+    if not price:
+        return None
+    match = re.search(r'[\d,]+\.?\d*', str(price))
+    if not match:
+        return None
+    try:
+        return float(match.group(0).replace(',', ''))
+    except ValueError:
+        return None
+
+def order_status(order):
+    """The status shown in the table: Cainiao status, then order status, then 'Pending'"""
+    tracking_info = order.get('tracking_info') or {}
+    return tracking_info.get('status') or order.get('status') or 'Pending'
+
+def is_order_delivered(order):
+    """Whether the order is delivered according to Cainiao or Doar Israel"""
+    tracking_info = order.get('tracking_info') or {}
+    primary_status = (tracking_info.get('status') or order.get('status') or '').lower()
+    if primary_status == 'delivered':
+        return True
+    doar_status = (order.get('doar_tracking_info') or {}).get('status') or ''
+    return doar_status.strip() == DOAR_DELIVERED_STATUS
+
+def _compute_keys(order):
+    """Precompute everything filters and sorts need from an order"""
+    tracking_info = order.get('tracking_info') or {}
+    doar_tracking_info = order.get('doar_tracking_info') or {}
+    title = order.get('product_title') or ''
+    tracking_number = order.get('tracking_number') or ''
+    status = order_status(order).lower()
+    return {
+        'search': [title.lower(), tracking_number.lower(), str(order.get('product_id') or '').lower()],
+        'status': status,
+        'delivered': is_order_delivered(order),
+        # Like the previous client-side sort, a missing added date sorts as the epoch
+        'added_date': parse_date(order.get('added_date')) or 0,
+        'order_date': parse_date(order.get('order_date') or order.get('added_date')),
+        'last_update': parse_date(tracking_info.get('last_update_date')),
+        'product_title': title.casefold(),
+        'tracking_number': tracking_number.lower() or None,
+        'price': parse_price(order.get('price')),
+        'doar_status': (doar_tracking_info.get('status') or '').lower() or None,
+    }
+
+def order_keys(order):
+    """Get the cached filter/sort keys for an order"""
+    return orders.derived(order, _compute_keys)
+
+@functools.total_ordering
+class _Descending:
+    """Wraps a value so that it sorts in reverse order"""
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+    def __lt__(self, other):
+        return self.value > other.value
+
+def _sort_key(descending, value, order_id):
+    """Full ordering key: orders without a value go last, ties are broken by id"""
+    if value is None:
+        return (1, 0, order_id)
+    return (0, _Descending(value) if descending else value, order_id)
+
+# Sort name -> (orders revision, sorted keys, orders in the same order)
+_sorted_cache = {}
+_sorted_cache_lock = threading.Lock()
+
+def _sorted_orders(sort):
+    """Get all orders sorted by `sort`, reusing the result until an order changes"""
+    field, descending = SORTS[sort]
+    with _sorted_cache_lock:
+        cached = _sorted_cache.get(sort)
+        if cached and cached[0] == orders.revision:
+            return cached[1], cached[2]
+        revision = orders.revision
+        decorated = sorted(
+            ((_sort_key(descending, order_keys(o)[field], o['id']), o) for o in list(orders)),
+            key=lambda item: item[0]
+        )
+        keys = [item[0] for item in decorated]
+        sorted_orders = [item[1] for item in decorated]
+        _sorted_cache[sort] = (revision, keys, sorted_orders)
+        return keys, sorted_orders
+
+def encode_cursor(sort, order):
+    """Encode the position just after `order` in `sort` order"""
+    value = order_keys(order)[SORTS[sort][0]]
+    payload = json.dumps([sort, value, order['id']], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor, sort):
+    """Decode a cursor into a sort key; raises ValueError if it is invalid for `sort`"""
+    try:
+        cursor_sort, value, order_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (TypeError, ValueError) as e:
+        raise ValueError(f'Invalid cursor: {e}')
+    if cursor_sort != sort:
+        raise ValueError('Cursor does not match the requested sort')
+    return _sort_key(SORTS[sort][1], value, int(order_id))
+
+def _matches(keys, q, status, hide_delivered):
+    if status and keys['status'] != status:
+        return False
+    if hide_delivered and keys['delivered']:
+        return False
+    if q and not any(q in text for text in keys['search']):
+        return False
+    return True
+
+def iter_orders(q='', status='', hide_delivered=False, sort=None):
+    """Get an iterator over every order matching the filters, in `sort` order (storage order if None).
+
+    Raises ValueError for an unknown sort straight away rather than on first iteration.
+    """
+    if sort and sort not in SORTS:
+        raise ValueError(f'Unknown sort: {sort}')
+    q = (q or '').strip().lower()
+    status = (status or '').strip().lower()
+    source = _sorted_orders(sort)[1] if sort else list(orders)
+    return (order for order in source if _matches(order_keys(order), q, status, hide_delivered))
+
+def query_orders(q='', status='', hide_delivered=False, sort=None, limit=None, cursor=None):
+    """Filter, sort and paginate orders.
+
+    Returns a dict with the page of `orders`, the `total` number of orders, the number
+    of orders that `matched` the filters and a `next_cursor` (None on the last page).
+    Raises ValueError for an unknown sort or invalid cursor.
+    """
+    if sort and sort not in SORTS:
+        raise ValueError(f'Unknown sort: {sort}')
+    if (cursor or limit is not None) and not sort:
+        # Storage order has no stable position to resume from, so pages are always sorted
+        sort = DEFAULT_SORT
+    q = (q or '').strip().lower()
+    status = (status or '').strip().lower()
+
+    if sort:
+        keys, source = _sorted_orders(sort)
+    else:
+        keys, source = None, list(orders)
+
+    start = 0
+    if cursor:
+        start = bisect.bisect_right(keys, decode_cursor(cursor, sort))
+
+    page = []
+    matched = 0
+    has_more = False
+    for index, order in enumerate(source):
+        if not _matches(order_keys(order), q, status, hide_delivered):
+            continue
+        matched += 1
+        if index < start:
+            continue
+        if limit is None or len(page) < limit:
+            page.append(order)
+        else:
+            has_more = True
+
+    next_cursor = None
+    if has_more and page:
+        next_cursor = encode_cursor(sort, page[-1])
+    return {
+        'orders': page,
+        'total': len(source),
+        'matched': matched,
+        'next_cursor': next_cursor
+    }
+
+def query_order_changes(since, q='', status='', hide_delivered=False, sort=None, limit=None, cursor=None):
+    """Get what changed in a page of a query since version `since`.
+
+    Returns `ids` (the page's order ids, in order), the `changed` orders on the page,
+    the `deleted` order ids, plus the same counts and cursor as query_orders(), so a
+    client holding more than one page follows `next_cursor`. The client keeps its
+    copy of unchanged orders and drops anything not in `ids`. If the changes can't be
+    reconstructed, returns the full page instead with `reset` set.
+    """
+    changes = orders.changes_since(since)
+    result = query_orders(q=q, status=status, hide_delivered=hide_delivered, sort=sort, limit=limit, cursor=cursor)
+    if changes is None:
+        result['reset'] = True
+        return result
+    _, deleted = changes
+    page = result.pop('orders')
+    result['ids'] = [order['id'] for order in page]
+    result['changed'] = [order for order in page if orders.version_of(order) > since]
+    result['deleted'] = deleted
+    return result
@@ -0,0 +1,215 @@
+"""Adaptive per-tracking-number polling schedule for the auto-updater.
+
+Each (provider, tracking number) gets its own next-poll time, planned from the
+parcel's stage (out for delivery parcels are polled often, pending/in-transit ones at
+the configured base interval), how long ago its last tracking event happened and
+whether the last polls found anything new. Delivered parcels are not polled at all.
+The schedule is stored next to the tracking events so it survives restarts.
+"""
+import sqlite3
+import threading
+import time
+from config import (
+    TRACKING_EVENTS_DB_FILE,
+    get_auto_update_interval_hours,
+    get_poll_min_interval_minutes,
+    get_poll_max_interval_hours
+)
+from .order import normalize_tracking_number
+from .order_query import parse_date, DOAR_DELIVERED_STATUS
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+# Keywords (lower-case) that mean the parcel is about to arrive
+FAST_POLL_KEYWORDS = (
+    'out for delivery', 'delivering', 'ready for pickup', 'ready for collection',
+    'pick up', 'pickup', 'arrived at pickup', 'יצא לחלוקה', 'ממתין לאיסוף', 'נמסר לשליח'
+)
+CUSTOMS_KEYWORDS = ('customs', 'מכס')
+
+FAST_POLL_INTERVAL = 1 * HOUR
+# A change seen within this long halves the interval
+RECENT_CHANGE_WINDOW = 1 * DAY
+# (minimum age of the last event, interval multiplier)
+STAGNATION_FACTORS = ((21 * DAY, 4), (7 * DAY, 2))
+
+def classify_stage(provider, tracking_info):
+    """Get the polling stage of a parcel: 'delivered', 'arriving', 'customs', 'in_transit' or 'pending'"""
+    tracking_info = tracking_info if isinstance(tracking_info, dict) else {}
+    status = (tracking_info.get('status') or '').strip()
+    if provider == 'doar' and status == DOAR_DELIVERED_STATUS:
+        return 'delivered'
+    if provider == 'cainiao' and status.lower() == 'delivered':
+        return 'delivered'
+    if not status or status.lower() in ('unknown', 'error', 'pending') or tracking_info.get('error'):
+        return 'pending'
+    text = ' '.join(
+        str(tracking_info.get(key) or '') for key in ('status', 'latest_standerd_desc', 'status_field')
+    ).lower()
+    if any(keyword in text for keyword in FAST_POLL_KEYWORDS):
+        return 'arriving'
+    if any(keyword in text for keyword in CUSTOMS_KEYWORDS):
+        return 'customs'
+    return 'in_transit'
+
+def tracking_signature(tracking_info):
+    """A short string that changes whenever the parcel's tracking changes"""
+    tracking_info = tracking_info if isinstance(tracking_info, dict) else {}
+    last_event = tracking_info.get('last_event') or {}
+    return '|'.join(str(value or '') for value in (
+        tracking_info.get('status'),
+        tracking_info.get('event_count'),
+        tracking_info.get('last_update_date'),
+        last_event.get('date') if isinstance(last_event, dict) else ''
+    ))
+
+def plan_interval(provider, tracking_info, last_changed_at, now):
+    """Get (stage, seconds until the next poll), or (stage, None) if it needs no more polling"""
+    stage = classify_stage(provider, tracking_info)
+    if stage == 'delivered':
+        return stage, None
+    base = get_auto_update_interval_hours() * HOUR
+    interval = FAST_POLL_INTERVAL if stage == 'arriving' else base
+
+    if stage != 'arriving':
+        last_event_at = parse_date((tracking_info or {}).get('last_update_date'))
+        if last_event_at is not None:
+            age = now - last_event_at
+            for min_age, factor in STAGNATION_FACTORS:
+                if age >= min_age:
+                    interval *= factor
+                    break
+    if last_changed_at and now - last_changed_at < RECENT_CHANGE_WINDOW:
+        interval /= 2
+
+    min_interval = get_poll_min_interval_minutes() * 60
+    max_interval = get_poll_max_interval_hours() * HOUR
+    return stage, max(min_interval, min(max_interval, interval))
+
+class PollSchedule:
+    """Stores the next poll time of each (provider, tracking number) in SQLite"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS poll_schedule ('
+            'provider TEXT NOT NULL, '
+            'tracking_number TEXT NOT NULL, '
+            'next_poll_at REAL NOT NULL, '
+            'last_polled_at REAL, '
+            'last_changed_at REAL, '
+            'stage TEXT, '
+            'signature TEXT, '
+            'PRIMARY KEY (provider, tracking_number))'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS poll_schedule_next ON poll_schedule (next_poll_at)')
+        self._conn.commit()
+
+    def _rows(self, provider):
+        return {
+            row[0]: {'last_polled_at': row[1], 'last_changed_at': row[2], 'signature': row[3]}
+            for row in self._conn.execute(
+                'SELECT tracking_number, last_polled_at, last_changed_at, signature '
+                'FROM poll_schedule WHERE provider = ?', (provider,)
+            )
+        }
+
+    def sync(self, provider, tracking_infos, now=None):
+        """Make the schedule match the parcels currently tracked for a provider.
+
+        `tracking_infos` maps each tracking number to its current tracking_info. New
+        numbers are planned from their last refresh time (so they are due right away
+        if that is long ago), and numbers that are gone or delivered are dropped.
+        """
+        now = now or time.time()
+        infos = {normalize_tracking_number(tn): info for tn, info in tracking_infos.items() if normalize_tracking_number(tn)}
+        with self._lock, self._conn:
+            existing = self._rows(provider)
+            removed = [(provider, tn) for tn in existing if tn not in infos]
+            added = []
+            for tn, info in infos.items():
+                stage, interval = plan_interval(provider, info, None, now)
+                if interval is None:
+                    if tn in existing:
+                        removed.append((provider, tn))
+                    continue
+                if tn in existing:
+                    continue
+                last_refresh = parse_date((info or {}).get('last_update')) or now
+                added.append((provider, tn, last_refresh + interval, last_refresh, None, stage, tracking_signature(info)))
+            self._conn.executemany('DELETE FROM poll_schedule WHERE provider = ? AND tracking_number = ?', removed)
+            self._conn.executemany(
+                'INSERT INTO poll_schedule '
+                '(provider, tracking_number, next_poll_at, last_polled_at, last_changed_at, stage, signature) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                added
+            )
+
+    def due(self, provider, until=None):
+        """Get the tracking numbers of a provider that should be polled by `until`"""
+        until = until or time.time()
+        with self._lock:
+            return [row[0] for row in self._conn.execute(
+                'SELECT tracking_number FROM poll_schedule WHERE provider = ? AND next_poll_at <= ?',
+                (provider, until)
+            )]
+
+    def record_polls(self, provider, tracking_infos, now=None):
+        """Plan the next poll for each polled tracking number from its new tracking_info"""
+        now = now or time.time()
+        with self._lock, self._conn:
+            existing = self._rows(provider)
+            for tracking_number, info in tracking_infos.items():
+                tn = normalize_tracking_number(tracking_number)
+                if not tn:
+                    continue
+                previous = existing.get(tn, {})
+                signature = tracking_signature(info)
+                last_changed_at = previous.get('last_changed_at')
+                if signature != previous.get('signature'):
+                    last_changed_at = now
+                stage, interval = plan_interval(provider, info, last_changed_at, now)
+                if interval is None:
+                    self._conn.execute(
+                        'DELETE FROM poll_schedule WHERE provider = ? AND tracking_number = ?', (provider, tn)
+                    )
+                    continue
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO poll_schedule '
+                    '(provider, tracking_number, next_poll_at, last_polled_at, last_changed_at, stage, signature) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (provider, tn, now + interval, now, last_changed_at, stage, signature)
+                )
+
+    def next_poll_at(self):
+        """Get the earliest next-poll time of any parcel (None if nothing is scheduled)"""
+        with self._lock:
+            row = self._conn.execute('SELECT MIN(next_poll_at) FROM poll_schedule').fetchone()
+        return row[0] if row else None
+
+    def summary(self):
+        """Count scheduled parcels per provider and stage"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT provider, stage, COUNT(*), MIN(next_poll_at) FROM poll_schedule GROUP BY provider, stage'
+            ).fetchall()
+        summary = {}
+        for provider, stage, count, next_poll_at in rows:
+            summary.setdefault(provider, {})[stage] = {'count': count, 'next_poll_at': next_poll_at}
+        return summary
+
+_poll_schedule = None
+_poll_schedule_lock = threading.Lock()
+
+def get_poll_schedule():
+    """Get the poll schedule, creating it on first use"""
+    global _poll_schedule
+    with _poll_schedule_lock:
+        if _poll_schedule is None:
+            _poll_schedule = PollSchedule(TRACKING_EVENTS_DB_FILE)
+        return _poll_schedule
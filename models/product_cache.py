@@ -0,0 +1,156 @@
+"""Persistent cache of product metadata by AliExpress product id.
+
+Adding an order by link, importing orders and re-adding a product all need the same
+few facts about a product: its title, image URL and locally saved image. They are
+kept here (in `product_cache.db`) so a product already seen is not scraped or
+downloaded again. Entries expire `product_cache_ttl_days` after they were fetched,
+and the least recently used ones are evicted beyond `product_cache_max_entries`.
+"""
+import os
+import sqlite3
+import threading
+import time
+from config import PRODUCT_CACHE_DB_FILE, IMAGES_DIR, get_product_cache_ttl_days, get_product_cache_max_entries
+from .order import orders
+
+LOCAL_IMAGE_PREFIX = '/static/images/products/'
+
+def local_image_exists(image_path):
+    """Check whether a `/static/images/products/...` path still has its file"""
+    if not image_path or not image_path.startswith(LOCAL_IMAGE_PREFIX):
+        return False
+    return os.path.exists(os.path.join(IMAGES_DIR, os.path.basename(image_path)))
+
+def is_placeholder_title(title, product_id=None):
+    """Check whether a title is one of the stand-ins used when extraction failed"""
+    return (
+        not title
+        or title == 'Unknown Product'
+        or title.startswith('Error loading product')
+        or (product_id is not None and title == f'Product {product_id}')
+    )
+
+class ProductCache:
+    """Stores one row per product id in SQLite, with TTL expiry and LRU eviction"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS product_cache ('
+            'product_id TEXT PRIMARY KEY, '
+            'title TEXT NOT NULL, '
+            'image_url TEXT, '
+            'local_image_path TEXT, '
+            'fetched_at REAL NOT NULL, '
+            'last_used_at REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS product_cache_last_used ON product_cache (last_used_at)')
+        self._conn.commit()
+
+    def get(self, product_id):
+        """Get a product's cached metadata (None if unknown or expired) and mark it as used.
+
+        Returns {'product_id', 'title', 'image_url', 'local_image_path', 'fetched_at'}.
+        """
+        if not product_id:
+            return None
+        now = time.time()
+        ttl_seconds = get_product_cache_ttl_days() * 86400
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                'SELECT title, image_url, local_image_path, fetched_at FROM product_cache WHERE product_id = ?',
+                (str(product_id),)
+            ).fetchone()
+            if row is None:
+                return None
+            if ttl_seconds <= 0 or row[3] < now - ttl_seconds:
+                self._conn.execute('DELETE FROM product_cache WHERE product_id = ?', (str(product_id),))
+                return None
+            self._conn.execute('UPDATE product_cache SET last_used_at = ? WHERE product_id = ?', (now, str(product_id)))
+        title, image_url, local_image_path, fetched_at = row
+        return {
+            'product_id': str(product_id),
+            'title': title,
+            'image_url': image_url or '',
+            'local_image_path': local_image_path or '',
+            'fetched_at': fetched_at
+        }
+
+    def put(self, product_id, title, image_url=None, local_image_path=None, fetched_at=None):
+        """Store a product's metadata, evicting expired and least recently used entries"""
+        if not product_id or not title or get_product_cache_ttl_days() <= 0:
+            return
+        now = time.time()
+        max_entries = max(1, get_product_cache_max_entries())
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO product_cache '
+                '(product_id, title, image_url, local_image_path, fetched_at, last_used_at) VALUES (?, ?, ?, ?, ?, ?)',
+                (str(product_id), title, image_url or '', local_image_path or '', fetched_at or now, now)
+            )
+            self._conn.execute(
+                'DELETE FROM product_cache WHERE fetched_at < ?', (now - get_product_cache_ttl_days() * 86400,)
+            )
+            excess = self._conn.execute('SELECT COUNT(*) FROM product_cache').fetchone()[0] - max_entries
+            if excess > 0:
+                self._conn.execute(
+                    'DELETE FROM product_cache WHERE product_id IN '
+                    '(SELECT product_id FROM product_cache ORDER BY last_used_at LIMIT ?)',
+                    (excess,)
+                )
+
+    def delete(self, product_id):
+        """Forget a product, e.g. so its page is scraped again"""
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM product_cache WHERE product_id = ?', (str(product_id),))
+
+_product_cache = None
+_product_cache_lock = threading.Lock()
+
+def get_product_cache():
+    """Get the product cache, creating it on first use"""
+    global _product_cache
+    with _product_cache_lock:
+        if _product_cache is None:
+            _product_cache = ProductCache(PRODUCT_CACHE_DB_FILE)
+        return _product_cache
+
+def _known_product_in_orders(product_id):
+    """Find a product in the existing orders and sub-items (None if no order has it).
+
+    Sub-items are preferred: a multi-item order's own title is a combined one.
+    """
+    for order in orders.get_by_product_id(product_id):
+        sub_items = order.get('sub_items') or []
+        for item in sub_items:
+            if str(item.get('product_id') or '') == product_id and not is_placeholder_title(item.get('product_title'), product_id):
+                return item.get('product_title'), item.get('product_image', '')
+        if not sub_items and str(order.get('product_id') or '') == product_id and not is_placeholder_title(order.get('product_title'), product_id):
+            return order.get('product_title'), order.get('product_image', '')
+    return None
+
+def lookup_product(product_id):
+    """Get a product's metadata from the cache, or from an order that already has it.
+
+    A product found in the orders is added to the cache. Returns the same dict as
+    ProductCache.get() or None.
+    """
+    if not product_id or get_product_cache_ttl_days() <= 0:
+        return None
+    product_id = str(product_id)
+    cache = get_product_cache()
+    cached = cache.get(product_id)
+    if cached is not None:
+        return cached
+    known = _known_product_in_orders(product_id)
+    if known is None:
+        return None
+    title, image = known
+    local_image_path = image if local_image_exists(image) else ''
+    image_url = '' if local_image_path else image
+    cache.put(product_id, title, image_url, local_image_path)
+    return cache.get(product_id)
@@ -0,0 +1,134 @@
+"""Per-tracking-number storage for tracking event histories.
+
+Full event lists are kept out of the order records (which are loaded at startup and
+sent with every `/api/orders` response) and are only read when the events modal asks
+for them.
+"""
+import json
+import sqlite3
+import threading
+from config import TRACKING_EVENTS_DB_FILE
+from .order import normalize_tracking_number
+
+class TrackingEventStore:
+    """Stores one row of events per (provider, tracking number) in SQLite"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS tracking_events ('
+            'provider TEXT NOT NULL, '
+            'tracking_number TEXT NOT NULL, '
+            'events TEXT NOT NULL, '
+            'PRIMARY KEY (provider, tracking_number))'
+        )
+        self._conn.commit()
+
+    def get(self, provider, tracking_number):
+        """Get the stored events for a tracking number (empty list if none)"""
+        key = normalize_tracking_number(tracking_number)
+        if not key:
+            return []
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT events FROM tracking_events WHERE provider = ? AND tracking_number = ?',
+                (provider, key)
+            ).fetchone()
+        return json.loads(row[0]) if row else []
+
+    def get_many(self, provider, tracking_numbers):
+        """Get the stored events of several tracking numbers, keyed by normalized tracking number"""
+        keys = list({normalize_tracking_number(tn) for tn in tracking_numbers} - {''})
+        events = {}
+        with self._lock:
+            # Stay well below SQLite's limit on query parameters
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows = self._conn.execute(
+                    'SELECT tracking_number, events FROM tracking_events '
+                    f'WHERE provider = ? AND tracking_number IN ({", ".join("?" * len(chunk))})',
+                    [provider] + chunk
+                ).fetchall()
+                events.update((tracking_number, json.loads(value)) for tracking_number, value in rows)
+        return events
+
+    def put_many(self, provider, events_by_tracking_number):
+        """Store events for several tracking numbers in a single transaction"""
+        rows = [
+            (provider, normalize_tracking_number(tracking_number), json.dumps(events, ensure_ascii=False))
+            for tracking_number, events in events_by_tracking_number.items()
+            if normalize_tracking_number(tracking_number)
+        ]
+        if not rows:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO tracking_events (provider, tracking_number, events) VALUES (?, ?, ?)',
+                rows
+            )
+
+    def put(self, provider, tracking_number, events):
+        """Store the events for one tracking number"""
+        self.put_many(provider, {tracking_number: events})
+
+    def delete(self, tracking_number):
+        """Delete the events of all providers for a tracking number"""
+        key = normalize_tracking_number(tracking_number)
+        if not key:
+            return
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM tracking_events WHERE tracking_number = ?', (key,))
+
+_event_store = None
+_event_store_lock = threading.Lock()
+
+def get_event_store():
+    """Get the tracking event store, creating it on first use"""
+    global _event_store
+    with _event_store_lock:
+        if _event_store is None:
+            _event_store = TrackingEventStore(TRACKING_EVENTS_DB_FILE)
+        return _event_store
+
+def slim_tracking_info(tracking_info):
+    """Return a copy of tracking_info without the events list, plus an event summary"""
+    events = tracking_info.get('events') or []
+    slim = {key: value for key, value in tracking_info.items() if key != 'events'}
+    slim['event_count'] = len(events)
+    if events:
+        # Events are stored oldest first
+        slim['last_event'] = events[-1]
+    return slim
+
+def detach_events(provider, tracking_number, tracking_info):
+    """Move tracking_info['events'] to the event store and return the slim tracking_info.
+
+    `provider` is 'cainiao' or 'doar'. Error results do not overwrite stored events.
+    """
+    if not isinstance(tracking_info, dict) or 'events' not in tracking_info:
+        return tracking_info
+    if not tracking_info.get('error'):
+        get_event_store().put(provider, tracking_number, tracking_info.get('events') or [])
+    return slim_tracking_info(tracking_info)
+
+def detach_events_bulk(provider, results_by_tracking_number):
+    """Like detach_events() for a {tracking_number: tracking_info} dict, in one transaction"""
+    to_store = {}
+    slim_results = {}
+    for tracking_number, tracking_info in results_by_tracking_number.items():
+        if not isinstance(tracking_info, dict) or 'events' not in tracking_info:
+            slim_results[tracking_number] = tracking_info
+            continue
+        if not tracking_info.get('error'):
+            to_store[tracking_number] = tracking_info.get('events') or []
+        slim_results[tracking_number] = slim_tracking_info(tracking_info)
+    get_event_store().put_many(provider, to_store)
+    return slim_results
+
+def get_events(provider, tracking_number):
+    """Get the stored events for a tracking number"""
+    return get_event_store().get(provider, tracking_number)
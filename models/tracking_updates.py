@@ -0,0 +1,184 @@
+"""Incremental application of freshly fetched tracking information to orders.
+
+A refresh result is compared with what the orders already hold (status, summary
+fields, event count and last event) and with the stored event history. Orders are
+only modified, and events only rewritten, when the parcel actually moved, so
+unchanged parcels cost no writes and don't bump the orders' change version. Each
+change is recorded in a compact per-order change log next to the tracking events.
+"""
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from config import TRACKING_EVENTS_DB_FILE
+from .order import normalize_tracking_number
+from .tracking_events import get_event_store, slim_tracking_info
+from .notifications import publish
+
+# Provider -> order field holding its tracking info
+INFO_KEYS = {'cainiao': 'tracking_info', 'doar': 'doar_tracking_info'}
+
+# Fields that differ on every fetch even if the parcel hasn't moved
+VOLATILE_FIELDS = ('last_update',)
+# Fields derived from the events; they count as changes but new events are reported instead
+EVENT_SUMMARY_FIELDS = ('event_count', 'last_event')
+
+MAX_CHANGES_PER_ORDER = 50
+
+def _event_key(event):
+    return json.dumps(event, sort_keys=True, ensure_ascii=False)
+
+def new_events(stored_events, events):
+    """Get the events that are not in the stored history"""
+    known = {_event_key(event) for event in stored_events}
+    return [event for event in events if _event_key(event) not in known]
+
+def _changed_fields(previous, current):
+    previous = previous if isinstance(previous, dict) else {}
+    return sorted(
+        key for key in set(previous) | set(current)
+        if key not in VOLATILE_FIELDS and previous.get(key) != current.get(key)
+    )
+
+def _apply_to_order(provider, order, slim):
+    """Put the new tracking info on an order; get the changes as {field: [old, new]}, empty if none"""
+    info_key = INFO_KEYS[provider]
+    previous = order.get(info_key) if isinstance(order.get(info_key), dict) else {}
+    fields = _changed_fields(previous, slim)
+    if not fields:
+        return {}
+    order[info_key] = slim
+    changes = {field: [previous.get(field), slim.get(field)] for field in fields if field not in EVENT_SUMMARY_FIELDS}
+    # A changed event summary alone still counts as a change
+    return changes or {'events': True}
+
+def _apply_order_fields(order, tracking_info):
+    """Copy the Cainiao status and earliest date to the order itself"""
+    changes = {}
+    status = tracking_info.get('status')
+    if status and status != 'Unknown' and order.get('status') != status:
+        changes['order_status'] = [order.get('status'), status]
+        order['status'] = status
+    if tracking_info.get('earliest_date') and not order.get('order_date'):
+        changes['order_date'] = [None, tracking_info['earliest_date']]
+        order['order_date'] = tracking_info['earliest_date']
+    return changes
+
+def apply_tracking_results(provider, results_by_tracking_number, orders_by_tracking_number):
+    """Apply fetched tracking infos to the orders that share each tracking number.
+
+    `provider` is 'cainiao' or 'doar', `results_by_tracking_number` maps tracking numbers
+    to full tracking infos (with events) and `orders_by_tracking_number` maps the same
+    tracking numbers to the orders to update. Events are stored only when they differ
+    from the stored history, and orders are modified only if something changed.
+
+    Returns (changed_orders, changes) where `changes` holds one change log entry per
+    changed order, with 'order_id'. The entries are also added to the change log.
+    """
+    stored = get_event_store().get_many(provider, results_by_tracking_number.keys())
+    changed_at = datetime.now().isoformat()
+    events_to_store = {}
+    changed_orders = {}
+    changes = []
+
+    for tracking_number, tracking_info in results_by_tracking_number.items():
+        if not isinstance(tracking_info, dict):
+            continue
+        events = tracking_info.get('events')
+        added_events = []
+        if events is not None and not tracking_info.get('error'):
+            stored_events = stored.get(normalize_tracking_number(tracking_number), [])
+            if events != stored_events:
+                events_to_store[tracking_number] = events
+                added_events = new_events(stored_events, events)
+        slim = slim_tracking_info(tracking_info) if events is not None else tracking_info
+
+        for order in orders_by_tracking_number.get(tracking_number) or []:
+            order_changes = _apply_to_order(provider, order, slim)
+            if provider == 'cainiao':
+                order_changes.update(_apply_order_fields(order, tracking_info))
+            if not order_changes:
+                continue
+            change = {
+                'order_id': order['id'],
+                'provider': provider,
+                'tracking_number': tracking_number,
+                'changed_at': changed_at,
+                'fields': {key: value for key, value in order_changes.items() if key != 'events'}
+            }
+            if added_events:
+                change['new_events'] = len(added_events)
+                change['latest_event'] = added_events[-1].get('description')
+            changed_orders[order['id']] = order
+            changes.append(change)
+
+    get_event_store().put_many(provider, events_to_store)
+    get_change_log().add_many(changes)
+    if changes:
+        publish('tracking', {'provider': provider, 'order_ids': list(changed_orders)})
+    return list(changed_orders.values()), changes
+
+class TrackingChangeLog:
+    """Keeps the last MAX_CHANGES_PER_ORDER tracking changes of each order in SQLite"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS tracking_changes ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+            'order_id INTEGER NOT NULL, '
+            'change TEXT NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS tracking_changes_order ON tracking_changes (order_id, id)')
+        self._conn.commit()
+
+    def add_many(self, changes):
+        """Append change entries (each with an 'order_id') in a single transaction"""
+        if not changes:
+            return
+        order_ids = {change['order_id'] for change in changes}
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'INSERT INTO tracking_changes (order_id, change) VALUES (?, ?)',
+                [(change['order_id'], json.dumps(change, ensure_ascii=False)) for change in changes]
+            )
+            self._conn.executemany(
+                'DELETE FROM tracking_changes WHERE order_id = ? AND id NOT IN '
+                '(SELECT id FROM tracking_changes WHERE order_id = ? ORDER BY id DESC LIMIT ?)',
+                [(order_id, order_id, MAX_CHANGES_PER_ORDER) for order_id in order_ids]
+            )
+
+    def get(self, order_id, limit=MAX_CHANGES_PER_ORDER):
+        """Get the recorded changes of an order, newest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT change FROM tracking_changes WHERE order_id = ? ORDER BY id DESC LIMIT ?',
+                (order_id, limit)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def delete(self, order_ids):
+        """Forget the changes of deleted orders"""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'DELETE FROM tracking_changes WHERE order_id = ?', [(order_id,) for order_id in order_ids]
+            )
+
+_change_log = None
+_change_log_lock = threading.Lock()
+
+def get_change_log():
+    """Get the tracking change log, creating it on first use"""
+    global _change_log
+    with _change_log_lock:
+        if _change_log is None:
+            _change_log = TrackingChangeLog(TRACKING_EVENTS_DB_FILE)
+        return _change_log
+
+def get_order_changes(order_id):
+    """Get the recorded tracking changes of an order, newest first"""
+    return get_change_log().get(order_id)
@@ -1,45 +1,141 @@
 """API routes for orders and tracking"""
-from flask import Blueprint, request, jsonify, Response
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+import requests
 from datetime import datetime
-from models.order import orders, save_orders, get_next_order_id
+from models.order import orders, save_orders, delete_orders, get_next_order_id
+from models.tracking_events import detach_events, get_events
+from models.product_cache import is_placeholder_title
+from models.tracking_updates import apply_tracking_results, get_order_changes
+from models.order_query import query_orders, query_order_changes, iter_orders
+from models.order_export import EXPORT_FORMATS, iter_export
+from models.poll_schedule import get_poll_schedule
+from models.notifications import get_notification_broker, format_sse
 from utils.images import download_and_save_image
 from utils.tracking import fetch_tracking_info, fetch_bulk_tracking_info
-from utils.aliexpress import extract_product_info
+from utils.aliexpress import extract_product_info, extract_product_infos, product_id_from_url
 from utils.doar_israel import fetch_doar_tracking_info
+from utils import http_client
+from utils.resilience import get_resilience_status
+from utils.scheduler import get_next_update_time
+from utils.jobs import get_job_manager
+from utils.tracking_refresh import refresh_all_cainiao, refresh_all_doar
+from utils.refresh_engine import get_refresh_engine
 from config import (
     get_doar_api_key,
     set_doar_api_key,
     get_cainiao_last_update,
-    set_cainiao_last_update,
     get_doar_last_update,
-    set_doar_last_update
+    get_batch_add_max_concurrency
 )
 
 api_bp = Blueprint('api', __name__)
 
+MAX_ORDERS_PAGE_SIZE = 500
+MAX_BATCH_ADD_ORDERS = 100
+
+# Seconds between keep-alive comments on an idle event stream, and how long browsers
+# wait before reconnecting a dropped one
+SSE_HEARTBEAT_SECONDS = 15
+SSE_RETRY_MS = 3000
+
+def _parse_bool_arg(name):
+    return request.args.get(name, '').lower() in ('1', 'true', 'yes', 'on')
+
+def _order_filter_args():
+    """Read the q/status/hide_delivered/sort query parameters shared by order listings"""
+    return {
+        'q': request.args.get('q', ''),
+        'status': request.args.get('status', ''),
+        'hide_delivered': _parse_bool_arg('hide_delivered'),
+        'sort': request.args.get('sort') or None
+    }
+
 @api_bp.route('/orders', methods=['GET'])
 def get_orders():
-    """Get all orders"""
-    return jsonify({'orders': orders})
+    """Get orders, optionally filtered, sorted and paginated.
+    
+    Query parameters: q (search text), status, hide_delivered, sort, limit, cursor.
+    Without parameters all orders are returned in storage order. With since=<version>
+    only the changes since that version are returned (see query_order_changes).
+    Responses carry the current version as ETag, and If-None-Match gets a 304 when
+    nothing has changed."""
+    version = orders.revision
+    if request.if_none_match.contains(str(version)):
+        response = Response(status=304)
+        response.set_etag(str(version))
+        return response
+    
+    limit = request.args.get('limit')
+    since = request.args.get('since')
+    try:
+        if limit is not None:
+            limit = max(1, min(int(limit), MAX_ORDERS_PAGE_SIZE))
+        if since is not None:
+            result = query_order_changes(int(since), limit=limit, cursor=request.args.get('cursor') or None, **_order_filter_args())
+        else:
+            result = query_orders(limit=limit, cursor=request.args.get('cursor') or None, **_order_filter_args())
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    result['version'] = version
+    response = jsonify(result)
+    response.set_etag(str(version))
+    return response
 
-@api_bp.route('/orders', methods=['POST'])
-def add_order():
-    """Add a new order from AliExpress link"""
-    data = request.json
-    aliexpress_url = data.get('url', '')
+@api_bp.route('/events', methods=['GET'])
+def event_stream():
+    """Push change notifications as Server-Sent Events.
     
-    if not aliexpress_url:
-        return jsonify({'error': 'URL is required'}), 400
+    Event types: 'orders' (version plus changed or deleted order ids, or reset),
+    'tracking' (orders whose tracking changed), 'job' (background job progress),
+    'scheduler' (a scheduled update finished) and 'resync' (notifications were
+    dropped, reload). A 'hello' event with the current orders version is sent first."""
+    broker = get_notification_broker()
+    subscription = broker.subscribe()
     
-    # Extract product info
-    product_info = extract_product_info(aliexpress_url)
+    def generate():
+        try:
+            yield f"retry: {SSE_RETRY_MS}\n\n"
+            yield format_sse((0, 'hello', {'version': orders.revision}))
+            while True:
+                event = subscription.get(timeout=SSE_HEARTBEAT_SECONDS)
+                yield format_sse(event) if event else ': keep-alive\n\n'
+        finally:
+            broker.unsubscribe(subscription)
+    
+    return Response(
+        generate(),
+        content_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@api_bp.route('/orders/export', methods=['GET'])
+def export_orders():
+    """Stream all orders matching the filters as CSV or NDJSON.
     
-    # Create order object
+    Takes the same q/status/hide_delivered/sort parameters as GET /orders, plus
+    format=csv (default) or format=ndjson."""
+    export_format = request.args.get('format', 'csv').lower()
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f'Unsupported export format: {export_format}'}), 400
+    try:
+        matching_orders = iter_orders(**_order_filter_args())
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    filename = f"aliexpress_orders_{datetime.now().strftime('%Y-%m-%d')}.{export_format}"
+    return Response(
+        stream_with_context(iter_export(matching_orders, export_format)),
+        content_type=EXPORT_FORMATS[export_format],
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+def _new_order(data, product_info, tracking_info=None):
+    """Build a new order from the fields of an add request, its product info and tracking info"""
     order = {
         'id': get_next_order_id(),
         'product_title': product_info['title'],
         'product_image': product_info['image_url'],
-        'product_url': aliexpress_url,
+        'product_url': data.get('url', ''),
         'product_id': product_info['product_id'],
         'tracking_number': data.get('tracking_number', ''),
         'status': data.get('status', 'Pending'),
@@ -49,25 +145,133 @@ def add_order():
         'tracking_info': None
     }
     
+    if tracking_info:
+        order['tracking_info'] = detach_events('cainiao', order['tracking_number'], tracking_info)
+        if tracking_info.get('status') and tracking_info['status'] != 'Unknown':
+            order['status'] = tracking_info['status']
+        if tracking_info.get('earliest_date'):
+            order['order_date'] = tracking_info['earliest_date']
+    return order
+
+@api_bp.route('/orders', methods=['POST'])
+def add_order():
+    """Add a new order from AliExpress link"""
+    data = request.json
+    aliexpress_url = data.get('url', '')
+    
+    if not aliexpress_url:
+        return jsonify({'error': 'URL is required'}), 400
+    
+    # Extract product info
+    product_info = extract_product_info(aliexpress_url)
+    
     # Fetch tracking info if tracking number is provided
-    if order['tracking_number']:
-        tracking_info = fetch_tracking_info(order['tracking_number'])
-        if tracking_info:
-            order['tracking_info'] = tracking_info
-            if tracking_info.get('status') and tracking_info['status'] != 'Unknown':
-                order['status'] = tracking_info['status']
-            if tracking_info.get('earliest_date'):
-                order['order_date'] = tracking_info['earliest_date']
+    tracking_info = None
+    if data.get('tracking_number', ''):
+        tracking_info = fetch_tracking_info(data['tracking_number'])
     
+    order = _new_order(data, product_info, tracking_info)
     orders.append(order)
-    save_orders()
+    save_orders([order])
     return jsonify({'order': order, 'message': 'Order added successfully'})
 
+def _product_key(aliexpress_url):
+    """What makes two links the same product: its id, else the link itself"""
+    return product_id_from_url(aliexpress_url) or aliexpress_url
+
+@api_bp.route('/orders/batch', methods=['POST'])
+def add_orders_batch():
+    """Add several orders from AliExpress links at once.
+    
+    Body: {"items": [...]} where each item is a link or an object with the same
+    fields as POST /orders (url, tracking_number, status, order_date, order_id).
+    Each product is extracted once however many items link to it, and up to
+    batch_add_max_concurrency products are extracted (page and image) at the same
+    time while the tracking numbers are looked up in bulk. All new orders are saved
+    together. Responds with one result per item, in request order; an item repeating
+    an earlier one (same product and tracking number) is reported as a duplicate
+    and not added again."""
+    data = request.json or {}
+    items = data.get('items')
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'items must be a non-empty list'}), 400
+    if len(items) > MAX_BATCH_ADD_ORDERS:
+        return jsonify({'error': f'At most {MAX_BATCH_ADD_ORDERS} items can be added at once'}), 400
+    
+    results = [None] * len(items)
+    accepted = []  # (index, item fields)
+    seen = set()
+    for index, item in enumerate(items):
+        fields = {'url': item} if isinstance(item, str) else item
+        if not isinstance(fields, dict) or not isinstance(fields.get('url'), str) or not fields['url'].strip():
+            results[index] = {'index': index, 'success': False, 'error': 'URL is required'}
+            continue
+        if not isinstance(fields.get('tracking_number') or '', str):
+            results[index] = {'index': index, 'url': fields['url'].strip(), 'success': False, 'error': 'tracking_number must be a string'}
+            continue
+        fields = dict(fields, url=fields['url'].strip(), tracking_number=(fields.get('tracking_number') or '').strip())
+        key = (_product_key(fields['url']), fields['tracking_number'])
+        if key in seen:
+            results[index] = {'index': index, 'url': fields['url'], 'success': False, 'duplicate': True, 'error': 'Duplicate of an earlier item'}
+            continue
+        seen.add(key)
+        accepted.append((index, fields))
+    
+    # Look up the tracking numbers in bulk on a job thread while the products are extracted
+    tracking_numbers = list(dict.fromkeys(fields['tracking_number'] for _, fields in accepted if fields['tracking_number']))
+    tracking_future = None
+    if tracking_numbers:
+        tracking_future = get_refresh_engine().call_later(0, lambda: fetch_bulk_tracking_info(tracking_numbers))
+    
+    # One extraction per product, shared by every item that links to it
+    products = {}
+    for _, fields in accepted:
+        products.setdefault(_product_key(fields['url']), fields['url'])
+    print(f"Batch add: extracting {len(products)} products for {len(accepted)} items...")
+    product_infos = dict(zip(products, extract_product_infos(list(products.values()), get_batch_add_max_concurrency())))
+    
+    tracking_infos = {}
+    if tracking_future is not None:
+        try:
+            tracking_infos = tracking_future.result()
+        except Exception as e:
+            print(f"Error fetching tracking info for batch add: {e}")
+    
+    new_orders = []
+    for index, fields in accepted:
+        result = {'index': index, 'url': fields['url'], 'success': True}
+        tracking_info = None
+        if fields['tracking_number']:
+            tracking_info = tracking_infos.get(fields['tracking_number'])
+            if not tracking_info or tracking_info.get('error'):
+                result['tracking_error'] = (tracking_info or {}).get('error') or 'No tracking information found'
+                tracking_info = None
+        product_info = product_infos[_product_key(fields['url'])]
+        if is_placeholder_title(product_info['title'], product_info['product_id']):
+            # Added anyway, like POST /orders does; the title can be edited later
+            result['product_error'] = product_info['title']
+        order = _new_order(fields, product_info, tracking_info)
+        new_orders.append(order)
+        result['order'] = order
+        results[index] = result
+    
+    if new_orders:
+        orders.extend(new_orders)
+        save_orders(new_orders)
+    duplicates = sum(1 for result in results if result.get('duplicate'))
+    return jsonify({
+        'results': results,
+        'added': len(new_orders),
+        'duplicates': duplicates,
+        'failed': len(items) - len(new_orders) - duplicates,
+        'message': f'Added {len(new_orders)} of {len(items)} orders'
+    })
+
 @api_bp.route('/orders/<int:order_id>', methods=['PUT'])
 def update_order(order_id):
     """Update an existing order"""
     data = request.json
-    order = next((o for o in orders if o['id'] == order_id), None)
+    order = orders.get_by_id(order_id)
     
     if not order:
         return jsonify({'error': 'Order not found'}), 404
@@ -82,6 +286,7 @@ def update_order(order_id):
         new_tracking = data['tracking_number']
         if new_tracking != order.get('tracking_number', ''):
             order['tracking_number'] = new_tracking
+            orders.reindex(order)
             tracking_updated = True
     
     if 'product_image' in data:
@@ -101,27 +306,25 @@ def update_order(order_id):
     if tracking_updated and order['tracking_number']:
         tracking_info = fetch_tracking_info(order['tracking_number'])
         if tracking_info:
-            order['tracking_info'] = tracking_info
+            order['tracking_info'] = detach_events('cainiao', order['tracking_number'], tracking_info)
             if tracking_info.get('status') and tracking_info['status'] != 'Unknown':
                 order['status'] = tracking_info['status']
             if tracking_info.get('earliest_date') and not order.get('order_date'):
                 order['order_date'] = tracking_info['earliest_date']
     
-    save_orders()
+    save_orders([order])
     return jsonify({'order': order, 'message': 'Order updated successfully'})
 
 @api_bp.route('/orders/<int:order_id>', methods=['DELETE'])
 def delete_order(order_id):
     """Delete an order"""
-    from models.order import orders
-    orders[:] = [o for o in orders if o['id'] != order_id]
-    save_orders()
+    delete_orders([order_id])
     return jsonify({'message': 'Order deleted successfully'})
 
 @api_bp.route('/orders/<int:order_id>/tracking', methods=['GET', 'POST'])
 def refresh_tracking(order_id):
     """Refresh tracking information for an order"""
-    order = next((o for o in orders if o['id'] == order_id), None)
+    order = orders.get_by_id(order_id)
     
     if not order:
         return jsonify({'error': 'Order not found'}), 404
@@ -132,17 +335,19 @@ def refresh_tracking(order_id):
     
     tracking_info = fetch_tracking_info(tracking_number)
     if tracking_info:
-        order['tracking_info'] = tracking_info
-        if tracking_info.get('status') and tracking_info['status'] != 'Unknown':
-            order['status'] = tracking_info['status']
-        if tracking_info.get('earliest_date') and not order.get('order_date'):
-            order['order_date'] = tracking_info['earliest_date']
-        save_orders()
+        # Orders sharing the tracking number are the same parcel, so update them all
+        sharing_orders = orders.get_by_tracking_number(tracking_number) or [order]
+        changed_orders, changes = apply_tracking_results(
+            'cainiao', {tracking_number: tracking_info}, {tracking_number: sharing_orders}
+        )
+        save_orders(changed_orders)
         return jsonify({
             'success': True,
             'tracking_info': tracking_info,
             'order': order,
-            'message': 'Tracking information updated'
+            'changed': len(changed_orders),
+            'changes': changes,
+            'message': 'Tracking information updated' if changed_orders else 'Tracking information unchanged'
         })
     else:
         return jsonify({
@@ -150,109 +355,45 @@ def refresh_tracking(order_id):
             'error': 'Failed to fetch tracking information'
         }), 500
 
+@api_bp.route('/orders/<int:order_id>/events', methods=['GET'])
+def get_order_events(order_id):
+    """Get the full Cainiao and Doar Israel event histories for an order"""
+    order = orders.get_by_id(order_id)
+    
+    if not order:
+        return jsonify({'error': 'Order not found'}), 404
+    
+    tracking_number = order.get('tracking_number', '')
+    return jsonify({
+        'order_id': order_id,
+        'tracking_number': tracking_number,
+        'cainiao_events': get_events('cainiao', tracking_number),
+        'doar_events': get_events('doar', tracking_number)
+    })
+
+@api_bp.route('/orders/<int:order_id>/changes', methods=['GET'])
+def get_order_tracking_changes(order_id):
+    """Get the recorded tracking changes of an order, newest first"""
+    if not orders.get_by_id(order_id):
+        return jsonify({'error': 'Order not found'}), 404
+    return jsonify({'order_id': order_id, 'changes': get_order_changes(order_id)})
+
+def _job_response(job, started):
+    """Respond to a request that started (202) or joined (200) a background job"""
+    return jsonify({
+        'success': True,
+        'job_id': job.id,
+        'joined': not started,
+        'job': job.to_dict()
+    }), 202 if started else 200
+
 @api_bp.route('/orders/refresh-all', methods=['POST'])
 def refresh_all_tracking():
-    """Refresh tracking information for all orders with tracking numbers using bulk API call.
-    Skips orders that are already in 'delivered' status."""
-    try:
-        orders_with_tracking = []
-        skipped_delivered = 0
-        
-        for o in orders:
-            if o.get('tracking_number') and o.get('tracking_number').strip():
-                tracking_info = o.get('tracking_info') or {}
-                status = tracking_info.get('status', '') if isinstance(tracking_info, dict) else ''
-                if not status:
-                    status = o.get('status', '')
-                status_lower = status.lower() if status else ''
-                
-                if status_lower == 'delivered':
-                    skipped_delivered += 1
-                    continue
-                
-                orders_with_tracking.append(o)
-        
-        if not orders_with_tracking:
-            return jsonify({
-                'success': True,
-                'updated': 0,
-                'total': 0,
-                'skipped': skipped_delivered,
-                'message': f'No orders to update. {skipped_delivered} delivered orders skipped.' if skipped_delivered > 0 else 'No orders with tracking numbers found'
-            })
-        
-        # Deduplicate tracking numbers to avoid duplicate API calls
-        unique_tracking_numbers = list(set([o.get('tracking_number', '').strip() for o in orders_with_tracking if o.get('tracking_number', '').strip()]))
-        
-        print(f"Fetching tracking info for {len(unique_tracking_numbers)} unique tracking numbers in bulk (from {len(orders_with_tracking)} orders)...")
-        bulk_results = fetch_bulk_tracking_info(unique_tracking_numbers)
-        
-        updated = 0
-        failed = 0
-        results = []
-        
-        for order in orders_with_tracking:
-            tracking_number = order.get('tracking_number', '').strip()
-            if tracking_number:
-                if tracking_number in bulk_results:
-                    tracking_info = bulk_results[tracking_number]
-                    if tracking_info and not tracking_info.get('error'):
-                        order['tracking_info'] = tracking_info
-                        if tracking_info.get('status') and tracking_info['status'] != 'Unknown':
-                            order['status'] = tracking_info['status']
-                        if tracking_info.get('earliest_date') and not order.get('order_date'):
-                            order['order_date'] = tracking_info['earliest_date']
-                        updated += 1
-                        results.append({
-                            'order_id': order['id'],
-                            'success': True,
-                            'tracking_number': tracking_number
-                        })
-                    else:
-                        failed += 1
-                        results.append({
-                            'order_id': order['id'],
-                            'success': False,
-                            'tracking_number': tracking_number,
-                            'error': tracking_info.get('error', 'Failed to fetch tracking info') if tracking_info else 'No tracking info returned'
-                        })
-                else:
-                    failed += 1
-                    results.append({
-                        'order_id': order['id'],
-                        'success': False,
-                        'tracking_number': tracking_number,
-                        'error': 'Tracking number not found in API response'
-                    })
-        
-        save_orders()
-        
-        # Update last update time for Cainiao
-        set_cainiao_last_update()
-        
-        print(f"Bulk update completed: {updated} updated, {failed} failed out of {len(orders_with_tracking)} total, {skipped_delivered} delivered orders skipped")
-        
-        message = f'Updated {updated} out of {len(orders_with_tracking)} orders'
-        if skipped_delivered > 0:
-            message += f' ({skipped_delivered} delivered orders skipped)'
-        
-        return jsonify({
-            'success': True,
-            'updated': updated,
-            'failed': failed,
-            'total': len(orders_with_tracking),
-            'skipped': skipped_delivered,
-            'results': results,
-            'message': message
-        })
-    except Exception as e:
-        import traceback
-        error_trace = traceback.format_exc()
-        print(f"Error refreshing all tracking: {error_trace}")
-        return jsonify({
-            'success': False,
-            'error': str(e)
-        }), 500
+    """Start a background job refreshing the Cainiao tracking of all orders with tracking numbers.
+    Skips orders that are already in 'delivered' status. If the job is already running,
+    the running job is returned instead; poll GET /api/jobs/<job_id> for progress."""
+    job, started = get_job_manager().start('refresh-all', refresh_all_cainiao)
+    return _job_response(job, started)
 
 @api_bp.route('/aliexpress/connect', methods=['POST'])
 def connect_aliexpress():
@@ -284,7 +425,6 @@ def connect_aliexpress():
 def image_proxy():
     """Proxy endpoint to fetch images from AliExpress CDN with proper headers to bypass CORS.
     Also saves images locally for future use."""
-    import requests
     image_url = request.args.get('url')
     product_id = request.args.get('product_id')
     
@@ -295,13 +435,6 @@ def image_proxy():
     if local_path:
         return Response('', status=302, headers={'Location': local_path})
     
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-        'Referer': 'https://www.aliexpress.com/',
-        'Accept': 'image/avif,image/webp,image/apng,image/svg+xml,image/*,*/*;q=0.8',
-        'Accept-Language': 'en-US,en;q=0.9',
-    }
-    
     urls_to_try = [image_url]
     if '_220x220q75.jpg' in image_url and 'alicdn.com' in image_url:
         original_url = image_url.replace('_220x220q75.jpg', '.jpg')
@@ -309,20 +442,20 @@ def image_proxy():
     
     for url_to_try in urls_to_try:
         try:
-            response = requests.get(url_to_try, headers=headers, timeout=10, stream=True)
-            if response.status_code == 200:
-                return Response(
-                    response.content,
-                    mimetype=response.headers.get('Content-Type', 'image/jpeg'),
-                    headers={
-                        'Cache-Control': 'public, max-age=86400',
-                        'Access-Control-Allow-Origin': '*',
-                    }
-                )
-            elif response.status_code == 404:
-                continue
-            else:
-                response.raise_for_status()
+            with http_client.get(url_to_try, provider='images', stream=True) as response:
+                if response.status_code == 200:
+                    return Response(
+                        response.content,
+                        mimetype=response.headers.get('Content-Type', 'image/jpeg'),
+                        headers={
+                            'Cache-Control': 'public, max-age=86400',
+                            'Access-Control-Allow-Origin': '*',
+                        }
+                    )
+                elif response.status_code == 404:
+                    continue
+                else:
+                    response.raise_for_status()
         except requests.exceptions.HTTPError as e:
             if e.response.status_code == 404:
                 continue
@@ -367,7 +500,7 @@ def doar_api_key():
 @api_bp.route('/orders/<int:order_id>/doar-tracking', methods=['GET', 'POST'])
 def refresh_doar_tracking(order_id):
     """Refresh Doar Israel tracking information for an order"""
-    order = next((o for o in orders if o['id'] == order_id), None)
+    order = orders.get_by_id(order_id)
     
     if not order:
         return jsonify({'error': 'Order not found'}), 404
@@ -378,16 +511,19 @@ def refresh_doar_tracking(order_id):
     
     tracking_info = fetch_doar_tracking_info(tracking_number)
     if tracking_info:
-        # Store Doar Israel tracking info separately
-        if 'doar_tracking_info' not in order:
-            order['doar_tracking_info'] = {}
-        order['doar_tracking_info'] = tracking_info
-        save_orders()
+        # Store Doar Israel tracking info separately, on every order sharing the tracking number
+        sharing_orders = orders.get_by_tracking_number(tracking_number) or [order]
+        changed_orders, changes = apply_tracking_results(
+            'doar', {tracking_number: tracking_info}, {tracking_number: sharing_orders}
+        )
+        save_orders(changed_orders)
         return jsonify({
             'success': True,
             'tracking_info': tracking_info,
             'order': order,
-            'message': 'Doar Israel tracking information updated'
+            'changed': len(changed_orders),
+            'changes': changes,
+            'message': 'Doar Israel tracking information updated' if changed_orders else 'Doar Israel tracking information unchanged'
         })
     else:
         return jsonify({
@@ -397,102 +533,31 @@ def refresh_doar_tracking(order_id):
 
 @api_bp.route('/orders/refresh-all-doar', methods=['POST'])
 def refresh_all_doar_tracking():
-    """Refresh Doar Israel tracking information for all orders with tracking numbers"""
-    try:
-        api_key = get_doar_api_key()
-        if not api_key:
-            return jsonify({
-                'success': False,
-                'error': 'Doar Israel API key not configured. Please set it in the bulk actions.'
-            }), 400
-        
-        orders_with_tracking = []
-        
-        for o in orders:
-            if o.get('tracking_number') and o.get('tracking_number').strip():
-                orders_with_tracking.append(o)
-        
-        if not orders_with_tracking:
-            return jsonify({
-                'success': True,
-                'updated': 0,
-                'total': 0,
-                'message': 'No orders with tracking numbers found'
-            })
-        
-        # Deduplicate tracking numbers to avoid duplicate API calls
-        unique_tracking_numbers = list(set([o.get('tracking_number', '').strip() for o in orders_with_tracking if o.get('tracking_number', '').strip()]))
-        
-        print(f"Fetching Doar Israel tracking info for {len(unique_tracking_numbers)} unique tracking numbers (from {len(orders_with_tracking)} orders)...")
-        
-        # Fetch tracking info once per unique tracking number
-        tracking_results = {}
-        for tracking_number in unique_tracking_numbers:
-            tracking_info = fetch_doar_tracking_info(tracking_number)
-            if tracking_info:
-                tracking_results[tracking_number] = tracking_info
-        
-        # Apply results to all orders with matching tracking numbers
-        updated = 0
-        failed = 0
-        results = []
-        
-        for order in orders_with_tracking:
-            tracking_number = order.get('tracking_number', '').strip()
-            if tracking_number:
-                if tracking_number in tracking_results:
-                    tracking_info = tracking_results[tracking_number]
-                    if not tracking_info.get('error'):
-                        if 'doar_tracking_info' not in order:
-                            order['doar_tracking_info'] = {}
-                        order['doar_tracking_info'] = tracking_info
-                        updated += 1
-                        results.append({
-                            'order_id': order['id'],
-                            'success': True,
-                            'tracking_number': tracking_number
-                        })
-                    else:
-                        failed += 1
-                        error_msg = tracking_info.get('error', 'Failed to fetch tracking info')
-                        results.append({
-                            'order_id': order['id'],
-                            'success': False,
-                            'tracking_number': tracking_number,
-                            'error': error_msg
-                        })
-                else:
-                    failed += 1
-                    results.append({
-                        'order_id': order['id'],
-                        'success': False,
-                        'tracking_number': tracking_number,
-                        'error': 'Tracking number not found in results'
-                    })
-        
-        save_orders()
-        
-        # Update last update time for Doar Israel
-        set_doar_last_update()
-        
-        print(f"Doar Israel bulk update completed: {updated} updated, {failed} failed out of {len(orders_with_tracking)} total")
-        
-        return jsonify({
-            'success': True,
-            'updated': updated,
-            'failed': failed,
-            'total': len(orders_with_tracking),
-            'results': results,
-            'message': f'Updated {updated} out of {len(orders_with_tracking)} orders'
-        })
-    except Exception as e:
-        import traceback
-        error_trace = traceback.format_exc()
-        print(f"Error refreshing all Doar Israel tracking: {error_trace}")
+    """Start a background job refreshing the Doar Israel tracking of all orders with tracking numbers"""
+    if not get_doar_api_key():
         return jsonify({
             'success': False,
-            'error': str(e)
-        }), 500
+            'error': 'Doar Israel API key not configured. Please set it in the bulk actions.'
+        }), 400
+    job, started = get_job_manager().start('refresh-all-doar', refresh_all_doar)
+    return _job_response(job, started)
+
+@api_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get the progress of a background job"""
+    job = get_job_manager().get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
+@api_bp.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """Cancel a background job; it stops after the batch it is working on"""
+    job = get_job_manager().get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    job.cancel()
+    return jsonify(job.to_dict())
 
 @api_bp.route('/auto-update/last-updates', methods=['GET'])
 def get_last_updates():
@@ -512,3 +577,16 @@ def get_last_updates():
             'error': str(e)
         }), 500
 
+@api_bp.route('/auto-update/schedule', methods=['GET'])
+def get_auto_update_schedule():
+    """Get when the scheduler runs next and how many parcels are scheduled per provider and stage"""
+    next_update = get_next_update_time()
+    return jsonify({
+        'next_update': next_update.isoformat() if next_update else None,
+        'parcels': get_poll_schedule().summary()
+    })
+
+@api_bp.route('/providers/status', methods=['GET'])
+def get_providers_status():
+    """Get the rate limiter, retry and circuit breaker state of each upstream provider"""
+    return jsonify({'providers': get_resilience_status()})
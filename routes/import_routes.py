@@ -1,14 +1,44 @@
 """Import routes for AliExpress order import"""
 from flask import Blueprint, request, jsonify
-import requests
 from datetime import datetime
 from models.order import orders, save_orders, get_next_order_id
+from models.product_cache import get_product_cache, lookup_product, local_image_exists
 from utils.images import download_and_save_image
+from utils.aliexpress import is_usable_product_title
 from utils.curl_parser import parse_curl_command, parse_jsonp_response, extract_orders_from_api_response
 from utils.url_creator import fetch_tracking_number_from_order
+from utils import http_client
+from utils.refresh_engine import get_refresh_engine
 
 import_bp = Blueprint('import', __name__)
 
+def _fetch_tracking_number_safe(cookie_string, order_id):
+    """Fetch the tracking number of an order using url_creator ('' if none or on error)"""
+    try:
+        tracking_number = fetch_tracking_number_from_order(cookie_string, order_id)
+        if tracking_number:
+            print(f"Found tracking number: {tracking_number} for order {order_id}")
+        else:
+            print(f"No tracking number found for order {order_id}")
+        return tracking_number or ''
+    except Exception as e:
+        print(f"Error fetching tracking number for order {order_id}: {e}")
+        return ''
+
+def _save_item_image(item):
+    """Get the local image of an imported item, downloading it only for a product not seen before"""
+    product_id = item.get('product_id')
+    cached = lookup_product(product_id)
+    if cached and local_image_exists(cached['local_image_path']):
+        return cached['local_image_path']
+    local_image_path = None
+    if item.get('product_image'):
+        local_image_path = download_and_save_image(item['product_image'], product_id)
+    # Titles that the scrape path would reject must not be served from the cache
+    if is_usable_product_title(item.get('product_title'), product_id):
+        get_product_cache().put(product_id, item.get('product_title'), item.get('product_image'), local_image_path)
+    return local_image_path
+
 @import_bp.route('/orders', methods=['POST'])
 def import_orders():
     """Import orders from AliExpress API using a cURL command"""
@@ -28,9 +58,9 @@ def import_orders():
         # Make the API request
         print(f"Fetching orders from: {url[:100]}... (method: {method})")
         if method == 'POST' and post_data:
-            response = requests.post(url, headers=headers, cookies=cookies, data=post_data, timeout=30)
+            response = http_client.post(url, headers=headers, cookies=cookies, data=post_data)
         else:
-            response = requests.get(url, headers=headers, cookies=cookies, timeout=30)
+            response = http_client.get(url, headers=headers, cookies=cookies)
         
         if response.status_code != 200:
             error_text = response.text[:500] if response.text else 'No response body'
@@ -96,8 +126,24 @@ def import_orders():
         imported_count = 0
         skipped_count = 0
         created_orders = []
+        new_orders = []
         tracking_fetched_count = 0
         
+        # Look up the tracking numbers of all new orders concurrently on the refresh engine
+        tracking_numbers = {}
+        if cookie_string:
+            new_order_ids = list(dict.fromkeys(
+                order_data.get('order_id', '') for order_data in extracted_orders
+                if order_data.get('order_id') and order_data.get('sub_items')
+                and not orders.get_by_order_id(order_data.get('order_id'))
+            ))
+            if new_order_ids:
+                print(f"Fetching tracking numbers for {len(new_order_ids)} orders...")
+                found = get_refresh_engine().map(
+                    'aliexpress_api', lambda order_id: _fetch_tracking_number_safe(cookie_string, order_id), new_order_ids
+                )
+                tracking_numbers = dict(zip(new_order_ids, found))
+        
         for order_data in extracted_orders:
             order_id = order_data.get('order_id', '')
             sub_items = order_data.get('sub_items', [])
@@ -106,11 +152,7 @@ def import_orders():
                 continue
             
             # Check if order already exists (by order_id)
-            existing_order = next(
-                (o for o in orders 
-                 if o.get('order_id') == order_id),
-                None
-            )
+            existing_order = orders.get_by_order_id(order_id)
             
             if existing_order:
                 skipped_count += 1
@@ -123,23 +165,10 @@ def import_orders():
             else:
                 product_title = first_item['product_title']
             
-            # Download and save image for first item
-            local_image_path = None
-            if first_item.get('product_image'):
-                local_image_path = download_and_save_image(
-                    first_item['product_image'],
-                    first_item['product_id']
-                )
-            
-            # Download and save images for all sub-items
+            # Save the images of all sub-items locally (the first one is the order's image)
             processed_sub_items = []
             for sub_item in sub_items:
-                sub_image_path = None
-                if sub_item.get('product_image'):
-                    sub_image_path = download_and_save_image(
-                        sub_item['product_image'],
-                        sub_item['product_id']
-                    )
+                sub_image_path = _save_item_image(sub_item)
                 
                 processed_sub_items.append({
                     'product_id': sub_item['product_id'],
@@ -149,25 +178,15 @@ def import_orders():
                     'price': sub_item.get('price', '')
                 })
             
-            # Fetch tracking number using url_creator
-            tracking_number = ''
-            if cookie_string and order_id:
-                print(f"Fetching tracking number for order {order_id}...")
-                try:
-                    tracking_number = fetch_tracking_number_from_order(cookie_string, order_id)
-                    if tracking_number:
-                        print(f"Found tracking number: {tracking_number} for order {order_id}")
-                        tracking_fetched_count += 1
-                    else:
-                        print(f"No tracking number found for order {order_id}")
-                except Exception as e:
-                    print(f"Error fetching tracking number for order {order_id}: {e}")
+            tracking_number = tracking_numbers.get(order_id, '')
+            if tracking_number:
+                tracking_fetched_count += 1
             
             # Create order object with sub_items
             order = {
                 'id': get_next_order_id(),
                 'product_title': product_title,
-                'product_image': local_image_path or first_item.get('product_image', ''),
+                'product_image': processed_sub_items[0]['product_image'],
                 'product_url': first_item['product_url'],
                 'product_id': first_item['product_id'],
                 'tracking_number': tracking_number,
@@ -181,6 +200,7 @@ def import_orders():
             }
             
             orders.append(order)
+            new_orders.append(order)
             created_orders.append({
                 'product_title': order['product_title'],
                 'product_id': order['product_id'],
@@ -193,7 +213,7 @@ def import_orders():
         
         # Save orders to file
         if imported_count > 0:
-            save_orders()
+            save_orders(new_orders)
         
         return jsonify({
             'success': True,
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""Check and time utils.tracking's Cainiao module parser against the previous one.
+
+Every module of the recorded bulk responses in scripts/fixtures/cainiao/ is parsed by
+both parsers; the output must be identical (apart from `last_update`, which is the
+parse time). Then both parsers are timed on the whole corpus.
+
+Usage (from the repository root):
+    python scripts/benchmark_tracking_parser.py [--repeat N]
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import timeit
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.tracking import parse_tracking_module, parse_tracking_modules
+
+FIXTURES_DIR = os.path.join(ROOT, 'scripts', 'fixtures', 'cainiao')
+
+def legacy_parse_tracking_module(module):
+    """parse_tracking_module before the single-pass rewrite, kept for comparison"""
+    tracking_info = {
+        'status': 'Unknown',
+        'events': [],
+        'carrier': None,
+        'last_update': datetime.now().isoformat()
+    }
+
+    if not isinstance(module, dict):
+        return tracking_info
+
+    detail_list = module.get('detailList', [])
+
+    latest_trace = module.get('latestTrace', {})
+    latest_group = latest_trace.get('group', {}) if isinstance(latest_trace, dict) else {}
+    node_desc = latest_group.get('nodeDesc', '') if isinstance(latest_group, dict) else ''
+
+    if not node_desc and detail_list and len(detail_list) > 0:
+        latest_event = detail_list[0]
+        event_group = latest_event.get('group', {})
+        if isinstance(event_group, dict):
+            node_desc = event_group.get('nodeDesc', '')
+
+    if not node_desc:
+        node_desc = module.get('statusDesc', '') or module.get('status', '')
+
+    tracking_info['status'] = node_desc or 'Unknown'
+
+    latest_standerd_desc = ''
+    if detail_list and len(detail_list) > 0:
+        latest_event = detail_list[0]
+        latest_standerd_desc = latest_event.get('standerdDesc', '') or latest_event.get('desc', '')
+
+    tracking_info['latest_standerd_desc'] = latest_standerd_desc
+
+    carrier = module.get('carrier', '') or module.get('carrierName', '')
+    if carrier:
+        tracking_info['carrier'] = carrier
+
+    origin_country = module.get('originCountry', '')
+    dest_country = module.get('destCountry', '')
+    if origin_country and dest_country:
+        tracking_info['carrier'] = f"{origin_country} → {dest_country}"
+
+    events = []
+
+    if detail_list:
+        for event in detail_list:
+            if isinstance(event, dict):
+                standerd_desc = event.get('standerdDesc', '') or event.get('desc', '')
+
+                if standerd_desc and standerd_desc.strip():
+                    event_date = event.get('timeStr', '')
+                    if not event_date and event.get('time'):
+                        try:
+                            timestamp = event.get('time') / 1000
+                            event_date = datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+                        except:
+                            event_date = None
+
+                    group = event.get('group', {})
+                    group_desc = group.get('nodeDesc', '') if isinstance(group, dict) else ''
+
+                    events.append({
+                        'description': standerd_desc.strip(),
+                        'nodeDesc': group_desc,
+                        'date': event_date
+                    })
+
+    events.reverse()
+    tracking_info['events'] = events
+
+    if events:
+        event_times = []
+        for event in detail_list:
+            if isinstance(event, dict):
+                timestamp = event.get('time')
+                if timestamp:
+                    event_times.append({
+                        'timestamp': timestamp,
+                        'timeStr': event.get('timeStr', '')
+                    })
+
+        if event_times:
+            event_times.sort(key=lambda x: x['timestamp'])
+            earliest = event_times[0]
+            latest = event_times[-1]
+
+            if earliest['timeStr']:
+                tracking_info['earliest_date'] = earliest['timeStr']
+            else:
+                try:
+                    timestamp = earliest['timestamp'] / 1000
+                    tracking_info['earliest_date'] = datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+                except:
+                    tracking_info['earliest_date'] = None
+
+            if latest['timeStr']:
+                tracking_info['last_update_date'] = latest['timeStr']
+            else:
+                try:
+                    timestamp = latest['timestamp'] / 1000
+                    tracking_info['last_update_date'] = datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+                except:
+                    tracking_info['last_update_date'] = None
+
+    return tracking_info
+
+def load_corpus():
+    """Load the modules of every recorded response, by fixture file name"""
+    corpus = {}
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, '*.json'))):
+        with open(path, 'r', encoding='utf-8') as f:
+            corpus[os.path.basename(path)] = json.load(f).get('module', [])
+    return corpus
+
+def without_last_update(tracking_info):
+    return {key: value for key, value in tracking_info.items() if key != 'last_update'}
+
+def check_identical(corpus):
+    """Return the (file, index) of every module the two parsers disagree on"""
+    mismatches = []
+    for name, modules in corpus.items():
+        bulk = parse_tracking_modules(modules)
+        for index, module in enumerate(modules):
+            expected = without_last_update(legacy_parse_tracking_module(module))
+            if without_last_update(parse_tracking_module(module)) != expected or without_last_update(bulk[index]) != expected:
+                mismatches.append((name, index))
+    return mismatches
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=20, help='times to parse the corpus per measurement (default: 20)')
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    modules = [module for file_modules in corpus.values() for module in file_modules]
+    events = sum(len(module.get('detailList') or []) for module in modules if isinstance(module, dict))
+    print(f"Corpus: {len(corpus)} responses, {len(modules)} modules, {events} events")
+
+    mismatches = check_identical(corpus)
+    if mismatches:
+        for name, index in mismatches:
+            print(f"Output differs: {name} module {index}")
+        sys.exit(1)
+    print("Output identical to the previous parser")
+
+    timings = {
+        'previous parser': lambda: [legacy_parse_tracking_module(module) for module in modules],
+        'parse_tracking_module': lambda: [parse_tracking_module(module) for module in modules],
+        'parse_tracking_modules': lambda: parse_tracking_modules(modules)
+    }
+    baseline = None
+    for label, func in timings.items():
+        seconds = min(timeit.repeat(func, number=args.repeat, repeat=5)) / args.repeat
+        baseline = baseline or seconds
+        print(f"{label:>24}: {seconds * 1000:8.2f} ms per corpus ({baseline / seconds:.2f}x)")
+
+if __name__ == '__main__':
+    main()
@@ -1,21 +1,154 @@
 /* API Functions */
+function buildOrdersQuery(extraParams = {}) {
+    const params = new URLSearchParams();
+    const searchText = document.getElementById('searchFilter').value.trim();
+    const statusFilter = document.getElementById('statusFilter').value;
+    if (searchText) params.set('q', searchText);
+    if (statusFilter) params.set('status', statusFilter);
+    if (document.getElementById('hideDelivered').checked) params.set('hide_delivered', '1');
+    params.set('sort', document.getElementById('sortBy').value);
+    Object.entries(extraParams).forEach(([key, value]) => params.set(key, value));
+    return params.toString();
+}
+
+function updateOrdersPaging() {
+    updateTotalOrdersCount();
+    const filterCount = document.getElementById('filterCount');
+    if (ordersMatched === ordersTotal) {
+        filterCount.textContent = allOrders.length === ordersTotal
+            ? `Showing all ${ordersTotal} orders`
+            : `Showing ${allOrders.length} of ${ordersTotal} orders`;
+    } else {
+        filterCount.textContent = `Showing ${allOrders.length} of ${ordersMatched} matching orders (${ordersTotal} total)`;
+    }
+    const loadMoreButton = document.getElementById('loadMoreOrders');
+    if (loadMoreButton) {
+        loadMoreButton.style.display = nextOrdersCursor ? 'inline-block' : 'none';
+    }
+}
+
 async function loadOrders() {
-    // Prevent multiple simultaneous loads
-    if (isLoadingOrders) {
-        return;
+    // Reload from the first page, keeping at least as many rows as are currently shown.
+    // The server caps each page, so follow the cursor until enough rows are loaded
+    const requestSeq = ++ordersRequestSeq;
+    const wanted = Math.max(ORDERS_PAGE_SIZE, allOrders.length);
+    try {
+        let loadedOrders = [];
+        let cursor = null;
+        let data;
+        do {
+            const params = { limit: wanted - loadedOrders.length };
+            if (cursor) params.cursor = cursor;
+            const response = await fetch(`/api/orders?${buildOrdersQuery(params)}`);
+            data = await response.json();
+            if (requestSeq !== ordersRequestSeq) {
+                return; // A newer request has been made since
+            }
+            if (!response.ok) {
+                throw new Error(data.error || 'Failed to load orders');
+            }
+            loadedOrders = loadedOrders.concat(data.orders);
+            cursor = data.next_cursor;
+        } while (cursor && loadedOrders.length < wanted);
+        allOrders = loadedOrders;
+        ordersTotal = data.total;
+        ordersMatched = data.matched;
+        nextOrdersCursor = data.next_cursor;
+        ordersVersion = data.version;
+        updateOrdersPaging();
+        displayOrders(allOrders);
+    } catch (error) {
+        console.error('Error loading orders:', error);
     }
-    
-    isLoadingOrders = true;
+}
+
+async function syncOrders() {
+    // Fetch only what changed since the last load and patch the affected rows
+    if (ordersVersion === null) {
+        return loadOrders();
+    }
+    const requestSeq = ++ordersRequestSeq;
+    const wanted = Math.max(ORDERS_PAGE_SIZE, allOrders.length);
     try {
-        const response = await fetch('/api/orders');
+        // The server caps each page, so follow the cursor until the delta covers every loaded row
+        const ids = [];
+        const changed = [];
+        let cursor = null;
+        let data;
+        do {
+            const params = { limit: wanted - ids.length, since: ordersVersion };
+            if (cursor) params.cursor = cursor;
+            const response = await fetch(`/api/orders?${buildOrdersQuery(params)}`, {
+                headers: cursor ? {} : { 'If-None-Match': `"${ordersVersion}"` },
+                cache: 'no-store'
+            });
+            if (requestSeq !== ordersRequestSeq) {
+                return;
+            }
+            if (response.status === 304) {
+                return; // Nothing changed
+            }
+            const page = await response.json();
+            if (!response.ok) {
+                throw new Error(page.error || 'Failed to load orders');
+            }
+            if (page.reset || (data && page.version !== data.version)) {
+                // The server can't tell what changed since our version, or the orders
+                // changed between pages; start over from the full list
+                return loadOrders();
+            }
+            data = page;
+            ids.push(...data.ids);
+            changed.push(...data.changed);
+            cursor = data.next_cursor;
+        } while (cursor && ids.length < wanted);
+
+        const knownOrders = new Map(allOrders.map(order => [order.id, order]));
+        const changedIds = new Set();
+        changed.forEach(order => {
+            knownOrders.set(order.id, order);
+            changedIds.add(order.id);
+        });
+        if (ids.some(id => !knownOrders.has(id))) {
+            // An unchanged order we never loaded moved into view
+            return loadOrders();
+        }
+        allOrders = ids.map(id => knownOrders.get(id));
+        ordersTotal = data.total;
+        ordersMatched = data.matched;
+        nextOrdersCursor = data.next_cursor;
+        ordersVersion = data.version;
+        updateOrdersPaging();
+        patchOrderRows(allOrders, changedIds);
+    } catch (error) {
+        console.error('Error syncing orders:', error);
+    }
+}
+
+async function loadMoreOrders() {
+    if (!nextOrdersCursor) return;
+    const requestSeq = ++ordersRequestSeq;
+    const loadMoreButton = document.getElementById('loadMoreOrders');
+    if (loadMoreButton) loadMoreButton.disabled = true;
+    try {
+        const response = await fetch(`/api/orders?${buildOrdersQuery({ limit: ORDERS_PAGE_SIZE, cursor: nextOrdersCursor })}`);
         const data = await response.json();
-        allOrders = data.orders; // Store all orders
-        updateTotalOrdersCount(); // Update total counter
-        applyFilters(); // Apply current filters
+        if (requestSeq !== ordersRequestSeq) {
+            return;
+        }
+        if (!response.ok) {
+            throw new Error(data.error || 'Failed to load orders');
+        }
+        allOrders = allOrders.concat(data.orders);
+        ordersTotal = data.total;
+        ordersMatched = data.matched;
+        nextOrdersCursor = data.next_cursor;
+        updateOrdersPaging();
+        displayOrders(allOrders);
     } catch (error) {
-        console.error('Error loading orders:', error);
+        console.error('Error loading more orders:', error);
     } finally {
-        isLoadingOrders = false;
+        if (loadMoreButton) loadMoreButton.disabled = false;
     }
 }
 
@@ -55,8 +188,7 @@ async function addOrder() {
                 alertDiv.innerHTML = '<div class="alert alert-success">Order added successfully!</div>';
                 // Wait a bit before reloading to ensure server has saved
                 await new Promise(resolve => setTimeout(resolve, 500));
-                await loadOrders();
-                // Clear filters after adding new order
+                // Clear filters after adding new order (this reloads the list)
                 clearFilters();
                 // Close modal after short delay
                 setTimeout(() => {
@@ -105,8 +237,7 @@ async function saveOrder() {
                 '<div class="alert alert-success">Order updated successfully!</div>';
             setTimeout(async () => {
                 closeModal();
-                await loadOrders();
-                applyFilters(); // Reapply filters after update
+                await syncOrders();
             }, 1000);
         } else {
             document.getElementById('modalAlert').innerHTML = 
@@ -130,8 +261,7 @@ async function deleteOrder(orderId) {
         });
 
         if (response.ok) {
-            await loadOrders();
-            applyFilters(); // Reapply filters after delete
+            await syncOrders();
         } else {
             alert('Error deleting order');
         }
@@ -196,7 +326,7 @@ async function importOrders() {
 
             // Reload orders and close modal after 2 seconds
             setTimeout(async () => {
-                await loadOrders();
+                await syncOrders();
                 closeImportModal();
             }, 2000);
         } else {
@@ -211,3 +341,58 @@ async function importOrders() {
     }
 }
 
+
+/* Background Jobs */
+const JOB_POLL_INTERVAL_MS = 1000;
+// While the event stream pushes job progress, poll only this rarely in case an update is missed
+const JOB_FALLBACK_POLL_MS = 10000;
+
+// Wait for the next pushed update of a job; resolves with null if none came in time
+function waitForJobUpdate(job) {
+    const latest = latestJobUpdates[job.id];
+    if (latest && (!['queued', 'running'].includes(latest.status) || latest.processed > job.processed)) {
+        return Promise.resolve(latest);
+    }
+    return new Promise(resolve => {
+        const timer = setTimeout(() => {
+            delete jobUpdateWaiters[job.id];
+            resolve(null);
+        }, eventStreamConnected ? JOB_FALLBACK_POLL_MS : JOB_POLL_INTERVAL_MS);
+        jobUpdateWaiters[job.id] = update => {
+            clearTimeout(timer);
+            delete jobUpdateWaiters[job.id];
+            resolve(update);
+        };
+    });
+}
+
+// Start (or join the running) job at `url` and follow it until it finishes, passing every update to onProgress
+async function runJob(url, onProgress) {
+    const response = await fetch(url, { method: 'POST' });
+    const data = await response.json();
+    if (!response.ok || !data.success) {
+        throw new Error(data.error || 'Failed to start the update');
+    }
+    
+    let job = data.job;
+    onProgress(job);
+    while (job.status === 'queued' || job.status === 'running') {
+        const pushed = await waitForJobUpdate(job);
+        if (pushed) {
+            job = pushed;
+        } else {
+            const jobResponse = await fetch(`/api/jobs/${job.id}`);
+            if (!jobResponse.ok) {
+                throw new Error('Lost track of the update');
+            }
+            job = await jobResponse.json();
+        }
+        onProgress(job);
+    }
+    delete latestJobUpdates[job.id];
+    return job;
+}
+
+async function cancelJob(jobId) {
+    await fetch(`/api/jobs/${jobId}`, { method: 'DELETE' });
+}
@@ -16,8 +16,10 @@ async function refreshDoarTracking(orderId, event) {
         const data = await response.json();
         
         if (response.ok && data.success) {
-            await loadOrders();
-            applyFilters();
+            // Nothing to re-render if no order changed
+            if (data.changed !== 0) {
+                await syncOrders();
+            }
             if (button) {
                 button.textContent = '✓';
                 button.style.color = '#28a745';
@@ -45,67 +47,17 @@ async function refreshDoarTracking(orderId, event) {
 }
 
 async function refreshAllDoarTracking() {
-    const button = document.getElementById('refreshAllDoarBtn');
-    const statusSpan = document.getElementById('refreshAllStatus');
-    const originalText = button.textContent;
-    
-    button.disabled = true;
-    button.textContent = '⏳ Updating...';
-    statusSpan.textContent = 'Please wait...';
-    statusSpan.style.color = '#666';
-    
-    try {
-        const response = await fetch('/api/orders/refresh-all-doar', {
-            method: 'POST'
-        });
-        
-        const data = await response.json();
-        
-        if (response.ok && data.success) {
-            statusSpan.textContent = `✓ ${data.message}`;
-            statusSpan.style.color = '#28a745';
-            
-            await loadOrders();
-            applyFilters();
-            
-            // Update last update times
-            await updateLastUpdateTimes();
-            
-            setTimeout(() => {
-                button.textContent = originalText;
-                button.disabled = false;
-                statusSpan.textContent = '';
-            }, 3000);
-        } else {
-            statusSpan.textContent = `✗ Error: ${data.error || 'Failed to update orders'}`;
-            statusSpan.style.color = '#dc3545';
-            button.textContent = originalText;
-            button.disabled = false;
-            
-            setTimeout(() => {
-                statusSpan.textContent = '';
-            }, 5000);
-        }
-    } catch (error) {
-        console.error('Error refreshing all Doar Israel tracking:', error);
-        statusSpan.textContent = '✗ Error: Failed to update orders';
-        statusSpan.style.color = '#dc3545';
-        button.textContent = originalText;
-        button.disabled = false;
-        
-        setTimeout(() => {
-            statusSpan.textContent = '';
-        }, 5000);
-    }
+    await runRefreshAllJob('/api/orders/refresh-all-doar', 'refreshAllDoarBtn');
 }
 
 function showDoarEvents(orderId) {
-    fetch('/api/orders')
+    // Load the event history for this order only
+    fetch(`/api/orders/${orderId}/events`)
         .then(res => res.json())
         .then(data => {
-            const order = data.orders.find(o => o.id === orderId);
-            if (order && order.doar_tracking_info && order.doar_tracking_info.events) {
-                const events = order.doar_tracking_info.events;
+            const order = allOrders.find(o => o.id === orderId);
+            if (order && order.doar_tracking_info && data.doar_events) {
+                const events = data.doar_events;
                 const modal = document.getElementById('doarEventsModal');
                 const content = document.getElementById('doarEventsContent');
                 
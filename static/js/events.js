@@ -0,0 +1,73 @@
+/* Server-Sent Events: changes pushed by the server */
+// Bursts of change notifications (e.g. a bulk refresh) are coalesced into one sync
+const PUSH_SYNC_DELAY_MS = 250;
+// How long the last update of a finished job is kept for a runJob() that hasn't seen it yet
+const FINISHED_JOB_RETENTION_MS = 60000;
+let pushSyncTimer = null;
+
+function scheduleOrdersSync() {
+    if (pushSyncTimer) {
+        return;
+    }
+    pushSyncTimer = setTimeout(() => {
+        pushSyncTimer = null;
+        syncOrders();
+    }, PUSH_SYNC_DELAY_MS);
+}
+
+function connectEventStream() {
+    if (!window.EventSource) {
+        return;
+    }
+    
+    // The browser reconnects by itself when the stream drops
+    const eventSource = new EventSource('/api/events');
+    
+    eventSource.addEventListener('hello', event => {
+        eventStreamConnected = true;
+        // Catch up with anything that changed while we were disconnected
+        const data = JSON.parse(event.data);
+        if (ordersVersion !== null && data.version !== ordersVersion) {
+            scheduleOrdersSync();
+        }
+    });
+    
+    eventSource.addEventListener('orders', event => {
+        // Fetch only the changed orders and patch their rows
+        const data = JSON.parse(event.data);
+        if (ordersVersion !== null && data.version !== ordersVersion) {
+            scheduleOrdersSync();
+        }
+    });
+    
+    eventSource.addEventListener('job', event => {
+        // Kept even if nobody waits yet: a job can progress before the request that started it returns
+        const job = JSON.parse(event.data);
+        latestJobUpdates[job.id] = job;
+        const waiter = jobUpdateWaiters[job.id];
+        if (waiter) {
+            waiter(job);
+        }
+        if (!['queued', 'running'].includes(job.status)) {
+            // Finished: forget it once a tab that is about to follow it has had time to pick it up,
+            // so jobs this tab never follows don't pile up
+            setTimeout(() => {
+                if (latestJobUpdates[job.id] === job) {
+                    delete latestJobUpdates[job.id];
+                }
+            }, FINISHED_JOB_RETENTION_MS);
+        }
+    });
+    
+    eventSource.addEventListener('scheduler', () => {
+        updateLastUpdateTimes();
+    });
+    
+    eventSource.addEventListener('resync', () => {
+        scheduleOrdersSync();
+    });
+    
+    eventSource.onerror = () => {
+        eventStreamConnected = false;
+    };
+}
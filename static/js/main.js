@@ -3,6 +3,7 @@
 window.onload = function() {
     loadOrders();
     startUpdateTimeInterval();
+    connectEventStream();
 };
 
 // Close modal when clicking outside
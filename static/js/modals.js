@@ -37,17 +37,13 @@ function editOrder(orderId) {
     const modal = document.getElementById('editModal');
     modal.style.display = 'flex';
     
-    // Load current order data
-    fetch('/api/orders')
-        .then(res => res.json())
-        .then(data => {
-            const order = data.orders.find(o => o.id === orderId);
-            if (order) {
-                document.getElementById('editProductTitle').value = order.product_title || '';
-                document.getElementById('editTrackingNumber').value = order.tracking_number || '';
-                document.getElementById('editProductImage').value = order.product_image || '';
-            }
-        });
+    // The order is always one of the loaded rows
+    const order = allOrders.find(o => o.id === orderId);
+    if (order) {
+        document.getElementById('editProductTitle').value = order.product_title || '';
+        document.getElementById('editTrackingNumber').value = order.tracking_number || '';
+        document.getElementById('editProductImage').value = order.product_image || '';
+    }
 }
 
 function closeModal() {
@@ -57,13 +53,12 @@ function closeModal() {
 }
 
 function showEvents(orderId) {
-    // Load current order data
-    fetch('/api/orders')
+    // Load the event history for this order only
+    fetch(`/api/orders/${orderId}/events`)
         .then(res => res.json())
         .then(data => {
-            const order = data.orders.find(o => o.id === orderId);
-            if (order && order.tracking_info && order.tracking_info.events) {
-                const events = order.tracking_info.events;
+            if (data.cainiao_events) {
+                const events = data.cainiao_events;
                 const modal = document.getElementById('eventsModal');
                 const content = document.getElementById('eventsContent');
                 
@@ -72,7 +67,7 @@ function showEvents(orderId) {
                 } else {
                     content.innerHTML = `
                         <div class="events-header">
-                            <p><strong>Tracking Number:</strong> ${order.tracking_number}</p>
+                            <p><strong>Tracking Number:</strong> ${data.tracking_number}</p>
                             <p><strong>Total Events:</strong> ${events.length}</p>
                         </div>
                         <div class="events-timeline">
@@ -1,5 +1,13 @@
 /* Global State Management */
 let currentEditId = null;
-let isLoadingOrders = false;
-let allOrders = []; // Store all orders for filtering/sorting
-
+let allOrders = []; // Orders loaded so far for the current filters/sort
+let ordersTotal = 0; // Total number of orders on the server
+let ordersMatched = 0; // Number of orders matching the current filters
+let nextOrdersCursor = null; // Cursor for the next page, null when everything is loaded
+let ordersVersion = null; // Server version of the loaded orders, for delta syncs
+let ordersRequestSeq = 0; // Used to ignore responses to superseded requests
+let runningJobs = {}; // Button id -> id of the background job it is following
+let latestJobUpdates = {}; // Job id -> latest progress pushed by the server
+let jobUpdateWaiters = {}; // Job id -> callback waiting for the job's next pushed update
+let eventStreamConnected = false; // Whether the server is currently pushing updates
+const ORDERS_PAGE_SIZE = 100;
@@ -16,8 +16,10 @@ async function refreshTracking(orderId, event) {
         const data = await response.json();
         
         if (response.ok && data.success) {
-            await loadOrders();
-            applyFilters(); // Reapply filters after refresh
+            // Nothing to re-render if no order changed
+            if (data.changed !== 0) {
+                await syncOrders();
+            }
             // Show a brief success message
             if (button) {
                 button.textContent = '✓';
@@ -46,8 +48,21 @@ async function refreshTracking(orderId, event) {
 }
 
 async function refreshAllTracking() {
-    const button = document.getElementById('refreshAllBtn');
+    await runRefreshAllJob('/api/orders/refresh-all', 'refreshAllBtn');
+}
+
+// Run a refresh-all job, showing its progress; clicking the button again cancels it
+async function runRefreshAllJob(url, buttonId) {
+    const button = document.getElementById(buttonId);
     const statusSpan = document.getElementById('refreshAllStatus');
+    
+    if (runningJobs[buttonId]) {
+        button.disabled = true;
+        statusSpan.textContent = 'Cancelling...';
+        await cancelJob(runningJobs[buttonId]);
+        return;
+    }
+    
     const originalText = button.textContent;
     
     // Disable button and show loading state
@@ -57,53 +72,48 @@ async function refreshAllTracking() {
     statusSpan.style.color = '#666';
     
     try {
-        const response = await fetch('/api/orders/refresh-all', {
-            method: 'POST'
+        const job = await runJob(url, job => {
+            runningJobs[buttonId] = job.id;
+            if (!job.cancel_requested) {
+                button.textContent = '⏹ Cancel';
+                button.disabled = false;
+                statusSpan.textContent = `⏳ ${job.processed} / ${job.total} orders...`;
+            }
         });
-
-        const data = await response.json();
         
-        if (response.ok && data.success) {
-            // Show success message
-            statusSpan.textContent = `✓ ${data.message}`;
-            statusSpan.style.color = '#28a745';
-            
-            // Reload orders to show updated data
-            await loadOrders();
-            applyFilters(); // Reapply filters after bulk refresh
-            
-            // Update last update times
-            await updateLastUpdateTimes();
-            
-            // Reset button after 3 seconds
-            setTimeout(() => {
-                button.textContent = originalText;
-                button.disabled = false;
-                statusSpan.textContent = '';
-            }, 3000);
-        } else {
-            // Show error message
-            statusSpan.textContent = `✗ Error: ${data.error || 'Failed to update orders'}`;
-            statusSpan.style.color = '#dc3545';
-            button.textContent = originalText;
-            button.disabled = false;
-            
-            // Clear error message after 5 seconds
-            setTimeout(() => {
-                statusSpan.textContent = '';
-            }, 5000);
+        if (job.status === 'failed') {
+            throw new Error(job.message || 'Failed to update orders');
         }
+        
+        // Show the outcome
+        statusSpan.textContent = `${job.status === 'cancelled' ? '⏹' : '✓'} ${job.message}`;
+        statusSpan.style.color = job.status === 'cancelled' ? '#666' : '#28a745';
+        
+        // Reload orders to show updated data (nothing to re-render if no order changed)
+        if (job.changed !== 0) {
+            await syncOrders();
+        }
+        
+        // Update last update times
+        await updateLastUpdateTimes();
+        
+        // Clear the message after 3 seconds
+        setTimeout(() => {
+            statusSpan.textContent = '';
+        }, 3000);
     } catch (error) {
         console.error('Error refreshing all tracking:', error);
-        statusSpan.textContent = '✗ Error: Failed to update orders';
+        statusSpan.textContent = `✗ Error: ${error.message || 'Failed to update orders'}`;
         statusSpan.style.color = '#dc3545';
-        button.textContent = originalText;
-        button.disabled = false;
         
         // Clear error message after 5 seconds
         setTimeout(() => {
             statusSpan.textContent = '';
         }, 5000);
+    } finally {
+        delete runningJobs[buttonId];
+        button.textContent = originalText;
+        button.disabled = false;
     }
 }
 
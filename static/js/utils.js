@@ -1,31 +1,4 @@
 /* Utility Functions */
-function parsePrice(priceString) {
-    if (!priceString) return null;
-    
-    // Extract numeric value from price string
-    // Handles formats like: "US $42.57", "$42.57", "42.57", "US $42|42|57", etc.
-    const match = priceString.match(/[\d,]+\.?\d*/);
-    if (match) {
-        // Remove commas and convert to number
-        return parseFloat(match[0].replace(/,/g, ''));
-    }
-    return null;
-}
-
-function comparePrices(priceA, priceB, ascending) {
-    const numA = parsePrice(priceA);
-    const numB = parsePrice(priceB);
-    
-    // Put orders without prices at the end
-    if (numA === null && numB === null) return 0;
-    if (numA === null) return 1;
-    if (numB === null) return -1;
-    
-    // Compare numeric values
-    const diff = numA - numB;
-    return ascending ? diff : -diff;
-}
-
 function formatOrderDate(orderDate, addedDate) {
     if (orderDate) {
         // If it's already in a readable format like "Nov 11, 2025", use it as-is
@@ -75,7 +48,7 @@ function formatOrderDate(orderDate, addedDate) {
 function updateTotalOrdersCount() {
     const totalCountElement = document.getElementById('totalOrdersCount');
     if (totalCountElement) {
-        totalCountElement.textContent = allOrders.length;
+        totalCountElement.textContent = ordersTotal;
     }
 }
 
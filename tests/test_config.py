@@ -0,0 +1,18 @@
+"""Tests for config's cached settings files"""
+import json
+
+from config import CachedJsonFile
+
+def test_pending_changes_are_merged_into_an_external_edit(tmp_path):
+    path = tmp_path / 'config.json'
+    path.write_text(json.dumps({'a': 1, 'b': 2}))
+    settings = CachedJsonFile(str(path), 'config')
+    assert settings.get('a') == 1
+
+    settings.update({'a': 5}, remove=['b'])
+    # Edited by hand before the delayed write happened
+    path.write_text(json.dumps({'a': 1, 'b': 2, 'edited': True}, indent=4))
+    settings.flush()
+
+    assert json.loads(path.read_text()) == {'a': 5, 'edited': True}
+    assert settings.get('edited') is True
@@ -0,0 +1,62 @@
+"""Tests for utils.scheduler's wake-up planning"""
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import models.poll_schedule as poll_schedule
+import utils.scheduler as scheduler
+from models.order import orders
+from models.poll_schedule import PollSchedule
+
+class FakeEngine:
+    def __init__(self):
+        self.delays = []
+
+    def call_later(self, delay, func):
+        self.delays.append(delay)
+        return None
+
+@pytest.fixture
+def schedule(tmp_path, monkeypatch):
+    schedule = PollSchedule(str(tmp_path / 'tracking_events.db'))
+    monkeypatch.setattr(scheduler, 'get_poll_schedule', lambda: schedule)
+    monkeypatch.setattr(poll_schedule, 'get_auto_update_interval_hours', lambda: 6)
+    monkeypatch.setattr(scheduler, 'get_auto_update_interval_hours', lambda: 6)
+    monkeypatch.setattr(scheduler, '_current_timer', None)
+    saved_orders = list(orders)
+    orders.clear()
+    yield schedule
+    orders.clear()
+    orders.extend(saved_orders)
+
+def test_doar_parcels_without_api_key_do_not_wake_the_scheduler(schedule, monkeypatch):
+    engine = FakeEngine()
+    monkeypatch.setattr(scheduler, 'get_refresh_engine', lambda: engine)
+    monkeypatch.setattr(scheduler, 'get_doar_api_key', lambda: '')
+    now = datetime.now()
+    orders.append({
+        'id': 1,
+        'tracking_number': 'AB123CN',
+        'tracking_info': {'status': 'In transit', 'last_update': now.isoformat()},
+        # Last refreshed long ago, so it would be overdue if it were scheduled
+        'doar_tracking_info': {'status': 'In transit', 'last_update': (now - timedelta(days=2)).isoformat()}
+    })
+
+    scheduler._sync_poll_schedule(time.time())
+    scheduler.schedule_next_update()
+
+    assert schedule.due('doar') == []
+    assert engine.delays[-1] > scheduler.MIN_WAKE_SECONDS
+
+def test_doar_parcels_are_scheduled_with_api_key(schedule, monkeypatch):
+    monkeypatch.setattr(scheduler, 'get_doar_api_key', lambda: 'key')
+    orders.append({
+        'id': 1,
+        'tracking_number': 'AB123CN',
+        'doar_tracking_info': {'status': 'In transit', 'last_update': (datetime.now() - timedelta(days=2)).isoformat()}
+    })
+
+    scheduler._sync_poll_schedule(time.time())
+
+    assert schedule.due('doar') == ['AB123CN']
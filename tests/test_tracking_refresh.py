@@ -0,0 +1,66 @@
+"""Tests for utils.tracking_refresh's refresh-all jobs"""
+import pytest
+
+import utils.tracking as tracking
+import utils.tracking_refresh as tracking_refresh
+from models.order import orders, normalize_tracking_number
+from utils.jobs import Job
+
+@pytest.fixture
+def refresh(monkeypatch):
+    """Run refresh-all against fake Cainiao modules, recording what gets applied"""
+    applied = []
+
+    def apply_tracking_results(provider, results, orders_by_tracking_number):
+        applied.append((dict(results), orders_by_tracking_number))
+        return [], []
+
+    monkeypatch.setattr(tracking_refresh, 'apply_tracking_results', apply_tracking_results)
+    monkeypatch.setattr(tracking_refresh, 'save_orders', lambda changed_orders: None)
+    monkeypatch.setattr(tracking_refresh, 'set_cainiao_last_update', lambda: None)
+    monkeypatch.setattr(tracking_refresh, 'get_cainiao_stream_responses', lambda: True)
+    saved_orders = list(orders)
+    orders.clear()
+    yield applied
+    orders.clear()
+    orders.extend(saved_orders)
+
+def _stream_modules(monkeypatch, mail_nos):
+    """Answer each requested chunk with the modules in `mail_nos` that it asked for"""
+    def stream_tracking_chunk(tracking_numbers, on_module):
+        requested = {normalize_tracking_number(tn) for tn in tracking_numbers}
+        for mail_no in mail_nos:
+            if normalize_tracking_number(mail_no) in requested:
+                on_module(mail_no, {'status': 'In transit', 'events': []})
+    monkeypatch.setattr(tracking, '_stream_tracking_chunk', stream_tracking_chunk)
+
+def test_tracking_number_variants_share_one_streamed_result(refresh, monkeypatch):
+    _stream_modules(monkeypatch, ['AB123CN'])
+    orders.extend([
+        {'id': 1, 'tracking_number': 'ab123cn'},
+        {'id': 2, 'tracking_number': 'AB123CN'},
+        {'id': 3, 'tracking_number': ' AB 123 CN '}
+    ])
+    job = Job('refresh-all')
+
+    tracking_refresh.refresh_all_cainiao(job)
+
+    counts = job.to_dict()
+    assert counts['updated'] == 3
+    assert counts['failed'] == 0
+    assert job.errors == []
+    (results, orders_by_tracking_number), = refresh
+    assert list(results) == ['AB123CN']
+    assert [order['id'] for order in orders_by_tracking_number['AB123CN']] == [1, 2, 3]
+
+def test_streamed_results_are_applied_a_chunk_at_a_time(refresh, monkeypatch):
+    monkeypatch.setattr(tracking_refresh, 'get_cainiao_bulk_chunk_size', lambda: 2)
+    monkeypatch.setattr(tracking_refresh, 'get_cainiao_bulk_max_workers', lambda: 1)
+    tracking_numbers = [f'LP{n:09d}CN' for n in range(5)]
+    _stream_modules(monkeypatch, tracking_numbers)
+    orders.extend({'id': n, 'tracking_number': tn} for n, tn in enumerate(tracking_numbers, 1))
+
+    tracking_refresh.refresh_all_cainiao(Job('refresh-all'))
+
+    # One apply per full chunk of results, not one per parcel
+    assert [len(results) for results, _ in refresh] == [2, 2, 1]
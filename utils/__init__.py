@@ -1,15 +1,17 @@
 """Utilities package"""
 from .images import download_and_save_image
-from .tracking import fetch_tracking_info, fetch_bulk_tracking_info, parse_tracking_module
-from .aliexpress import extract_product_info, is_mostly_english
+from .tracking import fetch_tracking_info, fetch_bulk_tracking_info, stream_bulk_tracking_info, parse_tracking_module
+from .aliexpress import extract_product_info, extract_product_infos, is_mostly_english
 from .curl_parser import parse_curl_command, parse_jsonp_response, extract_orders_from_api_response
 
 __all__ = [
     'download_and_save_image',
     'fetch_tracking_info',
     'fetch_bulk_tracking_info',
+    'stream_bulk_tracking_info',
     'parse_tracking_module',
     'extract_product_info',
+    'extract_product_infos',
     'is_mostly_english',
     'parse_curl_command',
     'parse_jsonp_response',
@@ -3,7 +3,17 @@ import requests
 from bs4 import BeautifulSoup
 import re
 import json
+import asyncio
+import threading
+import traceback
+from config import get_product_page_hedge_delay_seconds
+from models.product_cache import get_product_cache, lookup_product, local_image_exists, is_placeholder_title
 from .images import download_and_save_image
+from .product_page import PageScan
+from . import http_client
+from .refresh_engine import get_refresh_engine
+
+_json_decoder = json.JSONDecoder()
 
 def is_mostly_english(text):
     """Check if text is mostly English (ASCII) characters"""
@@ -26,600 +36,795 @@ def is_mostly_english(text):
     # At least 70% should be ASCII letters, and we need at least some letters
     return ascii_letters > total_chars * 0.5 and ascii_letters >= 5
 
-# Note: extract_product_info is very large (~600 lines)
-# It will be added in the next step due to size constraints
 
-def extract_product_info(aliexpress_url):
-    """Extract product information from AliExpress URL"""
-    try:
-        # Extract product ID first (before URL modification)
-        product_id = None
-        id_match = re.search(r'/(\d+)\.html', aliexpress_url)
-        if id_match:
-            product_id = id_match.group(1)
-        
-        # Try multiple URL variations
-        urls_to_try = []
-        
-        # 1. Normalized www.aliexpress.com with lang=en
-        normalized_url = aliexpress_url
-        # Normalize domain to www.aliexpress.com for better compatibility
-        normalized_url = re.sub(r'https?://([a-z]{2}\.)?aliexpress\.com', r'https://www.aliexpress.com', normalized_url, flags=re.IGNORECASE)
-        # Remove tracking parameters
-        normalized_url = re.sub(r'[&?]lang=[^&]*', '', normalized_url)
-        normalized_url = re.sub(r'[&?]gatewayAdapt=[^&]*', '', normalized_url)
-        normalized_url = re.sub(r'[&?]spm=[^&]*', '', normalized_url)
-        # Add language parameter
-        separator = '&' if '?' in normalized_url else '?'
-        urls_to_try.append(f"{normalized_url}{separator}lang=en")
-        
-        # 2. Original URL (in case normalization breaks it)
-        urls_to_try.append(aliexpress_url)
-        
-        # 3. Simple www version without parameters
-        simple_url = re.sub(r'https?://([a-z]{2}\.)?aliexpress\.com', r'https://www.aliexpress.com', aliexpress_url, flags=re.IGNORECASE)
-        simple_url = re.sub(r'\?.*$', '', simple_url)  # Remove all query parameters
-        urls_to_try.append(f"{simple_url}?lang=en")
-        
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.9',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-            'Cache-Control': 'no-cache',
-            'Referer': 'https://www.aliexpress.com/'
-        }
-        
-        response = None
-        url = None
-        for attempt_url in urls_to_try:
-            try:
-                print(f"Trying URL: {attempt_url}")
-                response = requests.get(attempt_url, headers=headers, timeout=15, allow_redirects=True)
-                if response.status_code == 200 and len(response.content) > 1000:  # Make sure we got actual content
-                    url = attempt_url
-                    break
-            except Exception as e:
-                print(f"Failed to fetch {attempt_url}: {e}")
-                continue
-        
-        if not response or response.status_code != 200:
-            raise Exception(f"Failed to fetch product page. Tried {len(urls_to_try)} URL variations.")
-        
-        response.raise_for_status()
-        
-        # Check if we got meaningful content
-        if len(response.content) < 500:
-            raise Exception("Received empty or very short response from AliExpress")
-        
-        soup = BeautifulSoup(response.content, 'html.parser')
-        html_text = response.text
-        
-        # Debug: Print page title to see what we got
-        page_title = soup.find('title')
-        if page_title:
-            print(f"Page title: {page_title.get_text()[:100]}")
-        
-        # Extract product title - try multiple methods
-        title = None
-        
-        # Method 1: Try meta tags first (most reliable)
-        meta_selectors = [
-            ('meta', {'property': 'og:title'}),
-            ('meta', {'name': 'twitter:title'}),
-            ('meta', {'property': 'twitter:title'}),
-            ('meta', {'itemprop': 'name'})
-        ]
-        for tag, attrs in meta_selectors:
-            meta_elem = soup.find(tag, attrs)
-            if meta_elem and meta_elem.get('content'):
-                candidate_title = meta_elem.get('content').strip()
-                # Clean up common AliExpress suffixes
-                candidate_title = re.sub(r'\s*-\s*AliExpress.*$', '', candidate_title, flags=re.IGNORECASE)
-                # Prefer English titles
-                if candidate_title and is_mostly_english(candidate_title):
-                    title = candidate_title
-                    break
-                elif not title:  # Keep as fallback if no English found
-                    title = candidate_title
-        
-        # Method 2: Try to extract from JSON-LD structured data
-        if not title or not is_mostly_english(title):
-            json_ld_scripts = soup.find_all('script', type='application/ld+json')
-            english_title = None
-            fallback_title = None
-            for script in json_ld_scripts:
-                try:
-                    data = json.loads(script.string)
-                    if isinstance(data, dict):
-                        # Look for English-specific fields first
-                        if 'name' in data:
-                            candidate = data['name'].strip()
-                            if is_mostly_english(candidate):
-                                english_title = candidate
-                            elif not fallback_title:
-                                fallback_title = candidate
-                        # Check for multi-language structure
-                        if 'name' in data and isinstance(data['name'], dict):
-                            if 'en' in data['name']:
-                                english_title = data['name']['en'].strip()
-                            elif 'en_US' in data['name']:
-                                english_title = data['name']['en_US'].strip()
-                        elif '@graph' in data:
-                            for item in data['@graph']:
-                                if isinstance(item, dict) and item.get('@type') == 'Product':
-                                    if 'name' in item:
-                                        candidate = item['name'].strip() if isinstance(item['name'], str) else None
-                                        if candidate:
-                                            if is_mostly_english(candidate):
-                                                english_title = candidate
-                                            elif not fallback_title:
-                                                fallback_title = candidate
-                                    # Check for multi-language name
-                                    if 'name' in item and isinstance(item['name'], dict):
-                                        if 'en' in item['name']:
-                                            english_title = item['name']['en'].strip()
-                                        elif 'en_US' in item['name']:
-                                            english_title = item['name']['en_US'].strip()
-                    if english_title:
-                        break
-                except (json.JSONDecodeError, KeyError, TypeError):
-                    continue
+def _title_from_meta(find_meta):
+    """Method 1: the title meta tags (most reliable), preferring an English one.
+    
+    `find_meta(attribute, value)` returns the content of the first <meta> tag whose
+    `attribute` is `value`, or None.
+    """
+    title = None
+    meta_selectors = [
+        ('property', 'og:title'),
+        ('name', 'twitter:title'),
+        ('property', 'twitter:title'),
+        ('itemprop', 'name')
+    ]
+    for attribute, value in meta_selectors:
+        content = find_meta(attribute, value)
+        if content:
+            candidate_title = content.strip()
+            # Clean up common AliExpress suffixes
+            candidate_title = re.sub(r'\s*-\s*AliExpress.*$', '', candidate_title, flags=re.IGNORECASE)
+            # Prefer English titles
+            if candidate_title and is_mostly_english(candidate_title):
+                title = candidate_title
+                break
+            elif not title:  # Keep as fallback if no English found
+                title = candidate_title
+    return title
+
+def _title_from_json_ld(script_texts, title):
+    """Method 2: the product name in JSON-LD structured data"""
+    english_title = None
+    fallback_title = None
+    for script_text in script_texts:
+        try:
+            data = json.loads(script_text)
+            if isinstance(data, dict):
+                # Look for English-specific fields first
+                if 'name' in data:
+                    candidate = data['name'].strip()
+                    if is_mostly_english(candidate):
+                        english_title = candidate
+                    elif not fallback_title:
+                        fallback_title = candidate
+                # Check for multi-language structure
+                if 'name' in data and isinstance(data['name'], dict):
+                    if 'en' in data['name']:
+                        english_title = data['name']['en'].strip()
+                    elif 'en_US' in data['name']:
+                        english_title = data['name']['en_US'].strip()
+                elif '@graph' in data:
+                    for item in data['@graph']:
+                        if isinstance(item, dict) and item.get('@type') == 'Product':
+                            if 'name' in item:
+                                candidate = item['name'].strip() if isinstance(item['name'], str) else None
+                                if candidate:
+                                    if is_mostly_english(candidate):
+                                        english_title = candidate
+                                    elif not fallback_title:
+                                        fallback_title = candidate
+                            # Check for multi-language name
+                            if 'name' in item and isinstance(item['name'], dict):
+                                if 'en' in item['name']:
+                                    english_title = item['name']['en'].strip()
+                                elif 'en_US' in item['name']:
+                                    english_title = item['name']['en_US'].strip()
             if english_title:
-                title = english_title
-            elif fallback_title and not title:
-                title = fallback_title
+                break
+        except (json.JSONDecodeError, KeyError, TypeError):
+            continue
+    if english_title:
+        title = english_title
+    elif fallback_title and not title:
+        title = fallback_title
+    return title
+
+def _decode_run_params(script_text):
+    """Decode the object assigned to window.runParams in a script (None if there is none)"""
+    runparams_start = script_text.find('window.runParams')
+    if runparams_start == -1:
+        return None
+    brace_start = script_text.find('{', runparams_start)
+    if brace_start == -1:
+        return None
+    try:
+        # raw_decode stops at the end of the object, whatever follows it in the script
+        return _json_decoder.raw_decode(script_text, brace_start)[0]
+    except ValueError:
+        return None
+
+def _title_from_scripts(script_texts, title):
+    """Method 3: the title in window.runParams or similar script tags"""
+    for script_text in script_texts:
+        if not script_text:
+            continue
         
-        # Method 3: Try to extract from window.runParams or similar script tags
-        if not title or not is_mostly_english(title):
-            scripts = soup.find_all('script')
-            for script in scripts:
-                if script.string:
-                    script_text = script.string
-                    
-                    # Try to find window.runParams with product data
-                    # Look for the full runParams structure - use a more robust approach
-                    # First try to find the start of runParams
-                    runparams_start = script_text.find('window.runParams')
-                    if runparams_start != -1:
-                        # Find the opening brace
-                        brace_start = script_text.find('{', runparams_start)
-                        if brace_start != -1:
-                            # Try to find matching closing brace (simplified - count braces)
-                            brace_count = 0
-                            brace_end = brace_start
-                            for i in range(brace_start, min(brace_start + 50000, len(script_text))):  # Limit search
-                                if script_text[i] == '{':
-                                    brace_count += 1
-                                elif script_text[i] == '}':
-                                    brace_count -= 1
-                                    if brace_count == 0:
-                                        brace_end = i + 1
-                                        break
-                            
-                            if brace_end > brace_start:
-                                try:
-                                    runparams_json = script_text[brace_start:brace_end]
-                                    # Try to parse as JSON
-                                    runparams_data = json.loads(runparams_json)
-                                    # Look for subject or title in various places
-                                    if isinstance(runparams_data, dict):
-                                        # Check for subject directly
-                                        if 'subject' in runparams_data:
-                                            candidate = str(runparams_data['subject']).strip()
-                                            if candidate and is_mostly_english(candidate) and len(candidate) > 10:
-                                                title = candidate
-                                                break
-                                        # Check for data structure
-                                        if 'data' in runparams_data:
-                                            data = runparams_data['data']
-                                            if isinstance(data, dict):
-                                                if 'subject' in data:
-                                                    candidate = str(data['subject']).strip()
-                                                    if candidate and is_mostly_english(candidate) and len(candidate) > 10:
-                                                        title = candidate
-                                                        break
-                                            elif isinstance(data, list) and len(data) > 0:
-                                                # Sometimes data is a list
-                                                for item in data:
-                                                    if isinstance(item, dict) and 'subject' in item:
-                                                        candidate = str(item['subject']).strip()
-                                                        if candidate and is_mostly_english(candidate) and len(candidate) > 10:
-                                                            title = candidate
-                                                            break
-                                                    if title:
-                                                        break
-                                except (json.JSONDecodeError, ValueError) as e:
-                                    # If JSON parsing fails, try regex approach
-                                    pass
-                    
-                    # Try to find English title in multi-language data structures
-                    # Look for "en" or "en_US" language keys
-                    en_title_match = re.search(r'"(?:en|en_US|en-US)"\s*:\s*\{[^}]*"(?:subject|title|name)"\s*:\s*"([^"]+)"', script_text)
-                    if not en_title_match:
-                        # Look for English in translations object
-                        en_title_match = re.search(r'"translations"\s*:\s*\{[^}]*"en"[^}]*"(?:subject|title|name)"\s*:\s*"([^"]+)"', script_text)
-                    if not en_title_match:
-                        # Look for product title in window.runParams (English version) - more specific pattern
-                        en_title_match = re.search(r'window\.runParams\s*=\s*\{[^}]*"subject"\s*:\s*"([^"]+)"', script_text)
-                    if not en_title_match:
-                        # Look for subject in data structure
-                        en_title_match = re.search(r'"data"\s*:\s*\{[^}]*"subject"\s*:\s*"([^"]+)"', script_text)
-                    if not en_title_match:
-                        # Generic subject/title search - but only if it looks English
-                        subject_matches = re.findall(r'"subject"\s*:\s*"([^"]+)"', script_text)
-                        for match in subject_matches:
-                            candidate = match.strip()
-                            # Unescape
-                            candidate = candidate.replace('\\u0026', '&').replace('\\/', '/')
-                            try:
-                                candidate = candidate.encode().decode('unicode_escape') if '\\u' in candidate else candidate
-                            except:
-                                pass
+        # Look for subject or title in window.runParams
+        runparams_data = _decode_run_params(script_text)
+        if isinstance(runparams_data, dict):
+            # Check for subject directly
+            if 'subject' in runparams_data:
+                candidate = str(runparams_data['subject']).strip()
+                if candidate and is_mostly_english(candidate) and len(candidate) > 10:
+                    return candidate
+            # Check for data structure
+            if 'data' in runparams_data:
+                data = runparams_data['data']
+                if isinstance(data, dict):
+                    if 'subject' in data:
+                        candidate = str(data['subject']).strip()
+                        if candidate and is_mostly_english(candidate) and len(candidate) > 10:
+                            return candidate
+                elif isinstance(data, list) and len(data) > 0:
+                    # Sometimes data is a list
+                    for item in data:
+                        if isinstance(item, dict) and 'subject' in item:
+                            candidate = str(item['subject']).strip()
                             if candidate and is_mostly_english(candidate) and len(candidate) > 10:
-                                en_title_match = type('obj', (object,), {'group': lambda x: candidate})()
+                                title = candidate
                                 break
-                    if not en_title_match:
-                        en_title_match = re.search(r'"productTitle"\s*:\s*"([^"]+)"', script_text)
-                    if not en_title_match:
-                        en_title_match = re.search(r'"title"\s*:\s*"([^"]+)"', script_text)
-                    
-                    if en_title_match:
-                        candidate_title = en_title_match.group(1).strip()
-                        # Unescape common HTML entities and Unicode
-                        candidate_title = candidate_title.replace('\\u0026', '&').replace('\\/', '/')
-                        try:
-                            candidate_title = candidate_title.encode().decode('unicode_escape') if '\\u' in candidate_title else candidate_title
-                        except:
-                            pass
-                        # Only accept English titles
-                        if candidate_title and is_mostly_english(candidate_title) and len(candidate_title) > 10:
-                            title = candidate_title
-                            break
-                        elif not title and len(candidate_title) > 10:  # Keep as fallback only if no title yet
-                            title = candidate_title
-        
-        # Method 4: Try CSS selectors
-        if not title:
-            title_selectors = [
-                'h1[data-pl="product-title"]',
-                'h1.product-title-text',
-                'h1[class*="product-title"]',
-                'h1[class*="ProductTitle"]',
-                'h1.product-title',
-                'h1',
-                '[data-pl="product-title"]',
-                '.product-title-text'
-            ]
-            for selector in title_selectors:
-                title_elem = soup.select_one(selector)
-                if title_elem:
-                    title = title_elem.get_text(strip=True)
-                    if title and len(title) > 5:  # Make sure it's not just whitespace
-                        break
         
-        # Method 5: Extract from page title tag and clean it
-        if not title or not is_mostly_english(title) or len(title) < 10:
-            title_tag = soup.find('title')
-            if title_tag:
-                candidate_title = title_tag.get_text(strip=True)
-                # Remove common AliExpress suffixes
-                candidate_title = re.sub(r'\s*-\s*AliExpress.*$', '', candidate_title, flags=re.IGNORECASE)
-                candidate_title = re.sub(r'\s*\|\s*AliExpress.*$', '', candidate_title, flags=re.IGNORECASE)
-                # Only accept if it's English and meaningful length
-                if candidate_title and is_mostly_english(candidate_title) and len(candidate_title) > 10:
-                    title = candidate_title
-                elif not title and len(candidate_title) > 10:
-                    # Last resort - but still prefer English
-                    title = candidate_title
-        
-        # Extract product image - FIRST PRIORITY: og:image meta tag
-        image_url = None
-        print(f"\n=== IMAGE EXTRACTION DEBUG for {aliexpress_url} ===")
+        # Try to find English title in multi-language data structures
+        # Look for "en" or "en_US" language keys
+        en_title_match = re.search(r'"(?:en|en_US|en-US)"\s*:\s*\{[^}]*"(?:subject|title|name)"\s*:\s*"([^"]+)"', script_text)
+        if not en_title_match:
+            # Look for English in translations object
+            en_title_match = re.search(r'"translations"\s*:\s*\{[^}]*"en"[^}]*"(?:subject|title|name)"\s*:\s*"([^"]+)"', script_text)
+        if not en_title_match:
+            # Look for product title in window.runParams (English version) - more specific pattern
+            en_title_match = re.search(r'window\.runParams\s*=\s*\{[^}]*"subject"\s*:\s*"([^"]+)"', script_text)
+        if not en_title_match:
+            # Look for subject in data structure
+            en_title_match = re.search(r'"data"\s*:\s*\{[^}]*"subject"\s*:\s*"([^"]+)"', script_text)
+        if not en_title_match:
+            # Generic subject/title search - but only if it looks English
+            subject_matches = re.findall(r'"subject"\s*:\s*"([^"]+)"', script_text)
+            for match in subject_matches:
+                candidate = match.strip()
+                # Unescape
+                candidate = candidate.replace('\\u0026', '&').replace('\\/', '/')
+                try:
+                    candidate = candidate.encode().decode('unicode_escape') if '\\u' in candidate else candidate
+                except:
+                    pass
+                if candidate and is_mostly_english(candidate) and len(candidate) > 10:
+                    en_title_match = type('obj', (object,), {'group': lambda x: candidate})()
+                    break
+        if not en_title_match:
+            en_title_match = re.search(r'"productTitle"\s*:\s*"([^"]+)"', script_text)
+        if not en_title_match:
+            en_title_match = re.search(r'"title"\s*:\s*"([^"]+)"', script_text)
         
-        # FIRST PRIORITY: Get image from og:image meta tag (most reliable)
-        og_image = soup.find('meta', {'property': 'og:image'})
-        print(f"1. Checking og:image meta tag...")
-        if og_image:
-            candidate = og_image.get('content')
-            print(f"   Found og:image content: {candidate[:100] if candidate else 'None'}...")
-            if candidate:
-                candidate = candidate.strip()
-                original_candidate = candidate
-                # Handle relative URLs
-                if candidate.startswith('//'):
-                    candidate = 'https:' + candidate
-                    print(f"   Converted // to https: {candidate[:100]}...")
-                elif candidate.startswith('/'):
-                    candidate = 'https://www.aliexpress.com' + candidate
-                    print(f"   Converted / to full URL: {candidate[:100]}...")
-                if candidate.startswith('http'):
-                    # Skip thumbnails
-                    if '50x50' not in candidate and '60x60' not in candidate and '80x80' not in candidate:
-                        image_url = candidate
-                        print(f"   ✓ SELECTED og:image: {image_url[:150]}...")
-                    else:
-                        print(f"   ✗ Rejected og:image (thumbnail): {candidate[:100]}...")
+        if en_title_match:
+            candidate_title = en_title_match.group(1).strip()
+            # Unescape common HTML entities and Unicode
+            candidate_title = candidate_title.replace('\\u0026', '&').replace('\\/', '/')
+            try:
+                candidate_title = candidate_title.encode().decode('unicode_escape') if '\\u' in candidate_title else candidate_title
+            except:
+                pass
+            # Only accept English titles
+            if candidate_title and is_mostly_english(candidate_title) and len(candidate_title) > 10:
+                return candidate_title
+            elif not title and len(candidate_title) > 10:  # Keep as fallback only if no title yet
+                title = candidate_title
+    return title
+
+def _title_from_page_title(candidate_title, title):
+    """Method 5: the page's <title> text, cleaned"""
+    # Remove common AliExpress suffixes
+    candidate_title = re.sub(r'\s*-\s*AliExpress.*$', '', candidate_title, flags=re.IGNORECASE)
+    candidate_title = re.sub(r'\s*\|\s*AliExpress.*$', '', candidate_title, flags=re.IGNORECASE)
+    # Only accept if it's English and meaningful length
+    if candidate_title and is_mostly_english(candidate_title) and len(candidate_title) > 10:
+        title = candidate_title
+    elif not title and len(candidate_title) > 10:
+        # Last resort - but still prefer English
+        title = candidate_title
+    return title
+
+def _image_from_meta(find_meta):
+    """The product image from the og:image meta tag, then the other image meta tags"""
+    image_url = None
+    
+    # FIRST PRIORITY: Get image from og:image meta tag (most reliable)
+    candidate = find_meta('property', 'og:image')
+    print(f"1. Checking og:image meta tag...")
+    if candidate is not None:
+        print(f"   Found og:image content: {candidate[:100] if candidate else 'None'}...")
+        if candidate:
+            candidate = candidate.strip()
+            # Handle relative URLs
+            if candidate.startswith('//'):
+                candidate = 'https:' + candidate
+                print(f"   Converted // to https: {candidate[:100]}...")
+            elif candidate.startswith('/'):
+                candidate = 'https://www.aliexpress.com' + candidate
+                print(f"   Converted / to full URL: {candidate[:100]}...")
+            if candidate.startswith('http'):
+                # Skip thumbnails
+                if '50x50' not in candidate and '60x60' not in candidate and '80x80' not in candidate:
+                    image_url = candidate
+                    print(f"   ✓ SELECTED og:image: {image_url[:150]}...")
                 else:
-                    print(f"   ✗ Rejected og:image (not http): {candidate[:100]}...")
-        else:
-            print(f"   ✗ No og:image meta tag found")
-        
-        # SECOND PRIORITY: Try other meta tags
-        if not image_url:
-            print(f"2. Checking other meta tags...")
-            image_selectors = [
-                ('meta', {'name': 'twitter:image'}),
-                ('meta', {'property': 'twitter:image'}),
-                ('meta', {'itemprop': 'image'})
-            ]
-            for tag, attrs in image_selectors:
-                img_elem = soup.find(tag, attrs)
-                if img_elem and img_elem.get('content'):
-                    candidate = img_elem.get('content').strip()
-                    print(f"   Found {tag} {attrs}: {candidate[:100] if candidate else 'None'}...")
+                    print(f"   ✗ Rejected og:image (thumbnail): {candidate[:100]}...")
+            else:
+                print(f"   ✗ Rejected og:image (not http): {candidate[:100]}...")
+    else:
+        print(f"   ✗ No og:image meta tag found")
+    
+    # SECOND PRIORITY: Try other meta tags
+    if not image_url:
+        print(f"2. Checking other meta tags...")
+        image_selectors = [
+            ('name', 'twitter:image'),
+            ('property', 'twitter:image'),
+            ('itemprop', 'image')
+        ]
+        for attribute, value in image_selectors:
+            content = find_meta(attribute, value)
+            if content:
+                candidate = content.strip()
+                print(f"   Found meta {attribute}={value}: {candidate[:100] if candidate else 'None'}...")
+                if candidate:
+                    if candidate.startswith('//'):
+                        candidate = 'https:' + candidate
+                    elif candidate.startswith('/'):
+                        candidate = 'https://www.aliexpress.com' + candidate
+                    if candidate.startswith('http'):
+                        # Skip thumbnails
+                        if '50x50' not in candidate and '60x60' not in candidate and '80x80' not in candidate:
+                            image_url = candidate
+                            print(f"   ✓ SELECTED meta {attribute}={value}: {image_url[:150]}...")
+                            break
+                        else:
+                            print(f"   ✗ Rejected (thumbnail): {candidate[:100]}...")
+    else:
+        print(f"2. Skipping other meta tags (already found image)")
+    return image_url
+
+def _image_from_dom(soup):
+    """The product image from CSS selectors, script tags and generic selectors"""
+    image_url = None
+    
+    # THIRD PRIORITY: Try CSS selectors (most accurate for getting the main product image)
+    print(f"3. Checking CSS selectors...")
+    image_candidates = []
+    specific_selectors = [
+        'html body.unfoldShopCart.pdp-new-pc div#root div.pdp-page-wrap div.pdp-body.pdp-wrap div.pdp-body-top div.pdp-body-top-left div.pdp-info div.pdp-info-left div.main-image--wrap--nFuR5UU div.image-view-v2--wrap--N4InOxs div.slider--wrap--dfLgmYD div.slider--slider--VKj5hty div div.slider--item--RpyeewA div.slider--img--kD4mIg7 img',
+        'div.main-image--wrap--nFuR5UU div.slider--img--kD4mIg7 img',
+        'div.slider--img--kD4mIg7 img',
+        'div.image-view-v2--wrap--N4InOxs img',
+        'div.pdp-info-left div.main-image--wrap--nFuR5UU img',
+        'div.pdp-info-left img',
+    ]
+    
+    for i, selector in enumerate(specific_selectors):
+        try:
+            img_elems = soup.select(selector)
+            print(f"   Selector {i+1} ({selector[:50]}...): Found {len(img_elems)} elements")
+            # Get the first image (main product image, not thumbnails)
+            if img_elems:
+                img_elem = img_elems[0]  # First one is usually the main image
+                # Try multiple attributes in order of preference
+                for attr in ['data-zoom', 'data-zoom-image', 'data-src-main', 'src', 'data-src', 'data-lazy-src']:
+                    candidate = img_elem.get(attr)
                     if candidate:
+                        print(f"      Found {attr}: {candidate[:100]}...")
                         if candidate.startswith('//'):
                             candidate = 'https:' + candidate
                         elif candidate.startswith('/'):
                             candidate = 'https://www.aliexpress.com' + candidate
-                        if candidate.startswith('http'):
-                            # Skip thumbnails
+                        if candidate.startswith('http') and any(ext in candidate for ext in ['.jpg', '.jpeg', '.png', '.webp', '.avif']):
+                            # Skip thumbnails (usually have "50x50" or "60x60" in URL)
                             if '50x50' not in candidate and '60x60' not in candidate and '80x80' not in candidate:
-                                image_url = candidate
-                                print(f"   ✓ SELECTED {tag} {attrs}: {image_url[:150]}...")
+                                image_candidates.append(('css_' + selector[:30], candidate))
+                                print(f"      ✓ Added candidate: {candidate[:150]}...")
                                 break
                             else:
-                                print(f"   ✗ Rejected (thumbnail): {candidate[:100]}...")
-        else:
-            print(f"2. Skipping other meta tags (already found image)")
+                                print(f"      ✗ Rejected (thumbnail): {candidate[:100]}...")
+        except Exception as e:
+            print(f"   Selector {i+1} error: {str(e)[:100]}")
+            # Skip invalid selectors
+            continue
+    
+    # Select best CSS candidate (prioritize optimized formats)
+    if image_candidates:
+        print(f"   Found {len(image_candidates)} CSS candidates")
+        # Sort by quality: avif > optimized jpg > media domain > others
+        def get_priority(candidate):
+            if '.avif' in candidate or '_220x220q75.jpg_.avif' in candidate:
+                return 1
+            elif '_220x220q75' in candidate:
+                return 2
+            elif 'aliexpress-media.com' in candidate:
+                return 3
+            else:
+                return 4
         
-        # THIRD PRIORITY: Try CSS selectors (most accurate for getting the main product image)
-        if not image_url:
-            print(f"3. Checking CSS selectors...")
-            image_candidates = []
-            specific_selectors = [
-                'html body.unfoldShopCart.pdp-new-pc div#root div.pdp-page-wrap div.pdp-body.pdp-wrap div.pdp-body-top div.pdp-body-top-left div.pdp-info div.pdp-info-left div.main-image--wrap--nFuR5UU div.image-view-v2--wrap--N4InOxs div.slider--wrap--dfLgmYD div.slider--slider--VKj5hty div div.slider--item--RpyeewA div.slider--img--kD4mIg7 img',
-                'div.main-image--wrap--nFuR5UU div.slider--img--kD4mIg7 img',
-                'div.slider--img--kD4mIg7 img',
-                'div.image-view-v2--wrap--N4InOxs img',
-                'div.pdp-info-left div.main-image--wrap--nFuR5UU img',
-                'div.pdp-info-left img',
-            ]
-            
-            for i, selector in enumerate(specific_selectors):
-                try:
-                    img_elems = soup.select(selector)
-                    print(f"   Selector {i+1} ({selector[:50]}...): Found {len(img_elems)} elements")
-                    # Get the first image (main product image, not thumbnails)
-                    if img_elems:
-                        img_elem = img_elems[0]  # First one is usually the main image
-                        # Try multiple attributes in order of preference
-                        for attr in ['data-zoom', 'data-zoom-image', 'data-src-main', 'src', 'data-src', 'data-lazy-src']:
-                            candidate = img_elem.get(attr)
-                            if candidate:
-                                print(f"      Found {attr}: {candidate[:100]}...")
-                                if candidate.startswith('//'):
-                                    candidate = 'https:' + candidate
-                                elif candidate.startswith('/'):
-                                    candidate = 'https://www.aliexpress.com' + candidate
-                                if candidate.startswith('http') and any(ext in candidate for ext in ['.jpg', '.jpeg', '.png', '.webp', '.avif']):
-                                    # Skip thumbnails (usually have "50x50" or "60x60" in URL)
-                                    if '50x50' not in candidate and '60x60' not in candidate and '80x80' not in candidate:
-                                        image_candidates.append(('css_' + selector[:30], candidate))
-                                        print(f"      ✓ Added candidate: {candidate[:150]}...")
-                                        break
-                                    else:
-                                        print(f"      ✗ Rejected (thumbnail): {candidate[:100]}...")
-                except Exception as e:
-                    print(f"   Selector {i+1} error: {str(e)[:100]}")
-                    # Skip invalid selectors
-                    continue
-            
-            # Select best CSS candidate (prioritize optimized formats)
-            if image_candidates:
-                print(f"   Found {len(image_candidates)} CSS candidates")
-                # Sort by quality: avif > optimized jpg > media domain > others
-                def get_priority(candidate):
-                    if '.avif' in candidate or '_220x220q75.jpg_.avif' in candidate:
-                        return 1
-                    elif '_220x220q75' in candidate:
-                        return 2
-                    elif 'aliexpress-media.com' in candidate:
-                        return 3
-                    else:
-                        return 4
+        image_candidates.sort(key=lambda x: get_priority(x[1]))
+        image_url = image_candidates[0][1]
+        print(f"   ✓ SELECTED CSS candidate: {image_url[:150]}...")
+    else:
+        print(f"   ✗ No valid CSS candidates found")
+    
+    # FOURTH PRIORITY: Try script tags (but be careful - might get wrong images)
+    if not image_url:
+        print(f"4. Checking script tags...")
+        scripts = soup.find_all('script')
+        script_candidates = []
+        print(f"   Found {len(scripts)} script tags")
+        
+        for i, script in enumerate(scripts):
+            if script.string:
+                script_text = script.string
                 
-                image_candidates.sort(key=lambda x: get_priority(x[1]))
-                image_url = image_candidates[0][1]
-                print(f"   ✓ SELECTED CSS candidate: {image_url[:150]}...")
-            else:
-                print(f"   ✗ No valid CSS candidates found")
-        else:
-            print(f"3. Skipping CSS selectors (already found image)")
+                # Look for optimized image URLs first (prefer these)
+                # Look for .avif format (best quality)
+                avif_matches = re.findall(r'"(https?://[^"]*\.avif)"', script_text)
+                if avif_matches:
+                    print(f"   Script {i+1}: Found {len(avif_matches)} .avif matches")
+                for match in avif_matches:
+                    candidate = match.strip().replace('\\/', '/')
+                    if candidate.startswith('http') and '50x50' not in candidate and '60x60' not in candidate:
+                        script_candidates.append(('avif', candidate))
+                        print(f"      ✓ Added avif candidate: {candidate[:150]}...")
+                
+                # Look for optimized .jpg with size parameters
+                optimized_jpg_matches = re.findall(r'"(https?://[^"]*_220x220q75\.jpg[^"]*)"', script_text)
+                if optimized_jpg_matches:
+                    print(f"   Script {i+1}: Found {len(optimized_jpg_matches)} optimized jpg matches")
+                for match in optimized_jpg_matches:
+                    candidate = match.strip().replace('\\/', '/')
+                    if candidate.startswith('http'):
+                        script_candidates.append(('optimized_jpg', candidate))
+                        print(f"      ✓ Added optimized_jpg candidate: {candidate[:150]}...")
+                
+                # Look for aliexpress-media.com images (better domain)
+                media_matches = re.findall(r'"(https?://[^"]*aliexpress-media\.com[^"]*)"', script_text)
+                if media_matches:
+                    print(f"   Script {i+1}: Found {len(media_matches)} aliexpress-media.com matches")
+                for match in media_matches:
+                    candidate = match.strip().replace('\\/', '/')
+                    if candidate.startswith('http') and any(ext in candidate for ext in ['.jpg', '.jpeg', '.png', '.webp', '.avif']):
+                        if '50x50' not in candidate and '60x60' not in candidate:
+                            script_candidates.append(('media_domain', candidate))
+                            print(f"      ✓ Added media_domain candidate: {candidate[:150]}...")
         
-        # FOURTH PRIORITY: Try script tags (but be careful - might get wrong images)
-        if not image_url:
-            print(f"4. Checking script tags...")
-            scripts = soup.find_all('script')
-            script_candidates = []
-            print(f"   Found {len(scripts)} script tags")
-            
-            for i, script in enumerate(scripts):
-                if script.string:
-                    script_text = script.string
-                    
-                    # Look for optimized image URLs first (prefer these)
-                    # Look for .avif format (best quality)
-                    avif_matches = re.findall(r'"(https?://[^"]*\.avif)"', script_text)
-                    if avif_matches:
-                        print(f"   Script {i+1}: Found {len(avif_matches)} .avif matches")
-                    for match in avif_matches:
-                        candidate = match.strip().replace('\\/', '/')
-                        if candidate.startswith('http') and '50x50' not in candidate and '60x60' not in candidate:
-                            script_candidates.append(('avif', candidate))
-                            print(f"      ✓ Added avif candidate: {candidate[:150]}...")
-                    
-                    # Look for optimized .jpg with size parameters
-                    optimized_jpg_matches = re.findall(r'"(https?://[^"]*_220x220q75\.jpg[^"]*)"', script_text)
-                    if optimized_jpg_matches:
-                        print(f"   Script {i+1}: Found {len(optimized_jpg_matches)} optimized jpg matches")
-                    for match in optimized_jpg_matches:
-                        candidate = match.strip().replace('\\/', '/')
-                        if candidate.startswith('http'):
-                            script_candidates.append(('optimized_jpg', candidate))
-                            print(f"      ✓ Added optimized_jpg candidate: {candidate[:150]}...")
-                    
-                    # Look for aliexpress-media.com images (better domain)
-                    media_matches = re.findall(r'"(https?://[^"]*aliexpress-media\.com[^"]*)"', script_text)
-                    if media_matches:
-                        print(f"   Script {i+1}: Found {len(media_matches)} aliexpress-media.com matches")
-                    for match in media_matches:
-                        candidate = match.strip().replace('\\/', '/')
-                        if candidate.startswith('http') and any(ext in candidate for ext in ['.jpg', '.jpeg', '.png', '.webp', '.avif']):
-                            if '50x50' not in candidate and '60x60' not in candidate:
-                                script_candidates.append(('media_domain', candidate))
-                                print(f"      ✓ Added media_domain candidate: {candidate[:150]}...")
+        # Select best script candidate
+        if script_candidates:
+            print(f"   Found {len(script_candidates)} script candidates")
+            def get_script_priority(candidate):
+                if candidate[0] == 'avif':
+                    return 1
+                elif candidate[0] == 'optimized_jpg':
+                    return 2
+                elif candidate[0] == 'media_domain':
+                    return 3
+                else:
+                    return 4
             
-            # Select best script candidate
-            if script_candidates:
-                print(f"   Found {len(script_candidates)} script candidates")
-                def get_script_priority(candidate):
-                    if candidate[0] == 'avif':
-                        return 1
-                    elif candidate[0] == 'optimized_jpg':
-                        return 2
-                    elif candidate[0] == 'media_domain':
-                        return 3
-                    else:
-                        return 4
-                
-                script_candidates.sort(key=get_script_priority)
-                image_url = script_candidates[0][1]
-                print(f"   ✓ SELECTED script candidate: {image_url[:150]}...")
-            else:
-                print(f"   ✗ No valid script candidates found")
+            script_candidates.sort(key=get_script_priority)
+            image_url = script_candidates[0][1]
+            print(f"   ✓ SELECTED script candidate: {image_url[:150]}...")
         else:
-            print(f"4. Skipping script tags (already found image)")
-        
-        # LAST RESORT: Generic CSS selectors
-        if not image_url:
-            print(f"5. Checking generic CSS selectors...")
-            generic_selectors = [
-                'img[data-pl="product-image"]',
-                'img.main-image',
-                'img[class*="main-image"]',
-                'img[class*="product-image"]',
-                'img[itemprop="image"]',
-            ]
-            for selector in generic_selectors:
+            print(f"   ✗ No valid script candidates found")
+    else:
+        print(f"4. Skipping script tags (already found image)")
+    
+    # LAST RESORT: Generic CSS selectors
+    if not image_url:
+        print(f"5. Checking generic CSS selectors...")
+        generic_selectors = [
+            'img[data-pl="product-image"]',
+            'img.main-image',
+            'img[class*="main-image"]',
+            'img[class*="product-image"]',
+            'img[itemprop="image"]',
+        ]
+        for selector in generic_selectors:
+            try:
+                img_elems = soup.select(selector)
+                if img_elems:
+                    print(f"   Found {len(img_elems)} elements with selector: {selector}")
+                    img_elem = img_elems[0]
+                    candidate = img_elem.get('src') or img_elem.get('data-src')
+                    if candidate:
+                        print(f"      Candidate: {candidate[:100]}...")
+                        if candidate.startswith('//'):
+                            candidate = 'https:' + candidate
+                        elif candidate.startswith('/'):
+                            candidate = 'https://www.aliexpress.com' + candidate
+                        if candidate.startswith('http') and '50x50' not in candidate and '60x60' not in candidate:
+                            image_url = candidate
+                            print(f"      ✓ SELECTED generic CSS: {image_url[:150]}...")
+                            break
+            except Exception as e:
+                print(f"   Error with selector {selector}: {str(e)[:100]}")
+                continue
+    else:
+        print(f"5. Skipping generic CSS selectors (already found image)")
+    return image_url
+
+def _extract_from_dom(soup):
+    """Extract (title, image_url) from a parsed product page"""
+    # Debug: Print page title to see what we got
+    page_title = soup.find('title')
+    if page_title:
+        print(f"Page title: {page_title.get_text()[:100]}")
+    
+    def find_meta(attribute, value):
+        meta_elem = soup.find('meta', {attribute: value})
+        return meta_elem.get('content') if meta_elem else None
+    
+    # Extract product title - try multiple methods
+    title = _title_from_meta(find_meta)
+    if not title or not is_mostly_english(title):
+        json_ld_scripts = soup.find_all('script', type='application/ld+json')
+        title = _title_from_json_ld([script.string for script in json_ld_scripts], title)
+    if not title or not is_mostly_english(title):
+        title = _title_from_scripts([script.string for script in soup.find_all('script')], title)
+    
+    # Method 4: Try CSS selectors
+    if not title:
+        title_selectors = [
+            'h1[data-pl="product-title"]',
+            'h1.product-title-text',
+            'h1[class*="product-title"]',
+            'h1[class*="ProductTitle"]',
+            'h1.product-title',
+            'h1',
+            '[data-pl="product-title"]',
+            '.product-title-text'
+        ]
+        for selector in title_selectors:
+            title_elem = soup.select_one(selector)
+            if title_elem:
+                title = title_elem.get_text(strip=True)
+                if title and len(title) > 5:  # Make sure it's not just whitespace
+                    break
+    
+    if not title or not is_mostly_english(title) or len(title) < 10:
+        title_tag = soup.find('title')
+        if title_tag:
+            title = _title_from_page_title(title_tag.get_text(strip=True), title)
+    
+    image_url = _image_from_meta(find_meta)
+    if not image_url:
+        image_url = _image_from_dom(soup)
+    return title, image_url
+
+def _extract_from_scan(scan):
+    """Extract (title, image_url) from a PageScan, or None if the page needs the DOM.
+    
+    Follows _extract_from_dom() step by step and gives up where that would use a CSS
+    selector: when neither the meta tags, JSON-LD nor scripts give a title, or the
+    meta tags give no image.
+    """
+    title = _title_from_meta(scan.find_meta)
+    if not title or not is_mostly_english(title):
+        title = _title_from_json_ld(scan.script_texts('application/ld+json'), title)
+    if not title or not is_mostly_english(title):
+        title = _title_from_scripts(scan.script_texts(), title)
+    if not title:
+        return None
+    
+    if not is_mostly_english(title) or len(title) < 10:
+        if scan.title_has_markup:
+            return None
+        if scan.title is not None:
+            title = _title_from_page_title(scan.title, title)
+    
+    image_url = _image_from_meta(scan.find_meta)
+    if not image_url:
+        return None
+    return title, image_url
+
+def extract_title_and_image(html_text, content=None):
+    """Extract the product (title, image_url) from a product page.
+    
+    The page is pre-scanned for its meta tags, JSON-LD and window.runParams first; only
+    a page whose title or image has to come from its markup is parsed into a full DOM
+    (from `content`, the raw response bytes, if given).
+    """
+    result = _extract_from_scan(PageScan(html_text))
+    if result is not None:
+        print("Extracted title and image without a DOM parse")
+        return result
+    print("Falling back to a full DOM parse")
+    return _extract_from_dom(BeautifulSoup(content if content is not None else html_text, 'html.parser'))
+
+def _product_page_urls(aliexpress_url):
+    """The URL variations to try for a product page, in order of preference"""
+    urls_to_try = []
+    
+    # 1. Normalized www.aliexpress.com with lang=en
+    normalized_url = aliexpress_url
+    # Normalize domain to www.aliexpress.com for better compatibility
+    normalized_url = re.sub(r'https?://([a-z]{2}\.)?aliexpress\.com', r'https://www.aliexpress.com', normalized_url, flags=re.IGNORECASE)
+    # Remove tracking parameters
+    normalized_url = re.sub(r'[&?]lang=[^&]*', '', normalized_url)
+    normalized_url = re.sub(r'[&?]gatewayAdapt=[^&]*', '', normalized_url)
+    normalized_url = re.sub(r'[&?]spm=[^&]*', '', normalized_url)
+    # Add language parameter
+    separator = '&' if '?' in normalized_url else '?'
+    urls_to_try.append(f"{normalized_url}{separator}lang=en")
+    
+    # 2. Original URL (in case normalization breaks it)
+    urls_to_try.append(aliexpress_url)
+    
+    # 3. Simple www version without parameters
+    simple_url = re.sub(r'https?://([a-z]{2}\.)?aliexpress\.com', r'https://www.aliexpress.com', aliexpress_url, flags=re.IGNORECASE)
+    simple_url = re.sub(r'\?.*$', '', simple_url)  # Remove all query parameters
+    urls_to_try.append(f"{simple_url}?lang=en")
+    # Variations that come out the same are fetched once
+    return list(dict.fromkeys(urls_to_try))
+
+class _ProductPageFetch:
+    """One product page URL variation, fetched on an I/O thread and abandonable from the loop.
+
+    Cancelling a task does not stop the thread running the fetch, so a fetch that lost
+    the hedge is cancelled here: it is skipped if it has not started yet, and its
+    streamed response is closed, which drops the connection mid-download.
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self._lock = threading.Lock()
+        self._cancelled = False
+        self._response = None
+
+    @property
+    def cancelled(self):
+        with self._lock:
+            return self._cancelled
+
+    def cancel(self):
+        """Abandon the fetch (safe to call from any thread, at any time)"""
+        with self._lock:
+            self._cancelled = True
+            response, self._response = self._response, None
+        if response is not None:
+            response.close()
+
+    def _track(self, response):
+        """Remember the response so cancel() can close it. Returns False if already cancelled."""
+        with self._lock:
+            if not self._cancelled:
+                self._response = response
+                return True
+        response.close()
+        return False
+
+    def run(self):
+        """Fetch the page and extract its title and image (None if it failed or was cancelled)"""
+        url = self.url
+        if self.cancelled:
+            return None
+        try:
+            print(f"Trying URL: {url}")
+            response = http_client.get(url, provider='aliexpress', allow_redirects=True, stream=True)
+            if not self._track(response):
+                return None
+            with response:
+                content = response.content
+        except Exception as e:
+            if not self.cancelled:
+                print(f"Failed to fetch {url}: {e}")
+            return None
+        if self.cancelled:
+            return None
+        if response.status_code != 200 or len(content) <= 1000:  # Make sure we got actual content
+            print(f"Failed to fetch {url}: HTTP {response.status_code}, {len(content)} bytes")
+            return None
+        print(f"\n=== EXTRACTION DEBUG for {url} ===")
+        title, image_url = extract_title_and_image(response.text, content)
+        return {'url': url, 'title': title, 'image_url': image_url}
+
+async def _fetch_first_usable_page(engine, urls, hedge_delay):
+    """Fetch the URL variations hedged: the next one starts when the running ones take
+    longer than `hedge_delay` seconds or one fails. Returns the first page with an
+    English title (the other fetches are cancelled), else the first page fetched at all,
+    else None.
+    """
+    pending = list(urls)
+    running = {}
+    fallback = None
+
+    def start_next():
+        fetch = _ProductPageFetch(pending.pop(0))
+        running[asyncio.ensure_future(engine.call('aliexpress', fetch.run))] = fetch
+
+    start_next()
+    try:
+        while running:
+            done, _ = await asyncio.wait(
+                running, timeout=hedge_delay if pending else None, return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                print(f"No product page after {hedge_delay}s, also trying the next URL")
+                start_next()
+                continue
+            for task in done:
+                running.pop(task)
                 try:
-                    img_elems = soup.select(selector)
-                    if img_elems:
-                        print(f"   Found {len(img_elems)} elements with selector: {selector}")
-                        img_elem = img_elems[0]
-                        candidate = img_elem.get('src') or img_elem.get('data-src')
-                        if candidate:
-                            print(f"      Candidate: {candidate[:100]}...")
-                            if candidate.startswith('//'):
-                                candidate = 'https:' + candidate
-                            elif candidate.startswith('/'):
-                                candidate = 'https://www.aliexpress.com' + candidate
-                            if candidate.startswith('http') and '50x50' not in candidate and '60x60' not in candidate:
-                                image_url = candidate
-                                print(f"      ✓ SELECTED generic CSS: {image_url[:150]}...")
-                                break
+                    page = task.result()
                 except Exception as e:
-                    print(f"   Error with selector {selector}: {str(e)[:100]}")
-                    continue
+                    print(f"Error extracting product page: {e}")
+                    page = None
+                if page and page['title'] and is_mostly_english(page['title']):
+                    return page
+                if page and fallback is None:
+                    fallback = page
+                if pending:
+                    start_next()
+        return fallback
+    finally:
+        # The losing fetches stop on their I/O threads; each keeps its 'aliexpress'
+        # slot on the engine until its thread is done
+        for task, fetch in running.items():
+            fetch.cancel()
+            task.cancel()
+
+async def _fetch_product_page_variations(engine, aliexpress_url):
+    """Fetch a product page trying its URL variations hedged, and extract its title and image.
+    
+    Returns {'url', 'title', 'image_url'}; raises if no variation could be fetched.
+    """
+    urls_to_try = _product_page_urls(aliexpress_url)
+    page = await _fetch_first_usable_page(engine, urls_to_try, max(0, get_product_page_hedge_delay_seconds()))
+    if page is None:
+        raise Exception(f"Failed to fetch product page. Tried {len(urls_to_try)} URL variations.")
+    print(f"Using product page {page['url']}")
+    return page
+
+def fetch_product_page(aliexpress_url):
+    """Fetch a product page trying its URL variations hedged (see _fetch_first_usable_page)"""
+    engine = get_refresh_engine()
+    return engine.run(_fetch_product_page_variations(engine, aliexpress_url))
+
+def validated_product_title(title, product_id):
+    """The title, or a placeholder if it is too short or not English enough to use"""
+    if title and (len(title) < 5 or (not is_mostly_english(title) and len(title) < 20)):
+        # If we have a product ID, use a generic title
+        if product_id:
+            return f'Product {product_id}'
+        return 'Unknown Product'
+    return title
+
+def is_usable_product_title(title, product_id):
+    """Whether a title passes the same checks as a scraped one, so it can be cached"""
+    return not is_placeholder_title(validated_product_title(title, product_id), product_id)
+
+def product_id_from_url(aliexpress_url):
+    """The product id in an AliExpress product link (None if it has none)"""
+    id_match = re.search(r'/(\d+)\.html', aliexpress_url)
+    return id_match.group(1) if id_match else None
+
+def _cached_product_info(product_id, aliexpress_url):
+    """Product info for a known product without fetching its page (None if unknown)"""
+    cached = lookup_product(product_id)
+    if not cached:
+        return None
+    image = cached['local_image_path'] if local_image_exists(cached['local_image_path']) else ''
+    if not image and cached['image_url']:
+        # The saved image is gone (or was never saved): only the image is downloaded again
+        image = download_and_save_image(cached['image_url'], product_id)
+        if image:
+            get_product_cache().put(product_id, cached['title'], cached['image_url'], image, cached['fetched_at'])
+    print(f"Using cached product info for {product_id}: {cached['title'][:80]}")
+    return {
+        'title': cached['title'],
+        'image_url': image or cached['image_url'],
+        'product_id': product_id,
+        'url': aliexpress_url
+    }
+
+def _product_info_from_page(aliexpress_url, product_id, page):
+    """Build a product's info from its fetched page: clean up the title, save the image
+    locally and remember the product in the product cache"""
+    title, image_url = page['title'], page['image_url']
+    
+    # Final validation - reject if title is too short or not English
+    title = validated_product_title(title, product_id)
+    
+    # Optimize image URL if it's from AliExpress CDN
+    if image_url:
+        print(f"\n6. Optimizing image URL...")
+        print(f"   Original: {image_url[:150]}...")
+        # Try to get the best quality version
+        if 'alicdn.com' in image_url:
+            # If it's a plain .jpg, try to convert to optimized format
+            if image_url.endswith('.jpg'):
+                # Try multiple optimized formats
+                base_url = image_url.replace('.jpg', '.jpg_220x220q75.jpg_.avif')
+                # For now, use optimized jpg (avif might not always be available)
+                image_url = base_url
+                print(f"   Converted to optimized jpg: {image_url[:150]}...")
         else:
-            print(f"5. Skipping generic CSS selectors (already found image)")
-        
-        # Product ID was already extracted at the beginning
-        # Use the original URL for product_id extraction if not found
-        if not product_id:
-            id_match = re.search(r'/(\d+)\.html', aliexpress_url)
-            if id_match:
-                product_id = id_match.group(1)
-        
-        # Final validation - reject if title is too short or not English
-        if title and (len(title) < 5 or (not is_mostly_english(title) and len(title) < 20)):
-            # If we have a product ID, use a generic title
-            if product_id:
-                title = f'Product {product_id}'
-            else:
-                title = 'Unknown Product'
-        
-        # Optimize image URL if it's from AliExpress CDN
-        if image_url:
-            print(f"\n6. Optimizing image URL...")
-            print(f"   Original: {image_url[:150]}...")
-            # Try to get the best quality version
-            if 'alicdn.com' in image_url:
-                # If it's a plain .jpg, try to convert to optimized format
-                if image_url.endswith('.jpg'):
-                    # Try multiple optimized formats
-                    base_url = image_url.replace('.jpg', '.jpg_220x220q75.jpg_.avif')
-                    # For now, use optimized jpg (avif might not always be available)
-                    image_url = base_url
-                    print(f"   Converted to optimized jpg: {image_url[:150]}...")
-            else:
-                print(f"   Not alicdn.com, keeping as-is")
+            print(f"   Not alicdn.com, keeping as-is")
+    else:
+        print(f"\n✗ NO IMAGE FOUND after all extraction methods!")
+    
+    # Download and save image locally
+    local_image_path = None
+    if image_url:
+        print(f"\n7. Downloading and saving image locally...")
+        local_image_path = download_and_save_image(image_url, product_id)
+        if local_image_path:
+            print(f"   ✓ Image saved to: {local_image_path}")
         else:
-            print(f"\n✗ NO IMAGE FOUND after all extraction methods!")
-        
-        # Download and save image locally
-        local_image_path = None
-        if image_url:
-            print(f"\n7. Downloading and saving image locally...")
-            local_image_path = download_and_save_image(image_url, product_id)
-            if local_image_path:
-                print(f"   ✓ Image saved to: {local_image_path}")
-            else:
-                print(f"   ✗ Failed to save image locally, will use original URL")
+            print(f"   ✗ Failed to save image locally, will use original URL")
+    
+    print(f"\n=== FINAL RESULT ===")
+    print(f"Title: {title or 'Unknown Product'}")
+    print(f"Image URL: {image_url or '(empty)'}")
+    print(f"Local Image Path: {local_image_path or '(not saved)'}")
+    print(f"Product ID: {product_id or '(empty)'}")
+    print(f"========================================\n")
+    
+    if product_id and not is_placeholder_title(title, product_id):
+        get_product_cache().put(product_id, title, image_url, local_image_path)
+    
+    return {
+        'title': title or 'Unknown Product',
+        'image_url': local_image_path or image_url or '',  # Prefer local path
+        'product_id': product_id,
+        'url': aliexpress_url
+    }
+
+def _product_info_error(aliexpress_url, e):
+    """The stand-in product info for a product whose extraction failed"""
+    if isinstance(e, requests.exceptions.RequestException):
+        print(f"Network error extracting product info: {e}")
+        title = 'Error loading product (Network error)'
+    else:
+        print(f"Error extracting product info: {e}")
+        title = f'Error loading product: {str(e)[:50]}'
+    traceback.print_exception(type(e), e, e.__traceback__)
+    # Still return the product ID if the URL has one
+    return {
+        'title': title,
+        'image_url': '',
+        'product_id': product_id_from_url(aliexpress_url),
+        'url': aliexpress_url
+    }
+
+async def _extract_product_info(engine, aliexpress_url):
+    """Extract product information on the refresh engine (see extract_product_info).
+
+    Only the blocking steps run on I/O threads, so extracting many products at the
+    same time does not tie up a thread per product while its page is fetched.
+    """
+    try:
+        # Extract product ID first (before URL modification)
+        product_id = product_id_from_url(aliexpress_url)
         
-        print(f"\n=== FINAL RESULT ===")
-        print(f"Title: {title or 'Unknown Product'}")
-        print(f"Image URL: {image_url or '(empty)'}")
-        print(f"Local Image Path: {local_image_path or '(not saved)'}")
-        print(f"Product ID: {product_id or '(empty)'}")
-        print(f"========================================\n")
+        # A product seen before (in the cache or another order) isn't scraped again
+        cached_info = await engine.call('images', _cached_product_info, product_id, aliexpress_url)
+        if cached_info:
+            return cached_info
         
-        return {
-            'title': title or 'Unknown Product',
-            'image_url': local_image_path or image_url or '',  # Prefer local path
-            'product_id': product_id,
-            'url': aliexpress_url
-        }
-    except requests.exceptions.RequestException as e:
-        print(f"Network error extracting product info: {e}")
-        import traceback
-        traceback.print_exc()
-        # Try to at least return the product ID if we extracted it
-        product_id = None
-        id_match = re.search(r'/(\d+)\.html', aliexpress_url)
-        if id_match:
-            product_id = id_match.group(1)
-        return {
-            'title': f'Error loading product (Network error)',
-            'image_url': '',
-            'product_id': product_id,
-            'url': aliexpress_url
-        }
+        page = await _fetch_product_page_variations(engine, aliexpress_url)
+        return await engine.call('images', _product_info_from_page, aliexpress_url, product_id, page)
     except Exception as e:
-        print(f"Error extracting product info: {e}")
-        import traceback
-        traceback.print_exc()
-        # Try to at least return the product ID if we extracted it
-        product_id = None
-        id_match = re.search(r'/(\d+)\.html', aliexpress_url)
-        if id_match:
-            product_id = id_match.group(1)
-        return {
-            'title': f'Error loading product: {str(e)[:50]}',
-            'image_url': '',
-            'product_id': product_id,
-            'url': aliexpress_url
-        }
+        return _product_info_error(aliexpress_url, e)
+
+def extract_product_info(aliexpress_url):
+    """Extract product information from AliExpress URL"""
+    engine = get_refresh_engine()
+    return engine.run(_extract_product_info(engine, aliexpress_url))
+
+def extract_product_infos(aliexpress_urls, limit=None):
+    """Extract product information for several AliExpress URLs concurrently.
+    
+    At most `limit` products are extracted at the same time (no limit by default),
+    each within the engine's per-provider limits. Returns the product infos in URL
+    order; a failed extraction gives the same stand-in info as extract_product_info().
+    """
+    engine = get_refresh_engine()
+
+    async def extract_all():
+        semaphore = asyncio.Semaphore(max(1, limit)) if limit else None
+
+        async def extract_one(aliexpress_url):
+            if semaphore is None:
+                return await _extract_product_info(engine, aliexpress_url)
+            async with semaphore:
+                return await _extract_product_info(engine, aliexpress_url)
+
+        return await asyncio.gather(*(extract_one(url) for url in aliexpress_urls))
+
+    return engine.run(extract_all())
@@ -2,7 +2,15 @@
 import requests
 import json
 from datetime import datetime
-from config import get_doar_api_key
+from config import get_doar_api_key, get_doar_max_concurrency, get_tracking_cache_ttl_seconds
+from models.order import normalize_tracking_number
+from . import http_client
+from .lookup_cache import SingleFlightCache
+from .refresh_engine import get_refresh_engine
+
+# Recent Doar Israel results by normalized tracking number; errors are shared with
+# concurrent callers but not cached
+_doar_cache = SingleFlightCache(get_tracking_cache_ttl_seconds, should_cache=lambda info: not info.get('error'))
 
 def parse_doar_tracking_response(data):
     """Parse Doar Israel API response into tracking_info dict"""
@@ -72,10 +80,19 @@ def parse_doar_tracking_response(data):
     return tracking_info
 
 def fetch_doar_tracking_info(tracking_number):
-    """Fetch tracking information from Doar Israel API for a single tracking number"""
-    print(f"Fetching Doar Israel tracking info for tracking number: {tracking_number}")
+    """Fetch tracking information from Doar Israel API for a single tracking number.
+    
+    Recent results are reused, and concurrent calls for the same number share one request.
+    """
     if not tracking_number or not tracking_number.strip():
         return None
+    return _doar_cache.get(
+        normalize_tracking_number(tracking_number),
+        lambda: _fetch_doar_tracking_info(tracking_number)
+    )
+
+def _fetch_doar_tracking_info(tracking_number):
+    print(f"Fetching Doar Israel tracking info for tracking number: {tracking_number}")
     
     api_key = get_doar_api_key()
     if not api_key:
@@ -92,13 +109,11 @@ def fetch_doar_tracking_info(tracking_number):
         url = f"https://apimftprd.israelpost.co.il/MyPost-itemtrace/items/{tracking_number}/heb"
         
         headers = {
-            'Ocp-Apim-Subscription-Key': api_key,
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'application/json',
+            'Ocp-Apim-Subscription-Key': api_key
         }
         
-        # Increased timeout to 30 seconds for slow API responses
-        response = requests.get(url, headers=headers, timeout=(10, 60))
+        # The API can be slow, so the doar provider allows 60 seconds to respond
+        response = http_client.get(url, provider='doar', headers=headers)
         response.raise_for_status()
         
         data = response.json()
@@ -168,3 +183,40 @@ def fetch_doar_tracking_info(tracking_number):
             'error': str(e)
         }
 
+def _fetch_doar_tracking_info_safe(tracking_number):
+    try:
+        return fetch_doar_tracking_info(tracking_number)
+    except Exception as e:
+        print(f"Error fetching Doar Israel tracking info for {tracking_number}: {e}")
+        return {
+            'status': 'Error',
+            'events': [],
+            'delivery_type': None,
+            'last_update': datetime.now().isoformat(),
+            'error': str(e)
+        }
+
+def fetch_bulk_doar_tracking_info(tracking_numbers, max_workers=None):
+    """Fetch Doar Israel tracking information for several tracking numbers concurrently.
+    
+    Runs on the refresh engine, at most `max_workers` lookups at a time (default:
+    doar_max_concurrency from config). Returns {tracking_number: tracking_info}; failed lookups keep their
+    error result, numbers with no result at all are left out.
+    """
+    # Deduplicate while keeping the order
+    valid_tracking_numbers = list(dict.fromkeys(tn.strip() for tn in tracking_numbers or [] if tn and tn.strip()))
+    if not valid_tracking_numbers:
+        return {}
+    
+    max_workers = max(1, min(max_workers or get_doar_max_concurrency(), len(valid_tracking_numbers)))
+    if max_workers == 1:
+        fetched = [_fetch_doar_tracking_info_safe(tn) for tn in valid_tracking_numbers]
+    else:
+        # The engine also caps Doar Israel lookups across concurrent refreshes
+        fetched = get_refresh_engine().map('doar', _fetch_doar_tracking_info_safe, valid_tracking_numbers, limit=max_workers)
+    
+    return {
+        tracking_number: tracking_info
+        for tracking_number, tracking_info in zip(valid_tracking_numbers, fetched)
+        if tracking_info
+    }
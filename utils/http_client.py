@@ -0,0 +1,137 @@
+"""Shared HTTP client for all outbound requests.
+
+Keeps one pooled, keep-alive `requests.Session` per host, so repeated calls to the same
+service (bulk refreshes, image downloads) reuse connections instead of paying a new
+TCP + TLS handshake each time. Each provider has its default headers and timeout here,
+and callers only pass what is specific to a request.
+"""
+import threading
+from http.cookiejar import DefaultCookiePolicy
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from config import get_http_pool_connections, get_http_pool_maxsize
+from .resilience import get_provider_policy
+
+BROWSER_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+FIREFOX_USER_AGENT = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:144.0) Gecko/20100101 Firefox/144.0'
+
+# Seconds to wait for a connection to be established, for every provider
+CONNECT_TIMEOUT = 10
+
+# Provider -> default headers and read timeout in seconds
+PROVIDERS = {
+    'cainiao': {
+        'headers': {
+            'User-Agent': FIREFOX_USER_AGENT,
+            'Accept': 'application/json, text/plain, */*',
+            'Accept-Language': 'en-US,en;q=0.5',
+            'Accept-Encoding': 'gzip, deflate, br, zstd',
+            'Sec-Fetch-Dest': 'empty',
+            'Sec-Fetch-Mode': 'cors',
+            'Sec-Fetch-Site': 'same-origin',
+            'TE': 'trailers'
+        },
+        'read_timeout': 30
+    },
+    'doar': {
+        'headers': {
+            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+            'Accept': 'application/json'
+        },
+        'read_timeout': 60
+    },
+    'aliexpress': {
+        'headers': {
+            'User-Agent': BROWSER_USER_AGENT,
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+            'Accept-Language': 'en-US,en;q=0.9',
+            'Accept-Encoding': 'gzip, deflate, br',
+            'Upgrade-Insecure-Requests': '1',
+            'Cache-Control': 'no-cache',
+            'Referer': 'https://www.aliexpress.com/'
+        },
+        'read_timeout': 15
+    },
+    'aliexpress_api': {
+        'headers': {
+            'User-Agent': FIREFOX_USER_AGENT,
+            'Accept': '*/*',
+            'Accept-Language': 'en-US,en;q=0.5',
+            'Accept-Encoding': 'gzip, deflate, br, zstd',
+            'Sec-Fetch-Dest': 'script',
+            'Sec-Fetch-Mode': 'no-cors',
+            'Sec-Fetch-Site': 'same-site'
+        },
+        'read_timeout': 30
+    },
+    'images': {
+        'headers': {
+            'User-Agent': BROWSER_USER_AGENT,
+            'Referer': 'https://www.aliexpress.com/',
+            'Accept': 'image/avif,image/webp,image/apng,image/svg+xml,image/*,*/*;q=0.8',
+            'Accept-Language': 'en-US,en;q=0.9'
+        },
+        'read_timeout': 10
+    },
+    # Requests whose headers come entirely from the caller (e.g. a pasted cURL command)
+    'default': {
+        'headers': {},
+        'read_timeout': 30
+    }
+}
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+def _create_session():
+    session = requests.Session()
+    # Sessions are shared by unrelated requests, so never remember cookies between
+    # them; cookies passed to a request are still sent with it
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    adapter = HTTPAdapter(
+        pool_connections=get_http_pool_connections(),
+        pool_maxsize=get_http_pool_maxsize()
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+def get_session(url):
+    """Get the shared session for the host of `url`, creating it on first use"""
+    host = urlsplit(url).netloc.lower()
+    with _sessions_lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = _create_session()
+            _sessions[host] = session
+        return session
+
+def request(method, url, provider='default', headers=None, timeout=None, **kwargs):
+    """Send a request through the shared session for the URL's host.
+
+    `headers` are added to (and override) the provider's default headers, and
+    `timeout` defaults to (CONNECT_TIMEOUT, provider read timeout). Other keyword
+    arguments are passed to `requests.Session.request`. The request runs under the
+    provider's rate limit, retry and circuit breaker policy (see utils.resilience);
+    only GET and HEAD requests are retried.
+    """
+    settings = PROVIDERS[provider]
+    merged_headers = dict(settings['headers'])
+    if headers:
+        merged_headers.update(headers)
+    if timeout is None:
+        timeout = (CONNECT_TIMEOUT, settings['read_timeout'])
+    session = get_session(url)
+    return get_provider_policy(provider).execute(
+        lambda: session.request(method, url, headers=merged_headers, timeout=timeout, **kwargs),
+        retryable=method.upper() in ('GET', 'HEAD')
+    )
+
+def get(url, provider='default', **kwargs):
+    """Send a GET request (see request())"""
+    return request('GET', url, provider=provider, **kwargs)
+
+def post(url, provider='default', **kwargs):
+    """Send a POST request (see request())"""
+    return request('POST', url, provider=provider, **kwargs)
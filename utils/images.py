@@ -4,6 +4,7 @@ import os
 import hashlib
 from urllib.parse import urlparse
 from config import IMAGES_DIR
+from . import http_client
 
 def download_and_save_image(image_url, product_id=None):
     """Download an image from URL and save it locally. Returns the local path or None if failed."""
@@ -39,14 +40,6 @@ def download_and_save_image(image_url, product_id=None):
         if os.path.exists(local_path):
             return f"/static/images/products/{filename}"
         
-        # Download the image
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Referer': 'https://www.aliexpress.com/',
-            'Accept': 'image/avif,image/webp,image/apng,image/svg+xml,image/*,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.9',
-        }
-        
         # Try multiple URL variations if needed
         urls_to_try = [image_url]
         
@@ -57,19 +50,20 @@ def download_and_save_image(image_url, product_id=None):
         
         for url_to_try in urls_to_try:
             try:
-                response = requests.get(url_to_try, headers=headers, timeout=10, stream=True)
-                if response.status_code == 200:
-                    # Save the image
-                    with open(local_path, 'wb') as f:
-                        for chunk in response.iter_content(chunk_size=8192):
-                            f.write(chunk)
-                    
-                    print(f"Saved image to {local_path}")
-                    return f"/static/images/products/{filename}"
-                elif response.status_code == 404:
-                    continue  # Try next URL
-                else:
-                    response.raise_for_status()
+                # Closing the response returns its connection to the shared pool
+                with http_client.get(url_to_try, provider='images', stream=True) as response:
+                    if response.status_code == 200:
+                        # Save the image
+                        with open(local_path, 'wb') as f:
+                            for chunk in response.iter_content(chunk_size=8192):
+                                f.write(chunk)
+                        
+                        print(f"Saved image to {local_path}")
+                        return f"/static/images/products/{filename}"
+                    elif response.status_code == 404:
+                        continue  # Try next URL
+                    else:
+                        response.raise_for_status()
             except requests.exceptions.HTTPError as e:
                 if e.response.status_code == 404:
                     continue
@@ -0,0 +1,164 @@
+"""Background jobs for long-running work started from the API.
+
+A job runs a function on one of the refresh engine's job threads and reports its
+progress through a Job object, so the HTTP request that starts it returns right away
+and the browser polls `GET /api/jobs/<id>` instead of holding a request open for
+minutes. Jobs of the same kind are deduplicated: starting one while another is still
+running returns the running job. Cancellation is cooperative: the job function checks
+`job.cancel_requested` between steps.
+"""
+import threading
+import time
+import uuid
+from models.notifications import publish
+from .refresh_engine import get_refresh_engine
+
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+ACTIVE_STATES = (QUEUED, RUNNING)
+
+# Keep finished jobs this long (and at most this many) so clients can read the outcome
+FINISHED_JOB_TTL_SECONDS = 3600
+MAX_FINISHED_JOBS = 50
+# Errors kept per job (the counts include all of them)
+MAX_JOB_ERRORS = 100
+
+class Job:
+    """Progress and outcome of one background job"""
+
+    def __init__(self, kind):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = QUEUED
+        self.total = 0
+        self.processed = 0
+        self.counts = {}
+        self.errors = []
+        self.message = ''
+        self.created_at = time.time()
+        self.finished_at = None
+        self.cancel_requested = False
+        self._lock = threading.Lock()
+
+    @property
+    def active(self):
+        return self.status in ACTIVE_STATES
+
+    def set_total(self, total, **counts):
+        """Set how many items the job will process, plus any initial counts"""
+        with self._lock:
+            self.total = total
+            self.counts.update(counts)
+        self._publish()
+
+    def advance(self, processed, errors=None, **counts):
+        """Record `processed` more items, add to the named counts and keep `errors`"""
+        with self._lock:
+            self.processed += processed
+            for key, value in counts.items():
+                self.counts[key] = self.counts.get(key, 0) + value
+            if errors:
+                self.errors.extend(errors[:MAX_JOB_ERRORS - len(self.errors)])
+        self._publish()
+
+    def cancel(self):
+        """Ask the job to stop at its next step"""
+        with self._lock:
+            if self.status in ACTIVE_STATES:
+                self.cancel_requested = True
+        self._publish()
+
+    def _set_status(self, status, message=None):
+        with self._lock:
+            self.status = status
+            if message is not None:
+                self.message = message
+            if status not in ACTIVE_STATES:
+                self.finished_at = time.time()
+        self._publish()
+
+    def _publish(self):
+        """Push the job's progress to connected clients"""
+        publish('job', self.to_dict())
+
+    def to_dict(self):
+        """A JSON-serializable snapshot of the job"""
+        with self._lock:
+            return {
+                'id': self.id,
+                'kind': self.kind,
+                'status': self.status,
+                'total': self.total,
+                'processed': self.processed,
+                **self.counts,
+                'errors': list(self.errors),
+                'message': self.message,
+                'cancel_requested': self.cancel_requested,
+                'created_at': self.created_at,
+                'finished_at': self.finished_at
+            }
+
+class JobManager:
+    """Starts, deduplicates and remembers jobs"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs = {}
+
+    def start(self, kind, func):
+        """Start `func(job)` as a background job, or return the active job of this kind.
+
+        Returns (job, started); `started` is False when an existing job was returned.
+        `func` returns the job's final message; if it raises, the job fails.
+        """
+        with self._lock:
+            self._prune()
+            for job in self._jobs.values():
+                if job.kind == kind and job.active:
+                    return job, False
+            job = Job(kind)
+            self._jobs[job.id] = job
+        get_refresh_engine().call_later(0, lambda: self._run(job, func))
+        return job, True
+
+    def _run(self, job, func):
+        if job.cancel_requested:
+            job._set_status(CANCELLED, 'Cancelled before it started')
+            return
+        job._set_status(RUNNING)
+        try:
+            message = func(job)
+        except Exception as e:
+            import traceback
+            print(f"Error in {job.kind} job {job.id}: {traceback.format_exc()}")
+            job._set_status(FAILED, str(e))
+            return
+        if job.cancel_requested:
+            job._set_status(CANCELLED, f'Cancelled after {job.processed} of {job.total}' + (f'. {message}' if message else ''))
+        else:
+            job._set_status(COMPLETED, message or '')
+
+    def get(self, job_id):
+        """Get a job by id (None if unknown or forgotten)"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _prune(self):
+        now = time.time()
+        finished = sorted(
+            (job for job in self._jobs.values() if not job.active),
+            key=lambda job: job.finished_at
+        )
+        expired = [job for job in finished if now - job.finished_at > FINISHED_JOB_TTL_SECONDS]
+        expired += finished[len(expired):max(len(expired), len(finished) - MAX_FINISHED_JOBS)]
+        for job in expired:
+            self._jobs.pop(job.id, None)
+
+_job_manager = JobManager()
+
+def get_job_manager():
+    """Get the process-wide job manager"""
+    return _job_manager
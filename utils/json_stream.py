@@ -0,0 +1,114 @@
+"""Incremental decoding of one array inside a large JSON response.
+
+Bulk carrier responses are a JSON object whose interesting part is one big array
+(Cainiao's `module`). `iter_array_items()` reads the body chunk by chunk and yields
+the items of that array one at a time, so only the current item and the unread
+part of the current chunk are held in memory instead of the whole body and its
+decoded tree. It uses the standard library decoder (`json.JSONDecoder.raw_decode`)
+on each item; the surrounding object is walked by hand.
+"""
+import codecs
+import json
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+
+class _Buffer:
+    """Decoded text read so far from the chunks, minus what was already consumed"""
+
+    def __init__(self, chunks, encoding):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors='strict')
+        self.text = ''
+        self.pos = 0
+        self.eof = False
+
+    def read_more(self, min_chars=1):
+        """Append at least `min_chars` more characters (fewer at the end of the data)"""
+        target = len(self.text) - self.pos + min_chars
+        # Drop the consumed prefix so the buffer doesn't grow with the response
+        self.text = self.text[self.pos:]
+        self.pos = 0
+        parts = [self.text]
+        length = len(self.text)
+        while length < target and not self.eof:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                self.eof = True
+                parts.append(self._decoder.decode(b'', final=True))
+            else:
+                parts.append(self._decoder.decode(chunk) if isinstance(chunk, bytes) else chunk)
+            length += len(parts[-1])
+        self.text = ''.join(parts)
+
+    def error(self, message):
+        return json.JSONDecodeError(message, self.text, self.pos)
+
+    def peek(self):
+        """Skip whitespace and return the next character ('' at the end of the data)"""
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.text) or self.eof:
+                return self.text[self.pos:self.pos + 1]
+            self.read_more()
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise self.error(f"Expecting '{char}'")
+        self.pos += 1
+
+    def decode_value(self):
+        """Decode the complete JSON value at the current position, reading more as needed"""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                # Probably cut off by the chunk boundary: at least double what's buffered
+                self.read_more(max(len(self.text) - self.pos, 4096))
+                continue
+            if end == len(self.text) and not self.eof:
+                # A number at the very end of the buffer may continue in the next chunk
+                self.read_more()
+                continue
+            self.pos = end
+            return value
+
+def iter_array_items(chunks, key, fields=None, encoding='utf-8'):
+    """Yield the items of the array under top-level `key` of a JSON object.
+
+    `chunks` is an iterable of bytes (e.g. `response.iter_content(...)`) or str.
+    The other top-level members are decoded whole and stored in `fields` (if a dict
+    is given) as they are read, so members before the array can be checked while
+    its items are consumed. A missing or null `key` yields nothing. Malformed JSON
+    raises json.JSONDecodeError.
+    """
+    buffer = _Buffer(chunks, encoding)
+    buffer.expect('{')
+    if buffer.peek() == '}':
+        return
+    while True:
+        if buffer.peek() != '"':
+            raise buffer.error('Expecting property name enclosed in double quotes')
+        name = buffer.decode_value()
+        buffer.expect(':')
+        if name == key and buffer.peek() == '[':
+            buffer.pos += 1
+            if buffer.peek() != ']':
+                while True:
+                    yield buffer.decode_value()
+                    if buffer.peek() != ',':
+                        break
+                    buffer.pos += 1
+            buffer.expect(']')
+        else:
+            value = buffer.decode_value()
+            if fields is not None:
+                fields[name] = value
+        if buffer.peek() != ',':
+            break
+        buffer.pos += 1
+    buffer.expect('}')
@@ -0,0 +1,93 @@
+"""Single-flight, short-lived cache for upstream lookups.
+
+Concurrent requests for the same key share one in-flight upstream call, and
+successful results are served from memory for a configurable TTL, so repeated
+refresh clicks, the per-order endpoints and a running scheduled update don't
+each hit the provider for the same tracking number.
+"""
+import threading
+import time
+
+class _Flight:
+    """A lookup in progress; waiters block on `done` and then read `result`"""
+    __slots__ = ('done', 'result')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+class SingleFlightCache:
+    """Caches lookup results by key for `ttl_seconds()` and coalesces concurrent misses.
+
+    `ttl_seconds` is a callable so the TTL follows config changes. `should_cache(value)`
+    decides whether a result is kept after being handed to the callers waiting for it
+    (e.g. errors are shared with concurrent callers but not cached).
+    """
+
+    MAX_ENTRIES = 10000
+
+    def __init__(self, ttl_seconds, should_cache=None):
+        self._ttl_seconds = ttl_seconds
+        self._should_cache = should_cache or (lambda value: True)
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._flights = {}
+
+    def get_many(self, keys, fetch_many):
+        """Get the values for `keys`, calling `fetch_many(missing_keys)` for the ones that
+        are neither cached nor already being fetched by another thread.
+
+        `fetch_many` returns a {key: value} dict; keys it leaves out get None. If it
+        raises, the exception propagates to this caller and waiting callers get None.
+        """
+        results = {}
+        to_fetch = []
+        to_wait = {}
+        now = time.monotonic()
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                entry = self._entries.get(key)
+                if entry and entry[0] > now:
+                    results[key] = entry[1]
+                    continue
+                flight = self._flights.get(key)
+                if flight is not None:
+                    to_wait[key] = flight
+                else:
+                    self._flights[key] = _Flight()
+                    to_fetch.append(key)
+
+        if to_fetch:
+            fetched = {}
+            try:
+                fetched = fetch_many(to_fetch) or {}
+            finally:
+                self._complete(to_fetch, fetched)
+            for key in to_fetch:
+                results[key] = fetched.get(key)
+
+        for key, flight in to_wait.items():
+            flight.done.wait()
+            results[key] = flight.result
+        return results
+
+    def get(self, key, fetch):
+        """Get the value for one key, calling `fetch()` on a miss"""
+        return self.get_many([key], lambda keys: {key: fetch()})[key]
+
+    def _complete(self, keys, fetched):
+        ttl = self._ttl_seconds()
+        expires_at = time.monotonic() + ttl
+        with self._lock:
+            for key in keys:
+                value = fetched.get(key)
+                flight = self._flights.pop(key, None)
+                if ttl > 0 and value is not None and self._should_cache(value):
+                    self._entries[key] = (expires_at, value)
+                if flight is not None:
+                    flight.result = value
+                    flight.done.set()
+            if len(self._entries) > self.MAX_ENTRIES:
+                now = time.monotonic()
+                self._entries = {key: entry for key, entry in self._entries.items() if entry[0] > now}
+
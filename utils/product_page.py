@@ -0,0 +1,77 @@
+"""Fast scanning of product pages without building a DOM.
+
+The product title and image nearly always come from a page's meta tags, JSON-LD or
+window.runParams script, none of which need a full HTML parse. PageScan makes one
+regex pass over the page: <script> and <style> blocks and comments are set aside
+(the scripts are kept with their attributes, in document order) and the remaining
+markup is searched for <meta> tags and the <title>. Values are unescaped like an
+HTML parser would, so lookups give the same answers as BeautifulSoup's `find`.
+"""
+import html
+import re
+
+# A comment, or a <script>/<style> element with its raw content
+_BLOCK_RE = re.compile(
+    r'<!--.*?-->|<(script|style)\b((?:[^>"\']|"[^"]*"|\'[^\']*\')*)>(.*?)</\1\s*>',
+    re.DOTALL | re.IGNORECASE
+)
+_META_RE = re.compile(r'<meta\b((?:[^>"\']|"[^"]*"|\'[^\']*\')*)>', re.IGNORECASE)
+_ATTRIBUTE_RE = re.compile(r'''([^\s"'>/=]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+)))?''')
+_TITLE_RE = re.compile(r'<title\b[^>]*>(.*?)</title\s*>', re.DOTALL | re.IGNORECASE)
+
+def parse_attributes(text):
+    """Parse the attributes of a start tag into a dict (names lowercased, values unescaped)"""
+    attributes = {}
+    for match in _ATTRIBUTE_RE.finditer(text):
+        name, double_quoted, single_quoted, unquoted = match.groups()
+        value = next((v for v in (double_quoted, single_quoted, unquoted) if v is not None), '')
+        attributes[name.lower()] = html.unescape(value)
+    return attributes
+
+class PageScan:
+    """The scripts, meta tags and title of an HTML page, found without a DOM"""
+
+    def __init__(self, html_text):
+        self.scripts = []
+        markup = []
+        position = 0
+        for match in _BLOCK_RE.finditer(html_text):
+            markup.append(html_text[position:match.start()])
+            position = match.end()
+            if match.group(1) and match.group(1).lower() == 'script':
+                # Like BeautifulSoup's `script.string`: None for an empty script
+                self.scripts.append((parse_attributes(match.group(2)), match.group(3) or None))
+        markup.append(html_text[position:])
+        self._markup = ''.join(markup)
+        self._metas = None
+
+        self.title = None
+        # A title containing tags is left to the DOM parser
+        self.title_has_markup = False
+        title_match = _TITLE_RE.search(self._markup)
+        if title_match:
+            if '<' in title_match.group(1):
+                self.title_has_markup = True
+            else:
+                self.title = html.unescape(title_match.group(1)).strip()
+
+    @property
+    def metas(self):
+        """The attributes of every <meta> tag, in document order"""
+        if self._metas is None:
+            self._metas = [parse_attributes(match.group(1)) for match in _META_RE.finditer(self._markup)]
+        return self._metas
+
+    def find_meta(self, attribute, value):
+        """Get the content of the first <meta> whose `attribute` is `value` (None if missing)"""
+        for attributes in self.metas:
+            if attributes.get(attribute) == value:
+                return attributes.get('content')
+        return None
+
+    def script_texts(self, script_type=None):
+        """Get the text of every script (None for empty ones), optionally only of one `type`"""
+        return [
+            text for attributes, text in self.scripts
+            if script_type is None or attributes.get('type') == script_type
+        ]
@@ -0,0 +1,132 @@
+"""asyncio engine that drives tracking refreshes from a single event loop thread.
+
+Refresh work (Cainiao chunks, Doar Israel lookups, AliExpress tracking number
+discovery) runs as coroutines on one loop. Each provider has a semaphore that limits
+how many of its lookups are in flight, and the blocking HTTP calls themselves (made
+through utils.http_client, so pooling, rate limits and retries still apply) run on a
+small fixed pool of I/O threads. A refresh of thousands of tracking numbers is then
+thousands of cheap waiting coroutines, not thousands of threads.
+
+Flask routes, the scheduler and background work use the thread-safe API: `submit()`
+schedules a coroutine and returns a concurrent.futures.Future, `run()` and `map()`
+block the calling thread for the result, and `call_later()` runs a blocking function
+on one of the engine's job threads after a delay.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from config import (
+    get_cainiao_bulk_max_workers,
+    get_doar_max_concurrency,
+    get_aliexpress_api_max_concurrency,
+    get_refresh_engine_io_threads
+)
+
+# Provider -> getter for how many of its lookups may be in flight at the same time
+PROVIDER_CONCURRENCY = {
+    'cainiao': get_cainiao_bulk_max_workers,
+    'doar': get_doar_max_concurrency,
+    'aliexpress_api': get_aliexpress_api_max_concurrency
+}
+DEFAULT_CONCURRENCY = 4
+
+# Threads for long-running blocking work started through the engine (scheduled runs,
+# background refresh jobs)
+JOB_THREADS = 4
+
+class RefreshEngine:
+    """An event loop thread plus fixed I/O and job thread pools"""
+
+    def __init__(self, io_threads):
+        self._io_executor = ThreadPoolExecutor(max_workers=max(1, io_threads), thread_name_prefix='refresh-io')
+        self._job_executor = ThreadPoolExecutor(max_workers=JOB_THREADS, thread_name_prefix='refresh-job')
+        # Provider -> asyncio.Semaphore; only touched on the loop thread
+        self._semaphores = {}
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name='refresh-engine', daemon=True)
+        self._thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    def _semaphore(self, provider):
+        semaphore = self._semaphores.get(provider)
+        if semaphore is None:
+            limit = PROVIDER_CONCURRENCY.get(provider, lambda: DEFAULT_CONCURRENCY)()
+            semaphore = asyncio.Semaphore(max(1, limit))
+            self._semaphores[provider] = semaphore
+        return semaphore
+
+    async def call(self, provider, func, *args):
+        """Run blocking `func(*args)` on an I/O thread, within the provider's concurrency limit.
+
+        If the calling task is cancelled, the provider's slot is only released once the
+        thread has actually finished `func`, so abandoned calls still count towards the limit.
+        """
+        async with self._semaphore(provider):
+            future = self._loop.run_in_executor(self._io_executor, func, *args)
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                await asyncio.wait([future])
+                if not future.cancelled():
+                    future.exception()  # Mark a late failure as seen; nobody awaits it any more
+                raise
+
+    async def gather(self, provider, func, items, limit=None):
+        """Run `func(item)` for every item concurrently and return the results in item order.
+
+        `limit` additionally caps the concurrency of this call alone; the provider's
+        limit is shared by everything running on the engine.
+        """
+        call_semaphore = asyncio.Semaphore(max(1, limit)) if limit else None
+
+        async def call_one(item):
+            if call_semaphore is None:
+                return await self.call(provider, func, item)
+            async with call_semaphore:
+                return await self.call(provider, func, item)
+
+        return await asyncio.gather(*(call_one(item) for item in items))
+
+    def submit(self, coro):
+        """Schedule a coroutine on the engine from any thread; returns a concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def run(self, coro, timeout=None):
+        """Run a coroutine on the engine and wait for its result.
+
+        Must not be called from the engine's own loop thread, which would deadlock.
+        """
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError('RefreshEngine.run() called from the engine thread; await the coroutine instead')
+        return self.submit(coro).result(timeout)
+
+    def map(self, provider, func, items, limit=None):
+        """Run `func(item)` for every item under the provider's limit and wait for the results (in order)"""
+        return self.run(self.gather(provider, func, list(items), limit))
+
+    async def _call_later(self, delay, func):
+        await asyncio.sleep(delay)
+        return await self._loop.run_in_executor(self._job_executor, func)
+
+    def call_later(self, delay, func):
+        """Run blocking `func()` on a job thread after `delay` seconds.
+
+        Returns a concurrent.futures.Future; cancelling it before the delay is over
+        prevents the call.
+        """
+        return self.submit(self._call_later(delay, func))
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_refresh_engine():
+    """Get the refresh engine, starting it on first use"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = RefreshEngine(get_refresh_engine_io_threads())
+        return _engine
@@ -0,0 +1,253 @@
+"""Rate limiting, retries and circuit breaking for upstream providers.
+
+Every request made through `utils.http_client` runs under its provider's policy:
+
+- a token bucket limits how fast requests are sent (callers wait for a token),
+- connection errors, timeouts, 429 and 5xx responses are retried with jittered
+  exponential backoff (idempotent requests only), honoring `Retry-After`,
+- a circuit breaker opens after several consecutive failed calls and rejects
+  calls until `reset_timeout` has passed, then lets a single probe through
+  (half-open) and closes again if it succeeds.
+"""
+import random
+import threading
+import time
+import requests
+from config import get_provider_resilience_overrides
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Provider -> settings; missing keys fall back to DEFAULT_SETTINGS. Overridden per
+# provider by the `provider_resilience` dict in config.json.
+DEFAULT_SETTINGS = {
+    'rate_per_second': None,    # None disables rate limiting
+    'burst': 1,
+    'max_retries': 0,
+    'backoff_base_seconds': 0.5,
+    'backoff_max_seconds': 8.0,
+    'failure_threshold': None,  # None disables the circuit breaker
+    'reset_timeout_seconds': 60
+}
+
+PROVIDER_SETTINGS = {
+    'cainiao': {'rate_per_second': 2, 'burst': 4, 'max_retries': 3, 'failure_threshold': 5},
+    'doar': {'rate_per_second': 5, 'burst': 5, 'max_retries': 3, 'failure_threshold': 5},
+    'aliexpress': {'rate_per_second': 1, 'burst': 3, 'max_retries': 2, 'failure_threshold': 5},
+    'aliexpress_api': {'rate_per_second': 2, 'burst': 2, 'max_retries': 2, 'failure_threshold': 5},
+    'images': {'rate_per_second': 10, 'burst': 20, 'max_retries': 2, 'failure_threshold': 10, 'reset_timeout_seconds': 30},
+    'default': {}
+}
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised instead of sending a request while a provider's circuit is open"""
+
+class TokenBucket:
+    """Allows `rate` requests per second on average, with bursts of up to `capacity`"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """Take a token, waiting for one if the bucket is empty"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def available(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens
+
+class CircuitBreaker:
+    """Closed -> open after `failure_threshold` consecutive failures -> half-open after
+    `reset_timeout` seconds (one probe at a time) -> closed on the first success"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Whether a request may be sent now (reserves the probe when half-open)"""
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+    def release(self):
+        """Give back a half-open probe without counting a success or failure"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def retry_in(self):
+        """Seconds until the next probe is allowed (0 unless open)"""
+        with self._lock:
+            if self.state != self.OPEN:
+                return 0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+def _retry_after_seconds(response):
+    value = response.headers.get('Retry-After') if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+class ProviderPolicy:
+    """Rate limit, retry and circuit breaker settings and state for one provider"""
+
+    def __init__(self, name, settings):
+        self.name = name
+        self.settings = settings
+        rate = settings['rate_per_second']
+        self.bucket = TokenBucket(rate, max(1, settings['burst'])) if rate else None
+        threshold = settings['failure_threshold']
+        self.breaker = CircuitBreaker(threshold, settings['reset_timeout_seconds']) if threshold else None
+        self._stats_lock = threading.Lock()
+        self.stats = {'requests': 0, 'retries': 0, 'failures': 0, 'rejected': 0}
+
+    def _count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _backoff(self, attempt, response=None):
+        cap = self.settings['backoff_max_seconds']
+        delay = random.uniform(0, min(cap, self.settings['backoff_base_seconds'] * (2 ** attempt)))
+        retry_after = _retry_after_seconds(response)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, cap))
+        time.sleep(delay)
+
+    def execute(self, send, retryable=True):
+        """Call `send()` (which returns a requests.Response) under this policy.
+
+        Returns the last response, even if its status is still retryable after all
+        attempts; raises the last exception if every attempt raised, or
+        CircuitOpenError if the circuit is open. The breaker counts the call as a
+        single success or failure, however many attempts it took.
+        """
+        if self.breaker and not self.breaker.allow():
+            self._count('rejected')
+            raise CircuitOpenError(
+                f"{self.name} is temporarily unavailable (circuit open, retry in {self.breaker.retry_in():.0f}s)"
+            )
+        max_retries = self.settings['max_retries'] if retryable else 0
+        attempt = 0
+        while True:
+            if self.bucket:
+                self.bucket.acquire()
+            self._count('requests')
+
+            response = None
+            error = None
+            try:
+                response = send()
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error = e
+            except Exception:
+                # Not the provider's fault (e.g. an invalid URL); just give back the probe
+                if self.breaker:
+                    self.breaker.release()
+                raise
+            if error is None and response.status_code not in RETRY_STATUS_CODES:
+                if self.breaker:
+                    self.breaker.record_success()
+                return response
+
+            if attempt >= max_retries:
+                self._count('failures')
+                if self.breaker:
+                    self.breaker.record_failure()
+                if error is not None:
+                    raise error
+                return response
+            if response is not None:
+                response.close()
+            self._count('retries')
+            self._backoff(attempt, response)
+            attempt += 1
+
+    def status(self):
+        """A JSON-serializable snapshot of this provider's state"""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        status = {
+            'rate_per_second': self.settings['rate_per_second'],
+            'burst': self.settings['burst'],
+            'max_retries': self.settings['max_retries'],
+            'stats': stats
+        }
+        if self.bucket:
+            status['available_tokens'] = round(self.bucket.available(), 2)
+        if self.breaker:
+            status['circuit'] = {
+                'state': self.breaker.state,
+                'consecutive_failures': self.breaker.consecutive_failures,
+                'failure_threshold': self.breaker.failure_threshold,
+                'retry_in_seconds': round(self.breaker.retry_in(), 1)
+            }
+        return status
+
+_policies = {}
+_policies_lock = threading.Lock()
+
+def get_provider_policy(provider):
+    """Get the policy for a provider, creating it on first use"""
+    with _policies_lock:
+        policy = _policies.get(provider)
+        if policy is None:
+            settings = dict(DEFAULT_SETTINGS)
+            settings.update(PROVIDER_SETTINGS.get(provider, {}))
+            settings.update(get_provider_resilience_overrides().get(provider, {}))
+            policy = ProviderPolicy(provider, settings)
+            _policies[provider] = policy
+        return policy
+
+def get_resilience_status():
+    """Get the state of every provider's rate limiter and circuit breaker"""
+    return {provider: get_provider_policy(provider).status() for provider in PROVIDER_SETTINGS}
@@ -1,18 +1,32 @@
-"""Background scheduler for auto-updating tracking information"""
+"""Background scheduler for auto-updating tracking information.
+
+Parcels are polled on their own adaptive schedule (see models.poll_schedule): the
+scheduler sleeps until the next parcel is due, then refreshes only the parcels that
+are due, so upstream calls follow how active the parcels are, not how many there are.
+"""
 import threading
+import time
 from datetime import datetime, timedelta
-from models.order import orders, save_orders
+from models.order import orders, save_orders, normalize_tracking_number
+from models.tracking_updates import apply_tracking_results
+from models.notifications import publish
+from models.poll_schedule import get_poll_schedule
 from utils.tracking import fetch_bulk_tracking_info
-from utils.doar_israel import fetch_doar_tracking_info
+from utils.doar_israel import fetch_bulk_doar_tracking_info
+from utils.refresh_engine import get_refresh_engine
 from config import (
     get_doar_api_key,
     get_auto_update_interval_hours,
-    get_cainiao_last_update,
     set_cainiao_last_update,
-    get_doar_last_update,
     set_doar_last_update
 )
 
+# Never sleep less than this between runs, nor longer (new parcels are picked up on wake)
+MIN_WAKE_SECONDS = 60
+MAX_WAKE_SECONDS = 3600
+# Parcels due within this long are polled together with the ones already due
+DUE_GRACE_SECONDS = 300
+
 # Global state for next update time
 _next_update_time = None
 _update_lock = threading.Lock()
@@ -33,93 +47,111 @@ def set_next_update_time(dt=None):
         else:
             _next_update_time = dt
 
+def _tracked_parcels(info_key):
+    """Map each tracking number to the `info_key` tracking info of its first order"""
+    parcels = {}
+    for order in list(orders):
+        key = normalize_tracking_number(order.get('tracking_number'))
+        if key and key not in parcels:
+            parcels[key] = order.get(info_key) or {}
+    return parcels
+
+def _sync_poll_schedule(now):
+    schedule = get_poll_schedule()
+    schedule.sync('cainiao', _tracked_parcels('tracking_info'), now)
+    # Without an API key Doar Israel is never polled, so its parcels must not be
+    # scheduled either: they would stay overdue and wake the scheduler every minute
+    doar_parcels = _tracked_parcels('doar_tracking_info') if get_doar_api_key() else {}
+    schedule.sync('doar', doar_parcels, now)
+    return schedule
+
+def _due_tracking_numbers(schedule, provider, now):
+    """Get the due tracking numbers of a provider, as written on the orders"""
+    due = []
+    for key in schedule.due(provider, now + DUE_GRACE_SECONDS):
+        matching_orders = orders.get_by_tracking_number(key)
+        if matching_orders:
+            due.append(matching_orders[0].get('tracking_number', '').strip())
+    return due
+
+def _update_cainiao(schedule, now, changed_orders):
+    due = _due_tracking_numbers(schedule, 'cainiao', now)
+    if not due:
+        print("[Auto-Update] Cainiao: No parcels due")
+        return
+    print(f"[Auto-Update] Fetching Cainiao tracking for {len(due)} due tracking numbers")
+    bulk_results = fetch_bulk_tracking_info(due)
+    
+    matching_orders = {tracking_number: orders.get_by_tracking_number(tracking_number) for tracking_number in due}
+    successful = {
+        tracking_number: tracking_info for tracking_number, tracking_info in bulk_results.items()
+        if tracking_info and not tracking_info.get('error')
+    }
+    changed, _ = apply_tracking_results('cainiao', successful, matching_orders)
+    for order in changed:
+        changed_orders[order['id']] = order
+    
+    updated = sum(len(matching_orders[tracking_number]) for tracking_number in successful if tracking_number in matching_orders)
+    failed = sum(len(found) for tracking_number, found in matching_orders.items() if tracking_number not in successful)
+    # The orders now hold the new info if it changed and the previous one otherwise,
+    # so failures and unchanged parcels don't look like a change
+    polled = {
+        tracking_number: found[0].get('tracking_info') if found else {}
+        for tracking_number, found in matching_orders.items()
+    }
+    schedule.record_polls('cainiao', polled, now)
+    
+    print(f"[Auto-Update] Cainiao: Updated {updated} orders, {len(changed)} changed ({failed} failed)")
+    # Update last update time for Cainiao
+    set_cainiao_last_update()
+
+def _update_doar(schedule, now, changed_orders):
+    if not get_doar_api_key():
+        print("[Auto-Update] Doar Israel: API key not configured, skipping")
+        return
+    due = _due_tracking_numbers(schedule, 'doar', now)
+    if not due:
+        print("[Auto-Update] Doar Israel: No parcels due")
+        return
+    print(f"[Auto-Update] Fetching Doar Israel tracking for {len(due)} due tracking numbers")
+    # Fetch tracking info once per unique tracking number, several at a time
+    tracking_results = fetch_bulk_doar_tracking_info(due)
+    
+    matching_orders = {tracking_number: orders.get_by_tracking_number(tracking_number) for tracking_number in due}
+    successful = {
+        tracking_number: tracking_info for tracking_number, tracking_info in tracking_results.items()
+        if tracking_info and not tracking_info.get('error')
+    }
+    changed, _ = apply_tracking_results('doar', successful, matching_orders)
+    for order in changed:
+        changed_orders[order['id']] = order
+    
+    updated = sum(len(matching_orders[tracking_number]) for tracking_number in successful if tracking_number in matching_orders)
+    polled = {
+        tracking_number: found[0].get('doar_tracking_info') if found else {}
+        for tracking_number, found in matching_orders.items()
+    }
+    schedule.record_polls('doar', polled, now)
+    
+    print(f"[Auto-Update] Doar Israel: Updated {updated} orders, {len(changed)} changed")
+    # Update last update time for Doar Israel
+    set_doar_last_update()
+
 def perform_auto_update():
-    """Perform automatic update of both Cainiao and Doar Israel tracking"""
+    """Refresh the Cainiao and Doar Israel tracking of every parcel that is due"""
     print(f"[Auto-Update] Starting scheduled update at {datetime.now()}")
     
+    # Orders modified during this run, keyed by id, so only they are persisted
+    changed_orders = {}
+    
     try:
-        # Update Cainiao tracking
-        print("[Auto-Update] Updating Cainiao tracking...")
-        orders_with_tracking = []
-        skipped_delivered = 0
-        
-        for o in orders:
-            if o.get('tracking_number') and o.get('tracking_number').strip():
-                tracking_info = o.get('tracking_info') or {}
-                status = tracking_info.get('status', '') if isinstance(tracking_info, dict) else ''
-                if not status:
-                    status = o.get('status', '')
-                status_lower = status.lower() if status else ''
-                
-                if status_lower == 'delivered':
-                    skipped_delivered += 1
-                    continue
-                
-                orders_with_tracking.append(o)
+        now = time.time()
+        schedule = _sync_poll_schedule(now)
+        _update_cainiao(schedule, now, changed_orders)
+        _update_doar(schedule, now, changed_orders)
         
-        if orders_with_tracking:
-            # Deduplicate tracking numbers to avoid duplicate API calls
-            unique_tracking_numbers = list(set([o.get('tracking_number', '').strip() for o in orders_with_tracking if o.get('tracking_number', '').strip()]))
-            print(f"[Auto-Update] Fetching Cainiao tracking for {len(unique_tracking_numbers)} unique tracking numbers (from {len(orders_with_tracking)} orders)")
-            bulk_results = fetch_bulk_tracking_info(unique_tracking_numbers)
-            
-            updated = 0
-            for order in orders_with_tracking:
-                tracking_number = order.get('tracking_number', '').strip()
-                if tracking_number and tracking_number in bulk_results:
-                    tracking_info = bulk_results[tracking_number]
-                    if tracking_info and not tracking_info.get('error'):
-                        order['tracking_info'] = tracking_info
-                        if tracking_info.get('status') and tracking_info['status'] != 'Unknown':
-                            order['status'] = tracking_info['status']
-                        if tracking_info.get('earliest_date') and not order.get('order_date'):
-                            order['order_date'] = tracking_info['earliest_date']
-                        updated += 1
-            
-            print(f"[Auto-Update] Cainiao: Updated {updated} out of {len(orders_with_tracking)} orders ({skipped_delivered} delivered skipped)")
-            # Update last update time for Cainiao
-            set_cainiao_last_update()
-        
-        # Update Doar Israel tracking
-        print("[Auto-Update] Updating Doar Israel tracking...")
-        api_key = get_doar_api_key()
-        if api_key:
-            orders_with_tracking = [o for o in orders if o.get('tracking_number') and o.get('tracking_number').strip()]
-            
-            if orders_with_tracking:
-                # Deduplicate tracking numbers to avoid duplicate API calls
-                unique_tracking_numbers = list(set([o.get('tracking_number', '').strip() for o in orders_with_tracking if o.get('tracking_number', '').strip()]))
-                print(f"[Auto-Update] Fetching Doar Israel tracking for {len(unique_tracking_numbers)} unique tracking numbers (from {len(orders_with_tracking)} orders)")
-                
-                # Fetch tracking info once per unique tracking number
-                tracking_results = {}
-                for tracking_number in unique_tracking_numbers:
-                    tracking_info = fetch_doar_tracking_info(tracking_number)
-                    if tracking_info:
-                        tracking_results[tracking_number] = tracking_info
-                
-                # Apply results to all orders with matching tracking numbers
-                updated = 0
-                for order in orders_with_tracking:
-                    tracking_number = order.get('tracking_number', '').strip()
-                    if tracking_number and tracking_number in tracking_results:
-                        tracking_info = tracking_results[tracking_number]
-                        if not tracking_info.get('error'):
-                            if 'doar_tracking_info' not in order:
-                                order['doar_tracking_info'] = {}
-                            order['doar_tracking_info'] = tracking_info
-                            updated += 1
-                
-                print(f"[Auto-Update] Doar Israel: Updated {updated} out of {len(orders_with_tracking)} orders")
-                # Update last update time for Doar Israel
-                set_doar_last_update()
-            else:
-                print("[Auto-Update] Doar Israel: No orders with tracking numbers found")
-        else:
-            print("[Auto-Update] Doar Israel: API key not configured, skipping")
-        
-        # Save orders after updates
-        save_orders()
+        # Save only the orders whose tracking changed
+        save_orders(changed_orders.values())
         print(f"[Auto-Update] Completed at {datetime.now()}")
         
     except Exception as e:
@@ -128,43 +160,37 @@ def perform_auto_update():
         traceback.print_exc()
     
     # Schedule next update
-    set_next_update_time()
     schedule_next_update()
+    publish('scheduler', {
+        'finished_at': datetime.now().isoformat(),
+        'changed': len(changed_orders),
+        'next_update': get_next_update_time().isoformat()
+    })
 
 def schedule_next_update():
-    """Schedule the next automatic update"""
+    """Schedule the next run for when the next parcel is due"""
     global _current_timer
     
-    # Cancel existing timer if any
+    # Cancel the pending run if any
     if _current_timer:
         _current_timer.cancel()
     
-    next_time = get_next_update_time()
-    if not next_time:
-        set_next_update_time()
-        next_time = get_next_update_time()
-    
-    now = datetime.now()
-    if next_time <= now:
-        # If the time has passed, schedule for configured interval from now
-        set_next_update_time()
-        next_time = get_next_update_time()
-    
-    delay_seconds = (next_time - now).total_seconds()
-    interval_hours = get_auto_update_interval_hours()
-    print(f"[Auto-Update] Next update scheduled for {next_time} (in {delay_seconds/3600:.1f} hours, interval: {interval_hours}h)")
+    next_poll_at = get_poll_schedule().next_poll_at()
+    delay_seconds = MAX_WAKE_SECONDS if next_poll_at is None else next_poll_at - time.time()
+    delay_seconds = max(MIN_WAKE_SECONDS, min(MAX_WAKE_SECONDS, delay_seconds))
+    next_time = datetime.now() + timedelta(seconds=delay_seconds)
+    set_next_update_time(next_time)
+    print(f"[Auto-Update] Next update scheduled for {next_time} (in {delay_seconds/60:.1f} minutes)")
     
-    # Create a timer thread
-    _current_timer = threading.Timer(delay_seconds, perform_auto_update)
-    _current_timer.daemon = True  # Allow program to exit even if timer is running
-    _current_timer.start()
+    # Run on one of the refresh engine's job threads once the delay is over
+    _current_timer = get_refresh_engine().call_later(delay_seconds, perform_auto_update)
     
     return _current_timer
 
 def start_scheduler():
     """Start the auto-update scheduler"""
     print("[Auto-Update] Starting scheduler...")
-    set_next_update_time()
+    _sync_poll_schedule(time.time())
     schedule_next_update()
     print("[Auto-Update] Scheduler started")
 
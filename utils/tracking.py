@@ -1,150 +1,149 @@
 """Tracking information fetching utilities"""
-import requests
 import json
+import threading
 from datetime import datetime
+from functools import lru_cache
+from config import get_cainiao_bulk_chunk_size, get_cainiao_bulk_max_workers, get_tracking_cache_ttl_seconds
+from models.order import normalize_tracking_number
+from . import http_client
+from .json_stream import iter_array_items
+from .lookup_cache import SingleFlightCache
+from .refresh_engine import get_refresh_engine
 
-def parse_tracking_module(module):
-    """Parse a single tracking module from the API response into tracking_info dict"""
+# Bytes read from the response at a time when streaming a bulk response
+STREAM_CHUNK_BYTES = 16 * 1024
+
+# Recent Cainiao results by normalized tracking number; errors are shared with
+# concurrent callers but not cached
+_tracking_cache = SingleFlightCache(get_tracking_cache_ttl_seconds, should_cache=lambda info: not info.get('error'))
+
+@lru_cache(maxsize=4096)
+def _format_event_time(timestamp_ms):
+    """Format a Cainiao millisecond timestamp as local 'YYYY-MM-DD HH:MM:SS' (raises if invalid)"""
+    return datetime.fromtimestamp(timestamp_ms / 1000).strftime('%Y-%m-%d %H:%M:%S')
+
+def _event_time_str(time_str, timestamp_ms):
+    """Use the event's own timeStr, or format its timestamp (None if that fails)"""
+    if time_str:
+        return time_str
+    try:
+        return _format_event_time(timestamp_ms)
+    except Exception:
+        return None
+
+def _parse_module(module, last_update):
     # Initialize tracking info
     tracking_info = {
         'status': 'Unknown',
         'events': [],
         'carrier': None,
-        'last_update': datetime.now().isoformat()
+        'last_update': last_update
     }
     
     if not isinstance(module, dict):
         return tracking_info
     
-    # Get detailList first (needed for both status and latest update)
-    detail_list = module.get('detailList', [])
+    detail_list = module.get('detailList', []) or []
+    first_event = detail_list[0] if detail_list and isinstance(detail_list[0], dict) else None
     
-    # Extract status from latestTrace or latest event's nodeDesc
+    # Extract status from latestTrace, else the latest event's nodeDesc, else statusDesc
     latest_trace = module.get('latestTrace', {})
     latest_group = latest_trace.get('group', {}) if isinstance(latest_trace, dict) else {}
     node_desc = latest_group.get('nodeDesc', '') if isinstance(latest_group, dict) else ''
-    
-    # If no nodeDesc in latestTrace, try to get from latest event
-    if not node_desc and detail_list and len(detail_list) > 0:
-        latest_event = detail_list[0]  # Most recent event is first
-        event_group = latest_event.get('group', {})
+    if not node_desc and first_event is not None:
+        # Most recent event is first
+        event_group = first_event.get('group', {})
         if isinstance(event_group, dict):
             node_desc = event_group.get('nodeDesc', '')
-    
-    # Fallback to statusDesc if nodeDesc not available
     if not node_desc:
         node_desc = module.get('statusDesc', '') or module.get('status', '')
-    
     tracking_info['status'] = node_desc or 'Unknown'
     
-    # Extract latest standerdDesc for the new column
+    # Latest standerdDesc for the new column
     latest_standerd_desc = ''
-    if detail_list and len(detail_list) > 0:
-        latest_event = detail_list[0]
-        latest_standerd_desc = latest_event.get('standerdDesc', '') or latest_event.get('desc', '')
-    
+    if first_event is not None:
+        latest_standerd_desc = first_event.get('standerdDesc', '') or first_event.get('desc', '')
     tracking_info['latest_standerd_desc'] = latest_standerd_desc
     
-    # Extract carrier information (if available)
+    # Extract carrier information (if available), or origin and destination countries
     carrier = module.get('carrier', '') or module.get('carrierName', '')
     if carrier:
         tracking_info['carrier'] = carrier
-    
-    # Extract origin and destination countries
     origin_country = module.get('originCountry', '')
     dest_country = module.get('destCountry', '')
     if origin_country and dest_country:
         tracking_info['carrier'] = f"{origin_country} → {dest_country}"
     
-    # Extract tracking events from detailList
+    # One pass over detailList (newest first): collect the events and track the
+    # earliest and latest timestamped events (first and last of equal timestamps,
+    # like a stable sort would)
     events = []
+    earliest = latest = None
+    for event in detail_list:
+        if not isinstance(event, dict):
+            continue
+        timestamp = event.get('time')
+        time_str = event.get('timeStr', '')
+        if timestamp:
+            if earliest is None or timestamp < earliest[0]:
+                earliest = (timestamp, time_str)
+            if latest is None or timestamp >= latest[0]:
+                latest = (timestamp, time_str)
+        
+        standerd_desc = event.get('standerdDesc', '') or event.get('desc', '')
+        if standerd_desc and standerd_desc.strip():
+            event_date = time_str
+            if not event_date and timestamp:
+                event_date = _event_time_str(None, timestamp)
+            group = event.get('group', {})
+            events.append({
+                'description': standerd_desc.strip(),
+                'nodeDesc': group.get('nodeDesc', '') if isinstance(group, dict) else '',
+                'date': event_date
+            })
     
-    if detail_list:
-        for event in detail_list:
-            if isinstance(event, dict):
-                standerd_desc = event.get('standerdDesc', '') or event.get('desc', '')
-                
-                if standerd_desc and standerd_desc.strip():
-                    event_date = event.get('timeStr', '')
-                    if not event_date and event.get('time'):
-                        try:
-                            timestamp = event.get('time') / 1000
-                            event_date = datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
-                        except:
-                            event_date = None
-                    
-                    group = event.get('group', {})
-                    group_desc = group.get('nodeDesc', '') if isinstance(group, dict) else ''
-                    
-                    events.append({
-                        'description': standerd_desc.strip(),
-                        'nodeDesc': group_desc,
-                        'date': event_date
-                    })
-    
+    # Events are stored oldest first
     events.reverse()
     tracking_info['events'] = events
     
-    # Extract earliest and latest dates from events
-    if events:
-        event_times = []
-        for event in detail_list:
-            if isinstance(event, dict):
-                timestamp = event.get('time')
-                if timestamp:
-                    event_times.append({
-                        'timestamp': timestamp,
-                        'timeStr': event.get('timeStr', '')
-                    })
-        
-        if event_times:
-            event_times.sort(key=lambda x: x['timestamp'])
-            earliest = event_times[0]
-            latest = event_times[-1]
-            
-            if earliest['timeStr']:
-                tracking_info['earliest_date'] = earliest['timeStr']
-            else:
-                try:
-                    timestamp = earliest['timestamp'] / 1000
-                    tracking_info['earliest_date'] = datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
-                except:
-                    tracking_info['earliest_date'] = None
-            
-            if latest['timeStr']:
-                tracking_info['last_update_date'] = latest['timeStr']
-            else:
-                try:
-                    timestamp = latest['timestamp'] / 1000
-                    tracking_info['last_update_date'] = datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
-                except:
-                    tracking_info['last_update_date'] = None
+    # Earliest and latest dates, only if there are events
+    if events and earliest is not None:
+        tracking_info['earliest_date'] = _event_time_str(earliest[1], earliest[0])
+        tracking_info['last_update_date'] = _event_time_str(latest[1], latest[0])
     
     return tracking_info
 
+def parse_tracking_module(module):
+    """Parse a single tracking module from the API response into tracking_info dict"""
+    return _parse_module(module, datetime.now().isoformat())
+
+def parse_tracking_modules(modules):
+    """Parse the modules of a bulk API response; returns the tracking_info dicts in the same order"""
+    last_update = datetime.now().isoformat()
+    return [_parse_module(module, last_update) for module in modules]
+
 def fetch_tracking_info(tracking_number):
-    """Fetch tracking information from Cainiao API for a single tracking number"""
+    """Fetch tracking information from Cainiao API for a single tracking number.
+    
+    Recent results are reused, and concurrent calls for the same number share one request.
+    """
     if not tracking_number or not tracking_number.strip():
         return None
-    
+    return _tracking_cache.get(
+        normalize_tracking_number(tracking_number),
+        lambda: _fetch_tracking_info(tracking_number)
+    )
+
+def _fetch_tracking_info(tracking_number):
     try:
         tracking_number = tracking_number.strip()
         url = f"https://global.cainiao.com/global/detail.json?mailNos={tracking_number}&lang=en-US&language=en-US"
         
         headers = {
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:144.0) Gecko/20100101 Firefox/144.0',
-            'Accept': 'application/json, text/plain, */*',
-            'Accept-Language': 'en-US,en;q=0.5',
-            'Accept-Encoding': 'gzip, deflate, br, zstd',
-            'Connection': 'keep-alive',
-            'Referer': f'https://global.cainiao.com/newDetail.htm?mailNoList={tracking_number}',
-            'Sec-Fetch-Dest': 'empty',
-            'Sec-Fetch-Mode': 'cors',
-            'Sec-Fetch-Site': 'same-origin',
-            'TE': 'trailers'
+            'Referer': f'https://global.cainiao.com/newDetail.htm?mailNoList={tracking_number}'
         }
         
-        response = requests.get(url, headers=headers, timeout=15)
+        response = http_client.get(url, provider='cainiao', headers=headers)
         response.raise_for_status()
         
         data = response.json()
@@ -179,62 +178,189 @@ def fetch_tracking_info(tracking_number):
             'error': str(e)
         }
 
-def fetch_bulk_tracking_info(tracking_numbers):
-    """Fetch tracking information for multiple tracking numbers in a single API call"""
-    if not tracking_numbers:
-        return {}
+def _get_tracking_chunk(tracking_numbers, stream=False):
+    """Send one Cainiao bulk request and return the (successful) response"""
+    mail_nos = ','.join(tracking_numbers)
+    referer_mail_nos = '%2C'.join(tracking_numbers)
     
-    valid_tracking_numbers = [tn.strip() for tn in tracking_numbers if tn and tn.strip()]
+    url = f"https://global.cainiao.com/global/detail.json?mailNos={mail_nos}&lang=en-US&language=en-US"
     
-    if not valid_tracking_numbers:
-        return {}
+    headers = {
+        'Referer': f'https://global.cainiao.com/newDetail.htm?mailNoList={referer_mail_nos}&otherMailNoList=',
+        'bx-v': '2.5.31',
+        'Priority': 'u=0'
+    }
     
+    response = http_client.get(url, provider='cainiao', headers=headers, stream=stream)
     try:
-        mail_nos = ','.join(valid_tracking_numbers)
-        referer_mail_nos = '%2C'.join(valid_tracking_numbers)
-        
-        url = f"https://global.cainiao.com/global/detail.json?mailNos={mail_nos}&lang=en-US&language=en-US"
-        
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:144.0) Gecko/20100101 Firefox/144.0',
-            'Accept': 'application/json, text/plain, */*',
-            'Accept-Language': 'en-US,en;q=0.5',
-            'Accept-Encoding': 'gzip, deflate, br, zstd',
-            'Connection': 'keep-alive',
-            'Referer': f'https://global.cainiao.com/newDetail.htm?mailNoList={referer_mail_nos}&otherMailNoList=',
-            'bx-v': '2.5.31',
-            'Sec-Fetch-Dest': 'empty',
-            'Sec-Fetch-Mode': 'cors',
-            'Sec-Fetch-Site': 'same-origin',
-            'Priority': 'u=0',
-            'TE': 'trailers'
-        }
-        
-        response = requests.get(url, headers=headers, timeout=30)
         response.raise_for_status()
-        
-        data = response.json()
-        
-        results = {}
-        
-        if isinstance(data, dict) and data.get('success'):
-            module_list = data.get('module', [])
-            
-            for module in module_list:
-                if isinstance(module, dict):
-                    mail_no = module.get('mailNo', '')
-                    if mail_no:
-                        tracking_info = parse_tracking_module(module)
-                        results[mail_no] = tracking_info
-        
-        return results
-        
+    except Exception:
+        response.close()
+        raise
+    return response
+
+def _fetch_tracking_chunk(tracking_numbers):
+    """Fetch one Cainiao bulk request; raises on network or response errors"""
+    response = _get_tracking_chunk(tracking_numbers)
+    
+    data = response.json()
+    
+    results = {}
+    
+    if isinstance(data, dict) and data.get('success'):
+        modules = [
+            module for module in data.get('module', [])
+            if isinstance(module, dict) and module.get('mailNo', '')
+        ]
+        for module, tracking_info in zip(modules, parse_tracking_modules(modules)):
+            results[module['mailNo']] = tracking_info
+    
+    return results
+
+def _chunk_error_result(error):
+    return {
+        'status': 'Error',
+        'events': [],
+        'carrier': None,
+        'last_update': datetime.now().isoformat(),
+        'error': error
+    }
+
+def _fetch_tracking_chunk_safe(chunk_index, tracking_numbers):
+    """Fetch a chunk, turning a failure into an error result for each of its numbers"""
+    try:
+        return _fetch_tracking_chunk(tracking_numbers), None
     except json.JSONDecodeError as e:
-        print(f"Error parsing JSON response for bulk tracking: {e}")
-        return {}
+        error = f'Failed to parse tracking data: {e}'
     except Exception as e:
-        print(f"Error fetching bulk tracking info: {e}")
-        import traceback
-        traceback.print_exc()
+        error = str(e)
+    print(f"Error fetching bulk tracking chunk {chunk_index + 1} ({len(tracking_numbers)} tracking numbers): {error}")
+    return {tracking_number: _chunk_error_result(error) for tracking_number in tracking_numbers}, error
+
+def fetch_bulk_tracking_info(tracking_numbers, chunk_size=None, max_workers=None):
+    """Fetch tracking information for multiple tracking numbers.
+    
+    Numbers with a recent result are served from the lookup cache, and numbers that
+    another thread is already fetching are waited for instead of fetched again.
+    The rest are split into chunks of `chunk_size` per API call, and up to
+    `max_workers` chunks are fetched at the same time on the refresh engine (both
+    default to config).
+    A failed chunk does not affect the others: each of its tracking numbers gets
+    an error result ({'status': 'Error', 'error': ...}) instead.
+    """
+    if not tracking_numbers:
         return {}
+    
+    # Deduplicate while keeping the order
+    valid_tracking_numbers = list(dict.fromkeys(tn.strip() for tn in tracking_numbers if tn and tn.strip()))
+    
+    if not valid_tracking_numbers:
+        return {}
+    
+    requested = {normalize_tracking_number(tn): tn for tn in valid_tracking_numbers}
+    
+    def fetch_missing(keys):
+        fetched = _fetch_bulk_tracking_info([requested[key] for key in keys], chunk_size, max_workers)
+        return {normalize_tracking_number(mail_no): info for mail_no, info in fetched.items()}
+    
+    by_key = _tracking_cache.get_many(list(requested), fetch_missing)
+    results = {}
+    for tracking_number in valid_tracking_numbers:
+        tracking_info = by_key.get(normalize_tracking_number(tracking_number))
+        if tracking_info is not None:
+            results[tracking_number] = tracking_info
+    return results
+
+def _fetch_bulk_tracking_info(valid_tracking_numbers, chunk_size=None, max_workers=None):
+    """Fetch deduplicated tracking numbers in parallel chunks, bypassing the cache"""
+    chunk_size = max(1, chunk_size or get_cainiao_bulk_chunk_size())
+    max_workers = max(1, max_workers or get_cainiao_bulk_max_workers())
+    chunks = [valid_tracking_numbers[i:i + chunk_size] for i in range(0, len(valid_tracking_numbers), chunk_size)]
+    
+    if len(chunks) == 1 or max_workers == 1:
+        chunk_results = [_fetch_tracking_chunk_safe(index, chunk) for index, chunk in enumerate(chunks)]
+    else:
+        # The engine also caps Cainiao requests across concurrent refreshes
+        chunk_results = get_refresh_engine().map(
+            'cainiao', lambda indexed_chunk: _fetch_tracking_chunk_safe(*indexed_chunk), enumerate(chunks), limit=max_workers
+        )
+    
+    results = {}
+    failed_chunks = 0
+    for chunk_result, error in chunk_results:
+        results.update(chunk_result)
+        if error:
+            failed_chunks += 1
+    
+    if failed_chunks:
+        print(f"Bulk tracking: {failed_chunks} of {len(chunks)} chunks failed, kept results from the others")
+    
+    return results
+
+def _stream_tracking_chunk(tracking_numbers, on_module):
+    """Fetch one Cainiao bulk request and call `on_module(mail_no, tracking_info)` for each
+    module as soon as it is decoded from the response; raises on network or response errors.
+
+    Modules are handed over as they arrive, so those before a failure are kept. A
+    response that says `"success": false` before its modules yields none.
+    """
+    fields = {}
+    with _get_tracking_chunk(tracking_numbers, stream=True) as response:
+        for module in iter_array_items(response.iter_content(STREAM_CHUNK_BYTES), 'module', fields, response.encoding or 'utf-8'):
+            if not fields.get('success', True):
+                break
+            if isinstance(module, dict) and module.get('mailNo', ''):
+                on_module(module['mailNo'], parse_tracking_module(module))
 
+def stream_bulk_tracking_info(tracking_numbers, on_result, chunk_size=None, max_workers=None):
+    """Fetch tracking information for multiple tracking numbers, handing over each result
+    as soon as it is decoded instead of returning them all at the end.
+    
+    `on_result(tracking_number, tracking_info)` is called once per tracking number found
+    in the responses, one call at a time, from the refresh engine's I/O threads. Chunks
+    are fetched like fetch_bulk_tracking_info() does (bypassing the lookup cache), but
+    each response is decoded module by module while it downloads, so memory use
+    follows one module rather than the whole response. Tracking numbers of a failed
+    chunk that weren't handed over yet get an error result ({'status': 'Error',
+    'error': ...}); tracking numbers missing from the responses get no call.
+    """
+    valid_tracking_numbers = list(dict.fromkeys(tn.strip() for tn in tracking_numbers or [] if tn and tn.strip()))
+    if not valid_tracking_numbers:
+        return
+    chunk_size = max(1, chunk_size or get_cainiao_bulk_chunk_size())
+    max_workers = max(1, max_workers or get_cainiao_bulk_max_workers())
+    chunks = [valid_tracking_numbers[i:i + chunk_size] for i in range(0, len(valid_tracking_numbers), chunk_size)]
+    
+    requested = {normalize_tracking_number(tn): tn for tn in valid_tracking_numbers}
+    lock = threading.Lock()
+    
+    def stream_chunk(chunk_index, chunk):
+        handed_over = set()
+        
+        def on_module(mail_no, tracking_info):
+            tracking_number = requested.get(normalize_tracking_number(mail_no), mail_no)
+            with lock:
+                on_result(tracking_number, tracking_info)
+            handed_over.add(tracking_number)
+        
+        try:
+            _stream_tracking_chunk(chunk, on_module)
+            return None
+        except json.JSONDecodeError as e:
+            error = f'Failed to parse tracking data: {e}'
+        except Exception as e:
+            error = str(e)
+        print(f"Error streaming bulk tracking chunk {chunk_index + 1} ({len(chunk)} tracking numbers): {error}")
+        for tracking_number in chunk:
+            if tracking_number not in handed_over:
+                with lock:
+                    on_result(tracking_number, _chunk_error_result(error))
+        return error
+    
+    # The engine also caps Cainiao requests across concurrent refreshes
+    errors = get_refresh_engine().map(
+        'cainiao', lambda indexed_chunk: stream_chunk(*indexed_chunk), enumerate(chunks), limit=max_workers
+    )
+    failed_chunks = sum(1 for error in errors if error)
+    if failed_chunks:
+        print(f"Bulk tracking: {failed_chunks} of {len(chunks)} chunks failed, kept results from the others")
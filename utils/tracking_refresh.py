@@ -0,0 +1,184 @@
+"""Refresh-all jobs for Cainiao and Doar Israel tracking.
+
+Both jobs work through the unique tracking numbers in batches: each batch is fetched,
+applied incrementally (see models.tracking_updates) and its changed orders saved
+before the next one starts, so progress can be reported and a cancelled job keeps
+everything it already fetched. Cainiao responses are streamed by default: parcels
+are applied a chunk at a time as their modules are decoded from the responses.
+"""
+from models.order import orders, save_orders, normalize_tracking_number
+from models.tracking_updates import apply_tracking_results
+from config import (
+    get_cainiao_bulk_chunk_size,
+    get_cainiao_bulk_max_workers,
+    get_cainiao_stream_responses,
+    get_doar_max_concurrency,
+    set_cainiao_last_update,
+    set_doar_last_update
+)
+from .tracking import fetch_bulk_tracking_info, stream_bulk_tracking_info
+from .doar_israel import fetch_bulk_doar_tracking_info
+
+# Doar Israel lookups per batch, per allowed concurrent lookup
+DOAR_BATCH_ROUNDS = 5
+
+def _is_delivered(order):
+    tracking_info = order.get('tracking_info') or {}
+    status = tracking_info.get('status', '') if isinstance(tracking_info, dict) else ''
+    if not status:
+        status = order.get('status', '')
+    return (status or '').lower() == 'delivered'
+
+def _group_by_tracking_number(orders_to_refresh):
+    """Group orders by normalized tracking number, so variants like `ab123cn` and
+    `AB 123 CN` are looked up once and all get the result"""
+    orders_by_tracking_number = {}
+    for order in orders_to_refresh:
+        key = normalize_tracking_number(order.get('tracking_number'))
+        if key:
+            orders_by_tracking_number.setdefault(key, []).append(order)
+    return orders_by_tracking_number
+
+def _record_batch(job, batch, orders_by_tracking_number, successful, errors_by_tracking_number, changed):
+    """Count a finished batch on the job: orders updated, failed and their errors"""
+    processed = updated = failed = 0
+    errors = []
+    for tracking_number in batch:
+        matching_orders = orders_by_tracking_number[tracking_number]
+        processed += len(matching_orders)
+        if tracking_number in successful:
+            updated += len(matching_orders)
+            continue
+        failed += len(matching_orders)
+        error = errors_by_tracking_number.get(tracking_number, 'Tracking number not found in API response')
+        errors.extend(
+            {'order_id': order['id'], 'tracking_number': order.get('tracking_number', '').strip(), 'error': error}
+            for order in matching_orders
+        )
+    job.advance(processed, errors=errors, updated=updated, changed=changed, failed=failed)
+
+def _refresh_in_batches(job, provider, orders_by_tracking_number, batch_size, fetch_bulk):
+    """Fetch and apply tracking numbers batch by batch, recording progress on the job"""
+    tracking_numbers = list(orders_by_tracking_number)
+    for start in range(0, len(tracking_numbers), batch_size):
+        if job.cancel_requested:
+            break
+        batch = tracking_numbers[start:start + batch_size]
+        results = fetch_bulk(batch)
+        successful = {
+            tracking_number: tracking_info for tracking_number, tracking_info in results.items()
+            if tracking_info and not tracking_info.get('error')
+        }
+        changed_orders, _ = apply_tracking_results(
+            provider, successful, {tracking_number: orders_by_tracking_number[tracking_number] for tracking_number in batch}
+        )
+        save_orders(changed_orders)
+
+        errors_by_tracking_number = {
+            tracking_number: tracking_info.get('error', 'Failed to fetch tracking info')
+            for tracking_number, tracking_info in results.items() if tracking_info and tracking_number not in successful
+        }
+        _record_batch(job, batch, orders_by_tracking_number, successful, errors_by_tracking_number, len(changed_orders))
+
+def _stream_in_batches(job, provider, orders_by_tracking_number, batch_size, stream_bulk, apply_size):
+    """Like _refresh_in_batches(), but results are applied while the responses are still decoded.
+
+    `stream_bulk(tracking_numbers, on_result)` calls `on_result(tracking_number, tracking_info)`
+    per result. Results are buffered and applied `apply_size` (one chunk) at a time, so
+    only about a chunk of parsed results is held, and each chunk costs one round of
+    change log and poll schedule writes rather than one per parcel.
+    """
+    tracking_numbers = list(orders_by_tracking_number)
+    for start in range(0, len(tracking_numbers), batch_size):
+        if job.cancel_requested:
+            break
+        batch = tracking_numbers[start:start + batch_size]
+        successful = set()
+        errors_by_tracking_number = {}
+        changed_orders = {}
+        pending = {}
+
+        def apply_pending():
+            changed, _ = apply_tracking_results(
+                provider, pending, {tracking_number: orders_by_tracking_number[tracking_number] for tracking_number in pending}
+            )
+            changed_orders.update((order['id'], order) for order in changed)
+            pending.clear()
+
+        def on_result(tracking_number, tracking_info):
+            tracking_number = normalize_tracking_number(tracking_number)
+            if tracking_number not in orders_by_tracking_number:
+                return
+            if not tracking_info or tracking_info.get('error'):
+                errors_by_tracking_number[tracking_number] = (tracking_info or {}).get('error', 'Failed to fetch tracking info')
+                return
+            successful.add(tracking_number)
+            pending[tracking_number] = tracking_info
+            if len(pending) >= apply_size:
+                apply_pending()
+
+        stream_bulk(batch, on_result)
+        if pending:
+            apply_pending()
+        save_orders(changed_orders.values())
+        _record_batch(job, batch, orders_by_tracking_number, successful, errors_by_tracking_number, len(changed_orders))
+
+def refresh_all_cainiao(job):
+    """Refresh the Cainiao tracking of every order that isn't delivered yet"""
+    orders_with_tracking = []
+    skipped_delivered = 0
+    for order in list(orders):
+        if not (order.get('tracking_number') or '').strip():
+            continue
+        if _is_delivered(order):
+            skipped_delivered += 1
+            continue
+        orders_with_tracking.append(order)
+
+    job.set_total(len(orders_with_tracking), updated=0, changed=0, failed=0, skipped=skipped_delivered)
+    if not orders_with_tracking:
+        if skipped_delivered > 0:
+            return f'No orders to update. {skipped_delivered} delivered orders skipped.'
+        return 'No orders with tracking numbers found'
+
+    orders_by_tracking_number = _group_by_tracking_number(orders_with_tracking)
+    print(f"Fetching tracking info for {len(orders_by_tracking_number)} unique tracking numbers in bulk (from {len(orders_with_tracking)} orders)...")
+    # One batch is as many chunks as may be fetched at the same time
+    chunk_size = max(1, get_cainiao_bulk_chunk_size())
+    batch_size = chunk_size * max(1, get_cainiao_bulk_max_workers())
+    if get_cainiao_stream_responses():
+        _stream_in_batches(job, 'cainiao', orders_by_tracking_number, batch_size, stream_bulk_tracking_info, chunk_size)
+    else:
+        _refresh_in_batches(job, 'cainiao', orders_by_tracking_number, batch_size, fetch_bulk_tracking_info)
+
+    # Update last update time for Cainiao (a cancelled run didn't cover every order)
+    if not job.cancel_requested:
+        set_cainiao_last_update()
+
+    counts = job.to_dict()
+    print(f"Bulk update completed: {counts['updated']} updated ({counts['changed']} changed), {counts['failed']} failed out of {len(orders_with_tracking)} total, {skipped_delivered} delivered orders skipped")
+    message = f"Updated {counts['updated']} out of {len(orders_with_tracking)} orders, {counts['changed']} changed"
+    if skipped_delivered > 0:
+        message += f' ({skipped_delivered} delivered orders skipped)'
+    return message
+
+def refresh_all_doar(job):
+    """Refresh the Doar Israel tracking of every order with a tracking number"""
+    orders_with_tracking = [order for order in list(orders) if (order.get('tracking_number') or '').strip()]
+
+    job.set_total(len(orders_with_tracking), updated=0, changed=0, failed=0)
+    if not orders_with_tracking:
+        return 'No orders with tracking numbers found'
+
+    orders_by_tracking_number = _group_by_tracking_number(orders_with_tracking)
+    print(f"Fetching Doar Israel tracking info for {len(orders_by_tracking_number)} unique tracking numbers (from {len(orders_with_tracking)} orders)...")
+    batch_size = max(1, get_doar_max_concurrency()) * DOAR_BATCH_ROUNDS
+    _refresh_in_batches(job, 'doar', orders_by_tracking_number, batch_size, fetch_bulk_doar_tracking_info)
+
+    # Update last update time for Doar Israel (a cancelled run didn't cover every order)
+    if not job.cancel_requested:
+        set_doar_last_update()
+
+    counts = job.to_dict()
+    print(f"Doar Israel bulk update completed: {counts['updated']} updated ({counts['changed']} changed), {counts['failed']} failed out of {len(orders_with_tracking)} total")
+    return f"Updated {counts['updated']} out of {len(orders_with_tracking)} orders, {counts['changed']} changed"
@@ -3,7 +3,6 @@ import time
 import hashlib
 import urllib.parse
 import json
-import requests
 
 
 def extract_token_from_cookie(cookie_header: str) -> str:
@@ -94,17 +93,9 @@ def fetch_tracking_number_from_order(cookie: str, order_id: str) -> str:
         # Build the signed URL
         url = build_url_from_cookie_and_order_id(cookie, order_id)
         
-        # Prepare headers (similar to browser request)
+        # Prepare headers (the rest of the browser-like headers come from the provider defaults)
         headers = {
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:144.0) Gecko/20100101 Firefox/144.0',
-            'Accept': '*/*',
-            'Accept-Language': 'en-US,en;q=0.5',
-            'Accept-Encoding': 'gzip, deflate, br, zstd',
-            'Referer': f'https://www.aliexpress.com/p/tracking/index.html?_addShare=no&_login=yes&tradeOrderId={order_id}',
-            'Sec-Fetch-Dest': 'script',
-            'Sec-Fetch-Mode': 'no-cors',
-            'Sec-Fetch-Site': 'same-site',
-            'Connection': 'keep-alive',
+            'Referer': f'https://www.aliexpress.com/p/tracking/index.html?_addShare=no&_login=yes&tradeOrderId={order_id}'
         }
         
         # Parse cookies from cookie string
@@ -114,8 +105,9 @@ def fetch_tracking_number_from_order(cookie: str, order_id: str) -> str:
                 key, value = cookie_pair.split('=', 1)
                 cookies_dict[key.strip()] = value.strip()
         
-        # Make the API request
-        response = requests.get(url, headers=headers, cookies=cookies_dict, timeout=30)
+        # Make the API request (imported here so this file still runs standalone to build URLs)
+        from utils import http_client
+        response = http_client.get(url, provider='aliexpress_api', headers=headers, cookies=cookies_dict)
         
         if response.status_code != 200:
             print(f"Failed to fetch order details: {response.status_code}")